@@ -1,26 +1,32 @@
-import shutil
 import os
-import zipfile
+import sys
 
-# Define source and destination paths
-source_dir = "/workspaces/CodeVision1/input"
-destination_dir = "/workspaces/CodeVision1/output/ZIP/Extracted"
+from project_fs import extract_once
+from workspace import DEFAULT_WORKSPACE
 
-# Ensure destination directory exists
-os.makedirs(destination_dir, exist_ok=True)
+def extract_upload(archive_name, workspace=DEFAULT_WORKSPACE, archive_hash=None):
+    """Extract the workspace's uploaded archive into its ZIP/Extracted folder; returns the path."""
+    zip_file_path = workspace.archive_path(archive_name)
+    extracted_path = workspace.project_dir(archive_name)
 
-# Find the first .zip file in the source directory
-zip_files = [f for f in os.listdir(source_dir) if f.endswith(".zip")]
+    # Extract the zip file (skipped if this archive is already extracted)
+    os.makedirs(workspace.extracted_dir, exist_ok=True)
+    extract_once(zip_file_path, extracted_path, archive_hash)
+    print(f"Extracted {archive_name} to {extracted_path}")
+    return extracted_path
 
-if not zip_files:
-    print("No .zip file found in the input directory.")
-else:
-    zip_file_path = os.path.join(source_dir, zip_files[0])
-    
-    # Extract the zip file
-    extracted_path = os.path.join(destination_dir, os.path.splitext(zip_files[0])[0])
-    os.makedirs(extracted_path, exist_ok=True)
-    
-    with zipfile.ZipFile(zip_file_path, 'r') as zip_ref:
-        zip_ref.extractall(extracted_path)
-        print(f"Extracted {zip_files[0]} to {extracted_path}")
+if __name__ == "__main__":
+    # The archive to extract is named explicitly; without a name the input
+    # folder must hold exactly one .zip
+    if len(sys.argv) > 1:
+        archive_name = sys.argv[1]
+    else:
+        archive_name = DEFAULT_WORKSPACE.archive_name
+        if not archive_name:
+            print("Usage: python ExtractZIP.py <archive.zip> (input folder has no single .zip to pick)")
+            sys.exit(1)
+
+    if not os.path.exists(DEFAULT_WORKSPACE.archive_path(archive_name)):
+        print(f"No such archive in the input directory: {archive_name}")
+        sys.exit(1)
+    extract_upload(archive_name)
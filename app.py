@@ -1,8 +1,36 @@
-from flask import Flask, request, render_template, jsonify, redirect, url_for, send_from_directory, send_file
+from flask import Flask, Request, Response, request, render_template, jsonify, redirect, url_for, send_from_directory, send_file
+import hashlib
+import json
 import os
-import subprocess
+import shutil
+
+import http_client
+import llm_cache
+import providers
+import worker_pool
+from werkzeug.exceptions import HTTPException
+from jobs import submit_job, get_job
+from core import analyze_target, graph_path, prepare_analysis, stream_analysis
+from cs_method_scanner import scan_cs_files
+from projectQuery import process_query, build_query_prompt
+from run_pipeline import run_pipeline_job
+from uploads import SpooledUpload, UploadRejected, save_upload, check_archive, prepare_project, MAX_UPLOAD_BYTES
+from workspace import new_workspace, get_workspace
+from method_list import load_method_list, method_list_path, filter_entries, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from embedding_index import search_entries
+from dependency_graph import graph_json, graph_etag, DEFAULT_RADIUS
+
+class UploadRequest(Request):
+    """A request that writes its uploaded files into upload_dir, once set, while the body arrives."""
+    upload_dir = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.upload_dir is None:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return SpooledUpload(self.upload_dir)
 
 app = Flask(__name__)
+app.request_class = UploadRequest
 
 UPLOAD_FOLDER = '/workspaces/CodeVision1/input'
 EXTRACTED_FOLDER = '/workspaces/CodeVision1/output/ZIP'
@@ -12,10 +40,72 @@ os.makedirs(EXTRACTED_FOLDER, exist_ok=True)
 
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['ALLOWED_EXTENSIONS'] = {'zip'}
+# Werkzeug rejects larger request bodies with 413 while they are still arriving
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES + 1024 * 1024
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
+def project_workspace(project_id):
+    """Return the workspace of a request's project id (none: the shared one), or None if unknown."""
+    try:
+        return get_workspace(project_id)
+    except KeyError:
+        return None
+
+def unknown_project():
+    return jsonify({"message": "Unknown project"}), 404
+
+def reject_upload(workspace, message, status=400):
+    """Remove the workspace of a refused or failed upload and answer with message."""
+    shutil.rmtree(workspace.root, ignore_errors=True)
+    return jsonify({"message": message}), status
+
+def event_stream(chunks):
+    """
+    Send text chunks to the browser as server-sent events as they are produced:
+    {"text": ...} data events, then a "done" event (or "error" with a message).
+    """
+    def events():
+        try:
+            for chunk in chunks:
+                if chunk:
+                    yield f"data: {json.dumps({'text': chunk})}\n\n"
+        except Exception as e:
+            yield f"event: error\ndata: {json.dumps({'message': str(e)})}\n\n"
+        else:
+            yield "event: done\ndata: {}\n\n"
+    # No buffering anywhere on the way, so the first tokens show up immediately
+    return Response(events(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+def answer_query(data, project_type):
+    """Shared body of /get-info and /get-info-raw; streams when the request asks to."""
+    query = data.get('query', '')
+    model = data.get('model', '')
+    
+    if not query:
+        return jsonify({"message": "No query provided"}), 400
+    workspace = project_workspace(data.get('project'))
+    if workspace is None:
+        return unknown_project()
+
+    if data.get('stream'):
+        # Retrieval runs on the pool; the model's tokens are relayed as they come
+        try:
+            prompt, error = worker_pool.run(build_query_prompt, query, project_type, workspace)
+            chunks = [error] if prompt is None else providers.generate_stream(model, prompt)
+        except Exception as e:
+            chunks = [f"Error processing query: {e}"]
+        return event_stream(chunks)
+
+    try:
+        response_message = worker_pool.run(process_query, query, model, project_type, workspace).strip()
+    except Exception as e:
+        response_message = f"Error processing query: {e}"
+
+    return jsonify({"message": response_message})
+
 @app.route('/')
 def home():
     return redirect(url_for('upload_file'))
@@ -23,40 +113,72 @@ def home():
 @app.route('/upload', methods=['GET', 'POST'])
 def upload_file():
     if request.method == 'POST':
-        if 'file' not in request.files:
-            return jsonify({"message": "No file part"}), 400
-        file = request.files['file']
+        # Every upload gets its own workspace so concurrent projects never
+        # collide; the file is written into it and hashed as the body arrives
+        workspace = new_workspace()
+        request.upload_dir = workspace.input_dir
+        try:
+            files = request.files
+        except UploadRejected as e:
+            return reject_upload(workspace, str(e), e.status)
+        except HTTPException:
+            shutil.rmtree(workspace.root, ignore_errors=True)
+            raise
+        if 'file' not in files:
+            return reject_upload(workspace, "No file part")
+        file = files['file']
         model = request.form.get('model')
 
         if file.filename == '':
-            return jsonify({"message": "No selected file"}), 400
+            return reject_upload(workspace, "No selected file")
 
         if file and allowed_file(file.filename):
-            filename = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-            file.save(filename)
-            #"scanAndMerge.py", directory_to_scan, output_file
-            directory_to_scan = f"{filename}"
-            output_file = "/workspaces/CodeVision1/output/merged_output.txt"
-            subprocess.run(["python", "scanAndMerge.py", directory_to_scan, output_file], check=True)
-            subprocess.run(["python", "ExtractZIP.py"], check=True)
-            subprocess.run(["python", "cs_method_scanner.py"], check=True)
+            filename = workspace.archive_path(file.filename)
+            try:
+                archive_hash = save_upload(file.stream, filename)
+                check_archive(filename)
+            except UploadRejected as e:
+                return reject_upload(workspace, str(e), e.status)
+            workspace.set_archive(file.filename)
+            print(f"Received {file.filename} (sha256 {archive_hash}) as project {workspace.project_id}")
+
+            # Merge, extract and list methods in-process, straight from the archive
+            try:
+                summary = prepare_project(filename, workspace.merged_output, workspace.project_dir(), archive_hash,
+                                          workspace.code_index_path)
+            except Exception as e:
+                print(f"Error preparing {file.filename}: {e}")
+                return reject_upload(workspace, f"Error preparing {file.filename}: {e}", 500)
+            source = "from cache" if summary["cached"] else "scanned"
+            print(f"Prepared {file.filename} ({source}): {summary['files']} files, "
+                  f"{summary['entries']} methods and classes")
             
-            return redirect(url_for('index_page', filename=file.filename, model=model))
+            return redirect(url_for('index_page', filename=file.filename, model=model,
+                                    project=workspace.project_id))
         else:
-            return jsonify({"message": "Invalid file type. Only .zip files are allowed."}), 400
+            return reject_upload(workspace, "Invalid file type. Only .zip files are allowed.")
     return render_template('upload.html')
 
 @app.route('/index')
 def index_page():
     filename = request.args.get('filename')
     model = request.args.get('model')
-    return render_template('index.html', filename=filename, model=model)
+    project = request.args.get('project', '')
+    return render_template('index.html', filename=filename, model=model, project=project)
 
 @app.route('/enhance')
 def enhance_file():
     filename = request.args.get('filename')
     model = request.args.get('model')
-    return render_template('enhance.html', filename=filename, model=model)
+    project = request.args.get('project', '')
+    return render_template('enhance.html', filename=filename, model=model, project=project)
+
+@app.route('/projects/<project_id>/graphs/<path:filename>')
+def project_graph(project_id, filename):
+    workspace = project_workspace(project_id)
+    if workspace is None:
+        return unknown_project()
+    return send_from_directory(workspace.graphs_dir, filename)
 
 @app.route('/download/<filename>')
 def download_file(filename):
@@ -65,64 +187,59 @@ def download_file(filename):
 
 @app.route('/get-info', methods=['POST'])
 def get_info():
-    data = request.get_json()
-    query = data.get('query', '')
-    model = data.get('model', '')
-    
-    if not query:
-        return jsonify({"message": "No query provided"}), 400
-
-    try:
-        result = subprocess.run(["python", "projectQuery.py", query, model, "enhanced"], capture_output=True, text=True, check=True)
-        response_message = result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        response_message = f"Error processing query: {e}"
-
-    return jsonify({"message": response_message})
+    return answer_query(request.get_json(), "enhanced")
 
 @app.route('/get-info-raw', methods=['POST'])
 def get_raw_project_info():
-    data = request.get_json()
-    query = data.get('query', '')
-    model = data.get('model', '')
-    
-    if not query:
-        return jsonify({"message": "No query provided"}), 400
-
-    try:
-        result = subprocess.run(["python", "projectQuery.py", query, model, "raw"], capture_output=True, text=True, check=True)
-        response_message = result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        response_message = f"Error processing query: {e}"
-
-    return jsonify({"message": response_message})
+    return answer_query(request.get_json(), "raw")
 
 @app.route('/enhance-process', methods=['POST'])
 def enhance_process():
-    try:
-        data = request.get_json()  # Get JSON data from the request
-        filename = data.get('filename')
-        model = data.get('model')
+    data = request.get_json()  # Get JSON data from the request
+    filename = data.get('filename')
+    model = data.get('model')
 
-        if not filename or not model:
-            return jsonify({"message": "Missing filename or model"}), 400
+    if not filename or not model:
+        return jsonify({"message": "Missing filename or model"}), 400
+    if model not in providers.supported_models():
+        return jsonify({"message": f"Unsupported model {model}"}), 400
+    workspace = project_workspace(data.get('project'))
+    if workspace is None:
+        return unknown_project()
 
-        # Run the enhancement process
-        subprocess.run(["python", "run_pipeline.py", filename, model], check=True)
-        
-        zip_file_path = '/workspaces/CodeVision1/output/ZIP/Extracted_files.zip'
+    # Queue the enhancement process; the client polls the job status
+    job_id = submit_job(run_pipeline_job, filename, model, workspace)
+    return jsonify({
+        "job_id": job_id,
+        "status_url": url_for('job_status', job_id=job_id),
+        "result_url": url_for('job_result', job_id=job_id),
+    }), 202
 
-        if os.path.exists(zip_file_path):
-            return send_file(zip_file_path, as_attachment=True)  # Auto-download the file
-        else:
-            return jsonify({"message": "Extracted zip file not found."}), 500
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"message": "Unknown job"}), 404
+    return jsonify({key: job[key] for key in ("id", "status", "stage", "percent", "error")})
 
-    except subprocess.CalledProcessError as e:
-        return jsonify({"message": f"Error in running pipeline: {e}"}), 500
+@app.route('/jobs/<job_id>/result')
+def job_result(job_id):
+    job = get_job(job_id)
+    if job is None:
+        return jsonify({"message": "Unknown job"}), 404
+    if job["status"] == "failed":
+        return jsonify({"message": f"Error in running pipeline: {job['error']}"}), 500
+    if job["status"] != "done":
+        return jsonify({"message": "Job is not finished yet"}), 409
+    if not os.path.exists(job["result"]):
+        return jsonify({"message": "Extracted zip file not found."}), 500
+    return send_file(job["result"], as_attachment=True, download_name="Extracted_files.zip")
 
 @app.route('/analyze-structure', methods=['POST'])
 @app.route('/refactai', methods=['POST'])
 def analyze_code():
+    # Determine which mode to use based on the endpoint
+    is_refact = request.endpoint == 'refactai'
     try:
         data = request.get_json()
         filename = data.get('filename')
@@ -131,46 +248,103 @@ def analyze_code():
         
         if not filename or not target_name:
             return jsonify({"message": "Missing filename or target name"}), 400
+        workspace = project_workspace(data.get('project'))
+        if workspace is None:
+            return unknown_project()
 
-        # Determine which mode to use based on the endpoint
-        is_refact = request.endpoint == 'refactai'
-        command = ["python", "core.py", 
-                  "--target", target_name,
-                  "--type", target_type]
-        
-        if is_refact:
-            command.append("--refact")
+        directory = workspace.project_dir(filename)
+        if data.get('stream'):
+            # Scan, graph and prompt on the pool, then relay the model's answer as it comes
+            prepared = worker_pool.run(prepare_analysis, target_name, target_type, is_refact,
+                                       directory=directory, workspace=workspace)
+            if prepared is None:
+                return jsonify({"message": f"No relevant code found for {target_type}: {target_name}"}), 404
+            return event_stream(stream_analysis(*prepared))
 
-        # Run the core.py script
-        result = subprocess.run(command, capture_output=True, text=True, check=True)
+        # Run the analysis on the worker pool
+        message = worker_pool.run(analyze_target, target_name, target_type, is_refact,
+                                  directory=directory, workspace=workspace)
+        if message is None:
+            return jsonify({"message": f"No relevant code found for {target_type}: {target_name}"}), 404
         
         # For structure analysis, include graph info
-        message = result.stdout
-        if not is_refact and os.path.exists("dependencies_graph.png"):
+        if not is_refact and os.path.exists(graph_path(target_name, workspace.graphs_dir)):
             message += "\n\nCheck the dependencies graph in the output folder."
         
         # Return the analysis results
         return jsonify({"message": message})
 
-    except subprocess.CalledProcessError as e:
+    except Exception as e:
         error_type = "RefactAI" if is_refact else "Analysis"
-        return jsonify({"message": f"Error in {error_type}: {e.stderr}"}), 500
+        return jsonify({"message": f"Error in {error_type}: {e}"}), 500
+
+@app.route('/graph-data')
+def graph_data():
+    """Dependency graph around ?target= as nodes and edges, for client-side rendering."""
+    workspace = project_workspace(request.args.get('project'))
+    if workspace is None:
+        return unknown_project()
+    target = request.args.get('target') or None
+    radius = request.args.get('radius', DEFAULT_RADIUS, type=int)
+    etag = graph_etag(workspace.code_index_path, target, radius)
+    if etag in request.if_none_match:
+        return "", 304
+    response = jsonify(graph_json(workspace.code_index_path, target, radius))
+    response.set_etag(etag)
+    return response
+
+@app.route('/llm-cache/stats')
+def llm_cache_stats():
+    return jsonify(llm_cache.stats())
+
+@app.route('/http-client/stats')
+def http_client_stats():
+    return jsonify(http_client.stats())
+
+@app.route('/providers/stats')
+def provider_stats():
+    return jsonify(providers.stats())
 
 @app.route('/get-methods')
 def get_methods():
+    """
+    The class/method dropdown, optionally filtered (q, mode=prefix|fuzzy|semantic)
+    and paged (offset, limit). mode=semantic ranks entries by similarity of
+    their code to a natural-language query. Served from the list built at scan time,
+    with an ETag so unchanged lists are answered with 304.
+    """
+    workspace = project_workspace(request.args.get('project'))
+    if workspace is None:
+        return unknown_project()
+    query = request.args.get('q', '')
+    mode = request.args.get('mode', 'prefix')
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', DEFAULT_PAGE_SIZE, type=int)
     try:
-        # Run the cs_method_scanner and capture its output
-        result = subprocess.run(["python", "cs_method_scanner.py"], 
-                              capture_output=True, 
-                              text=True, 
-                              check=True)
-        
-        # Split the output into individual methods
-        methods = [method.strip() for method in result.stdout.split('\n') if method.strip()]
-        
-        return jsonify({"methods": methods})
-    except subprocess.CalledProcessError as e:
-        return jsonify({"message": f"Error getting methods: {e.stderr}"}), 500
+        saved = load_method_list(method_list_path(workspace.code_index_path))
+        if saved is None:
+            # Nothing scanned in this workspace yet: list the extracted tree directly
+            methods = worker_pool.run(scan_cs_files, workspace.extracted_dir)
+            etag = None
+        else:
+            list_etag, methods = saved
+            params = f"{mode}|{offset}|{limit}|{query}".encode("utf-8")
+            etag = f"{list_etag}-{hashlib.sha256(params).hexdigest()[:16]}"
+            if etag in request.if_none_match:
+                return "", 304
+
+        if mode == "semantic" and query.strip() and saved is not None:
+            ranked = worker_pool.run(search_entries, query, workspace.code_index_path, MAX_PAGE_SIZE)
+            listed = set(methods)
+            total, page = filter_entries([entry for entry in ranked if entry in listed], "", mode, offset, limit)
+        else:
+            total, page = filter_entries(methods, query, mode, offset, limit)
+        response = jsonify({"methods": page, "total": total, "offset": offset, "limit": limit})
+        if etag:
+            response.set_etag(etag)
+        return response
+    except Exception as e:
+        return jsonify({"message": f"Error getting methods: {e}"}), 500
 
 if __name__ == '__main__':
     app.run(port=5001, debug=True)
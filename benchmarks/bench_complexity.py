@@ -0,0 +1,108 @@
+"""Check and benchmark the fused cyclomatic complexity counter.
+
+Usage:
+    python benchmarks/bench_complexity.py [project.zip|directory] [--scale N] [--repeat N]
+
+Every file (and every method body) of the project, NumHandler.zip by
+default, is counted both by calculate_cyclomatic_complexity and by the
+original twelve re.findall passes. Any difference in the metrics dict is
+reported and makes the script exit with status 1; otherwise the timings
+of both are printed.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import calculate_cyclomatic_complexity  # noqa: E402
+from csharp_parser import parse_csharp  # noqa: E402
+from bench_parser import load_sources, scaled_source  # noqa: E402
+
+# Inputs where the patterns overlap or repeat back to back
+EDGE_CASES = [
+    "else if (a) {} else { } else if(b)",
+    "if (a &&& b ||| c) {}",
+    "x = a ? b : c ? d : e; y = p ?? q ? r : s;",
+    "switch (v) { case A.B: case 1: break; default: break; }",
+    "do { } while (x); for (;;) {} foreach (var i in l) {}",
+    "try {} catch(Exception) {} catch {} catch\n{}",
+    "ifx (a) elseif (b) do{}",
+]
+
+
+# The counter calculate_cyclomatic_complexity replaced, kept as the reference
+def legacy_cyclomatic_complexity(code):
+    metrics = {
+        "if_statements": len(re.findall(r'\bif\s*\(', code)),
+        "else_statements": len(re.findall(r'\belse\s*{', code)),
+        "elif_statements": len(re.findall(r'\belse\s+if\s*\(', code)),
+        "switch_statements": len(re.findall(r'\bswitch\s*\(', code)),
+        "case_branches": len(re.findall(r'\bcase\s+[\w\d_.]+:', code)),
+        "while_loops": len(re.findall(r'\bwhile\s*\(', code)),
+        "for_loops": len(re.findall(r'\bfor\s*\(', code)),
+        "do_while_loops": len(re.findall(r'\bdo\s*{', code)),
+        "foreach_loops": len(re.findall(r'\bforeach\s*\(', code)),
+        "try_catch_blocks": len(re.findall(r'\bcatch\s*[({\s]', code)),
+        "conditional_ops": len(re.findall(r'\?\s*[\w\d_.]+\s*:', code)),
+        "logical_ops": len(re.findall(r'(?:&&|\|\|)', code))
+    }
+    complexity = 1 + sum(metrics.values())
+    return complexity, metrics
+
+
+def samples(sources):
+    """Yield (label, code) for every file, every method body and the edge cases."""
+    for name, code in sources.items():
+        yield name, code
+        for method in parse_csharp(code)["methods"]:
+            if method["body_start"] is not None:
+                yield f"{name}:{method['name']}", code[method["body_start"]:method["body_end"]]
+    for number, code in enumerate(EDGE_CASES):
+        yield f"edge case {number}", code
+
+
+def timed(count, texts, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in texts:
+            count(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    default_project = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "NumHandler.zip")
+    parser = argparse.ArgumentParser(description="Check the fused complexity counter against the findall baseline")
+    parser.add_argument("project", nargs="?", default=default_project, help="Project .zip or directory")
+    parser.add_argument("--scale", type=int, default=40, help="Size multiplier for the timing run")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    sources = load_sources(args.project)
+    mismatches = 0
+    checked = 0
+    for label, code in samples(sources):
+        checked += 1
+        expected = legacy_cyclomatic_complexity(code)
+        actual = calculate_cyclomatic_complexity(code)
+        if actual != expected:
+            mismatches += 1
+            print(f"MISMATCH {label}\n  findall: {expected}\n  fused:   {actual}")
+    print(f"Checked {checked} samples: {mismatches} mismatches")
+
+    big = [scaled_source(sources, args.scale)]
+    legacy_time = timed(legacy_cyclomatic_complexity, big, args.repeat)
+    fused_time = timed(calculate_cyclomatic_complexity, big, args.repeat)
+    print(f"{len(big[0]) / 1024:.1f} KB: findall x12 {legacy_time:.4f}s, fused {fused_time:.4f}s "
+          f"({legacy_time / fused_time:.1f}x)")
+
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == "__main__":
+    main()
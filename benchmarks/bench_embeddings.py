@@ -0,0 +1,100 @@
+"""Benchmark the semantic embedding index over a (scaled) project.
+
+Usage:
+    python benchmarks/bench_embeddings.py [project.zip|directory] [--scale N] [--queries N]
+
+The project, NumHandler.zip by default, is written --scale times into a
+temporary directory (identifiers renamed per copy, as bench_parser does)
+and scanned into a code index there. The script then times:
+
+- the first build of the embeddings over every class and method chunk;
+- the rebuild after one file changed, which only embeds that file again;
+- natural-language queries against the memory-mapped matrix (median and
+  95th percentile over --queries runs), printing the top hits of each.
+"""
+import argparse
+import os
+import re
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import embedding_index  # noqa: E402
+from core import update_project_index  # noqa: E402
+from bench_parser import load_sources  # noqa: E402
+
+QUERIES = [
+    "write a message to the log",
+    "loop that never ends",
+    "exception is caught and ignored",
+    "concatenate strings in a loop",
+]
+
+
+def write_scaled_project(sources, scale, directory):
+    """Write scale renamed copies of sources under directory; return the file paths."""
+    names = set(re.findall(r'(?:class|void|int|string)\s+(\w+)', "\n".join(sources.values())))
+    pattern = re.compile(r'\b(%s)\b' % "|".join(sorted(names))) if names else None
+    paths = []
+    for copy in range(scale):
+        for name, code in sources.items():
+            path = os.path.join(directory, f"copy{copy}", name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(pattern.sub(lambda m: f"{m.group(1)}{copy}", code) if pattern and copy else code)
+            paths.append(path)
+    return paths
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def main():
+    default_project = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "NumHandler.zip")
+    parser = argparse.ArgumentParser(description="Time building and querying the embedding index")
+    parser.add_argument("project", nargs="?", default=default_project, help="A .zip archive or a directory")
+    parser.add_argument("--scale", type=int, default=200, help="Copies of the project to index")
+    parser.add_argument("--queries", type=int, default=50, help="Runs of each query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        source_dir = os.path.join(directory, "src")
+        sources = load_sources(args.project)
+        if os.path.isdir(args.project):
+            sources = {os.path.relpath(name, args.project): code for name, code in sources.items()}
+        paths = write_scaled_project(sources, args.scale, source_dir)
+        index_path = os.path.join(directory, "code_index.json")
+        update_project_index(source_dir, index_path=index_path)
+        embedder = embedding_index.get_embedder()
+        print(f"{len(paths)} files, embedder {embedder.name}")
+
+        start = time.perf_counter()
+        store = embedding_index.build_embeddings(index_path)
+        print(f"first build:  {time.perf_counter() - start:8.3f} s for {len(store['chunks'])} chunks")
+
+        with open(paths[0], "a", encoding="utf-8") as f:
+            f.write("\n// changed\n")
+        update_project_index(source_dir, index_path=index_path)
+        start = time.perf_counter()
+        embedding_index.get_embeddings(index_path)
+        print(f"one changed:  {time.perf_counter() - start:8.3f} s")
+
+        for query in QUERIES:
+            latencies = []
+            for _ in range(args.queries):
+                start = time.perf_counter()
+                hits = embedding_index.search(query, index_path, top_k=5)
+                latencies.append(time.perf_counter() - start)
+            print(f"\n{query!r}: median {statistics.median(latencies) * 1000:6.2f} ms, "
+                  f"p95 {percentile(latencies, 0.95) * 1000:6.2f} ms")
+            for hit in hits:
+                print(f"  {hit['score']:.3f}  {hit['kind']:<7} {hit['name']}")
+
+
+if __name__ == "__main__":
+    main()
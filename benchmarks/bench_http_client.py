@@ -0,0 +1,100 @@
+"""Check and benchmark the pooled HTTP client against the mock model server.
+
+Usage:
+    python benchmarks/bench_http_client.py [--requests N]
+
+Three mock servers (benchmarks/mock_llm_server.py) are started in-process:
+
+- a healthy one, where --requests calls made with a fresh requests.post
+  each (a new connection per call, as before) are timed against the same
+  calls through http_client.post (one kept-alive pooled connection);
+- one failing every third request with 429 + Retry-After and one failing
+  every third with 503 and no Retry-After, where every call must still
+  end in a 200 after retries;
+- a stalled one, where a call with a short read timeout must fail fast
+  instead of hanging.
+
+Any failed check makes the script exit with status 1. The per-name
+latency metrics from http_client.stats() are printed at the end.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests  # noqa: E402
+
+import http_client  # noqa: E402
+from mock_llm_server import start_in_background  # noqa: E402
+
+PAYLOAD = {"model": "mock", "messages": [{"role": "user", "content": "ping"}]}
+
+
+def timed(call, count):
+    latencies = []
+    for _ in range(count):
+        start = time.perf_counter()
+        response = call()
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"HTTP {response.status_code}")
+        response.close()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check retries/timeouts and time the pooled HTTP client")
+    parser.add_argument("--requests", type=int, default=200, help="Calls per timing run")
+    args = parser.parse_args()
+    # Keep the backoff short; the checks are about behaviour, not waiting
+    http_client.BACKOFF_BASE = 0.05
+    failures = []
+
+    server, url = start_in_background(port=0, tokens=1, first_token_delay=0, token_delay=0)
+    endpoint = f"{url}/chat/completions"
+    fresh = timed(lambda: requests.post(endpoint, json=PAYLOAD, timeout=10), args.requests)
+    pooled = timed(lambda: http_client.post(endpoint, name="bench-pooled", json=PAYLOAD), args.requests)
+    server.shutdown()
+    print(f"new connection per call: median {statistics.median(fresh) * 1000:7.2f} ms")
+    print(f"pooled keep-alive:       median {statistics.median(pooled) * 1000:7.2f} ms "
+          f"({statistics.median(fresh) / statistics.median(pooled):.1f}x)")
+
+    for status, retry_after in ((429, 0.05), (503, None)):
+        server, url = start_in_background(port=0, tokens=1, first_token_delay=0, token_delay=0,
+                                          fail_every=3, fail_status=status, retry_after=retry_after)
+        name = f"bench-{status}"
+        for _ in range(30):
+            response = http_client.post(f"{url}/chat/completions", name=name, json=PAYLOAD)
+            if response.status_code != 200:
+                failures.append(f"{name}: call ended with HTTP {response.status_code}")
+                break
+            json.loads(response.content)
+        server.shutdown()
+        if http_client.stats()[name]["retries"] == 0:
+            failures.append(f"{name}: no retries were made")
+
+    server, url = start_in_background(port=0, tokens=1, first_token_delay=3, token_delay=0)
+    start = time.perf_counter()
+    try:
+        http_client.post(f"{url}/chat/completions", name="bench-timeout", json=PAYLOAD,
+                         timeout=(1, 0.3), retries=1)
+        failures.append("bench-timeout: stalled call did not time out")
+    except requests.Timeout:
+        elapsed = time.perf_counter() - start
+        print(f"stalled server: timed out after {elapsed:.2f}s (read timeout 0.3s, 1 retry)")
+        if elapsed > 2:
+            failures.append(f"bench-timeout: took {elapsed:.2f}s")
+    server.shutdown()
+
+    print(json.dumps(http_client.stats(), indent=2))
+    for failure in failures:
+        print(f"FAILED {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
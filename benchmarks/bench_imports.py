@@ -0,0 +1,94 @@
+"""Measure the cold-start import time of each command-line entry point.
+
+Usage:
+    python benchmarks/bench_imports.py [module ...] [--repeat N] [--top N]
+
+Every module is imported in a fresh interpreter (python -X importtime -c
+"import <module>") --repeat times. The median wall time of the import is
+printed per module, followed by the slowest of it and its direct imports
+(cumulative time from -X importtime, taken from the median run). Modules that
+fail to import are reported with the last line of their error and make
+the script exit with status 1.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The scripts that are started on their own (CLI or web server)
+ENTRY_POINTS = [
+    "app",
+    "core",
+    "enhance",
+    "projectQuery",
+    "run_pipeline",
+    "scanAndMerge",
+    "cs_method_scanner",
+    "ExtractZIP",
+    "replaceEnhancedCsAndZIP",
+    "cleanUP",
+]
+
+
+def time_import(module):
+    """Import module in a new interpreter; return (seconds, stderr)."""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_DIR, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "import failed")
+    return elapsed, result.stderr
+
+
+def parse_top_level(importtime_log):
+    """Yield (cumulative us, name) for the imported modules and their direct imports."""
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # One leading space at the top level, two more per level of nesting
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1:
+            yield int(cumulative), name.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of the entry points")
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS, help="Modules to import (default: all entry points)")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module (median is reported)")
+    parser.add_argument("--top", type=int, default=5, help="Slowest imports listed per module")
+    args = parser.parse_args()
+
+    failed = False
+    for module in args.modules:
+        runs = []
+        try:
+            for _ in range(args.repeat):
+                runs.append(time_import(module))
+        except RuntimeError as e:
+            print(f"{module:<26} FAILED: {e}")
+            failed = True
+            continue
+
+        runs.sort(key=lambda run: run[0])
+        median_seconds, median_log = runs[len(runs) // 2]
+        print(f"{module:<26} {median_seconds * 1000:8.1f} ms  "
+              f"(min {runs[0][0] * 1000:.1f}, max {runs[-1][0] * 1000:.1f})")
+        for cumulative, name in sorted(parse_top_level(median_log), reverse=True)[:args.top]:
+            print(f"    {cumulative / 1000:8.1f} ms  {name}")
+
+    # Interpreter start-up alone, for reference
+    baseline = statistics.median(time_import("sys")[0] for _ in range(args.repeat))
+    print(f"{'(interpreter start-up)':<26} {baseline * 1000:8.1f} ms")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Benchmark the tokenizer-based C# parser against the old regex parser.
+
+Usage:
+    python benchmarks/bench_parser.py [project.zip|directory] [--scale N] [--repeat N]
+
+The sources are taken from the archive or directory (NumHandler.zip by
+default). --scale concatenates N renamed copies of every class into one
+file to show how both parsers grow with file size.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import calculate_cyclomatic_complexity, parse_csharp_code  # noqa: E402
+
+
+# The regex implementation parse_csharp_code used before csharp_parser,
+# kept here verbatim as the baseline.
+def legacy_calculate_class_complexity(code, class_name):
+    class_pattern = rf'class\s+{class_name}\s*{{([^{{}}]*(?:{{[^{{}}]*}}[^{{}}]*)*)}}'
+    class_match = re.search(class_pattern, code, re.DOTALL)
+    if not class_match:
+        return None, None
+    class_code = class_match.group(1)
+    class_metrics = {
+        "properties": len(re.findall(r'(?:public|private|protected)\s+\w+\s+\w+\s*{(?:\s*get\s*;\s*set\s*;|\s*{\s*.*?\s*}\s*)*\s*}', class_code)),
+        "methods": len(re.findall(r'(?:public|private|protected)\s+\w+\s+\w+\s*\(.*?\)\s*{', class_code)),
+        "fields": len(re.findall(r'(?:public|private|protected)\s+\w+\s+\w+\s*;', class_code)),
+        "nested_classes": len(re.findall(r'class\s+\w+', class_code)),
+        "interfaces_implemented": len(re.findall(r':\s*([^{]+)', class_code.split('\n')[0])),
+    }
+    complexity = (
+        class_metrics["properties"] * 0.5 +
+        class_metrics["methods"] * 1.0 +
+        class_metrics["fields"] * 0.3 +
+        class_metrics["nested_classes"] * 2.0 +
+        class_metrics["interfaces_implemented"] * 0.5
+    )
+    return complexity, class_metrics
+
+
+def legacy_parse_csharp_code(file_path, code):
+    classes = re.findall(r'class\s+(\w+)', code)
+    methods = re.findall(r'(public|private|protected)?\s*(\w+)\s+(\w+)\s*\(.*\)', code)
+    dependencies = re.findall(r'using\s+([\w\.]+);', code)
+
+    method_complexities = {}
+    method_metrics = {}
+    for method in methods:
+        method_name = method[2]
+        method_pattern = rf'{method_name}\s*\([^)]*\)\s*{{([^{{}}]*(?:{{[^{{}}]*}}[^{{}}]*)*)}}'
+        method_matches = re.findall(method_pattern, code, re.DOTALL)
+        if method_matches:
+            complexity, metrics = calculate_cyclomatic_complexity(method_matches[0])
+            method_complexities[method_name] = complexity
+            method_metrics[method_name] = metrics
+
+    overall_complexity, overall_metrics = calculate_cyclomatic_complexity(code)
+
+    class_complexities = {}
+    class_metrics = {}
+    for class_name in classes:
+        complexity, metrics = legacy_calculate_class_complexity(code, class_name)
+        if complexity:
+            class_complexities[class_name] = complexity
+            class_metrics[class_name] = metrics
+
+    method_calls = []
+    method_call_pattern = r'(\w+)\s*\((.*?)\)\s*;?'
+    for method_name in methods:
+        method_code = re.findall(rf'\b{method_name[2]}\b.*?{{(.*?)}}', code, re.DOTALL)
+        if method_code:
+            for called_method in re.findall(method_call_pattern, method_code[0]):
+                method_calls.append((method_name[2], called_method[0]))
+
+    return {
+        "file": file_path,
+        "classes": classes,
+        "methods": [m[2] for m in methods],
+        "dependencies": dependencies,
+        "method_calls": method_calls,
+        "cyclomatic_complexity": {
+            "overall": overall_complexity,
+            "overall_metrics": overall_metrics,
+            "per_method": method_complexities,
+            "per_method_metrics": method_metrics,
+            "per_class": class_complexities,
+            "per_class_metrics": class_metrics
+        }
+    }
+
+
+def load_sources(path):
+    """Return {name: code} for every .cs file in a zip archive or directory."""
+    sources = {}
+    if path.endswith(".zip"):
+        with zipfile.ZipFile(path) as archive:
+            for name in archive.namelist():
+                if name.endswith(".cs"):
+                    sources[name] = archive.read(name).decode("utf-8-sig")
+    else:
+        for root, _, files in os.walk(path):
+            for file in files:
+                if file.endswith(".cs"):
+                    file_path = os.path.join(root, file)
+                    with open(file_path, "r", encoding="utf-8-sig") as f:
+                        sources[file_path] = f.read()
+    return sources
+
+
+def scaled_source(sources, scale):
+    """Concatenate scale copies of all sources, renaming identifiers per copy."""
+    code = "\n".join(sources.values())
+    names = set(re.findall(r'(?:class|void|int|string)\s+(\w+)', code))
+    copies = []
+    for copy in range(scale):
+        copies.append(re.sub(r'\b(%s)\b' % "|".join(sorted(names)),
+                             lambda m: f"{m.group(1)}{copy}", code))
+    return "\n".join(copies)
+
+
+def timed(parse, sources, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = [parse(name, code) for name, code in sources.items()]
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, results
+
+
+def main():
+    default_project = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "NumHandler.zip")
+    parser = argparse.ArgumentParser(description="Benchmark the C# parser against the regex baseline")
+    parser.add_argument("project", nargs="?", default=default_project, help="Project .zip or directory")
+    parser.add_argument("--scale", type=int, default=0, help="Also parse one file made of N renamed copies")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    sources = load_sources(args.project)
+    cases = [("project", sources)]
+    if args.scale:
+        cases.append((f"x{args.scale} single file", {"scaled.cs": scaled_source(sources, args.scale)}))
+
+    print(f"{'case':<22}{'KB':>8}{'regex s':>11}{'tokenizer s':>13}{'speedup':>9}"
+          f"{'methods r/t':>14}{'calls r/t':>14}")
+    for label, case_sources in cases:
+        size_kb = sum(len(code) for code in case_sources.values()) / 1024
+        legacy_time, legacy_results = timed(legacy_parse_csharp_code, case_sources, args.repeat)
+        new_time, new_results = timed(parse_csharp_code, case_sources, args.repeat)
+        legacy_methods = sum(len(r["methods"]) for r in legacy_results)
+        new_methods = sum(len(r["methods"]) for r in new_results)
+        legacy_calls = sum(len(r["method_calls"]) for r in legacy_results)
+        new_calls = sum(len(r["method_calls"]) for r in new_results)
+        speedup = legacy_time / new_time if new_time else float("inf")
+        print(f"{label:<22}{size_kb:>8.1f}{legacy_time:>11.4f}{new_time:>13.4f}{speedup:>8.1f}x"
+              f"{f'{legacy_methods}/{new_methods}':>14}{f'{legacy_calls}/{new_calls}':>14}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Check that provider budgets keep mixed traffic under an API's rate limit.
+
+Usage:
+    python benchmarks/bench_providers.py [--rpm N] [--window S] [--calls N]
+
+A mock model server (benchmarks/mock_llm_server.py) enforcing --rpm
+requests per --window seconds is started, and --calls prompts are sent
+to it at once: two thirds as blocking generate() calls from an
+"enhancement" pool and the rest as generate_stream() calls from a "chat"
+pool, the way enhance_chunked and the chat endpoints overlap.
+
+This runs twice: once through a provider without rate limits (the API
+answers 429 and the HTTP client has to retry) and once through a
+provider with the same requests-per-minute budget as the server. The
+second run must finish without a single 429 and with every answer
+present, or the script exits with status 1.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import http_client  # noqa: E402
+import llm_cache  # noqa: E402
+import providers  # noqa: E402
+from mock_llm_server import start_in_background  # noqa: E402
+
+MODEL = "gpt-4-turbo"
+
+
+def run_traffic(provider, calls):
+    """Send the mixed traffic through provider; return (answers missing, seconds)."""
+    providers.register(provider)
+    enhancement = [f"Enhance chunk {i}" for i in range(calls * 2 // 3)]
+    chat = [f"Chat question {i}" for i in range(calls - len(enhancement))]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=4) as enhance_pool, ThreadPoolExecutor(max_workers=4) as chat_pool:
+        blocking = [enhance_pool.submit(providers.generate, MODEL, prompt) for prompt in enhancement]
+        streamed = [chat_pool.submit(lambda p: "".join(providers.generate_stream(MODEL, p)), prompt)
+                    for prompt in chat]
+        answers = [future.result() for future in blocking + streamed]
+    return sum(1 for answer in answers if not answer), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check provider rate budgets against a rate-limited mock API")
+    parser.add_argument("--rpm", type=int, default=10, help="Requests the mock allows per window")
+    parser.add_argument("--window", type=float, default=2.0, help="Rate limit window in seconds")
+    parser.add_argument("--calls", type=int, default=30, help="Prompts sent per run")
+    args = parser.parse_args()
+    llm_cache.ENABLED = False
+    http_client.BACKOFF_BASE = 0.1
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+    failed = False
+
+    for label, rpm in (("unbudgeted", 0), ("budgeted", args.rpm)):
+        server, url = start_in_background(port=0, tokens=5, first_token_delay=0.05, token_delay=0.005,
+                                          rpm=args.rpm, window=args.window)
+        provider = providers.OpenAIProvider(4, rpm, 0, window=args.window, base_url=url)
+        missing, seconds = run_traffic(provider, args.calls)
+        server.shutdown()
+        limited = server.served["limited"]
+        print(f"{label:<11} {seconds:6.2f}s  429 answers: {limited:3d}  missing answers: {missing}  "
+              f"budget wait: {provider.stats()['waited_seconds']:.2f}s")
+        if rpm and (limited or missing):
+            failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
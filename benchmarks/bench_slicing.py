@@ -0,0 +1,118 @@
+"""Compare analysis prompts built from whole files and from symbol slices.
+
+Usage:
+    python benchmarks/bench_slicing.py [--sizes N,N,...] [--repeat N]
+
+For every size, a C# file is generated with one target method, a helper
+it calls, a caller, and that many unrelated filler methods, and scanned
+into a code index in a temporary directory. The prompt for the target is
+then built the old way (every file containing the target, in full) and
+through retrieve_relevant_code (context_slicer.slice_target). Both prompt
+sizes in tokens and the best time to build each prompt are printed: the
+sliced prompt should stay the same size whatever the file size.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import retrieve_relevant_code, summary_prompt, update_project_index  # noqa: E402
+from tokens import count_tokens  # noqa: E402
+
+TARGET = "ValidateOrder"
+
+FILLER = """
+        public int Filler{n}(int value)
+        {{
+            int total = 0;
+            for (int i = 0; i < value; i++)
+            {{
+                if (i % {m} == 0) total += i; else total -= 1;
+            }}
+            return total;
+        }}
+"""
+
+TEMPLATE = """using System;
+using System.Collections.Generic;
+
+namespace Shop
+{{
+    public class OrderService
+    {{
+{fillers}
+        public bool ValidateOrder(Order order)
+        {{
+            if (order == null) return false;
+            if (order.Lines.Count == 0) return false;
+            return CheckStock(order) && order.Total > 0;
+        }}
+
+        private bool CheckStock(Order order)
+        {{
+            return order.Lines.TrueForAll(line => line.Quantity <= 100);
+        }}
+
+        public void Submit(Order order)
+        {{
+            if (!ValidateOrder(order)) throw new ArgumentException("Invalid order");
+        }}
+    }}
+}}
+"""
+
+
+def whole_file_code(directory):
+    # What retrieve_relevant_code sent before: the files containing the target
+    code = ""
+    for name in sorted(os.listdir(directory)):
+        with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+            code += f"\n\n// File: {os.path.join(directory, name)}\n" + f.read()
+    return code
+
+
+def best_time(build, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        prompt = build()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, prompt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare whole-file and sliced analysis prompts")
+    parser.add_argument("--sizes", default="10,100,1000,5000", help="Filler methods per file, comma separated")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per measurement (best is reported)")
+    args = parser.parse_args()
+
+    print(f"{'fillers':>8} {'file tokens':>12} {'whole-file prompt':>18} {'sliced prompt':>14} "
+          f"{'whole ms':>9} {'sliced ms':>10}")
+    for size in (int(s) for s in args.sizes.split(",")):
+        with tempfile.TemporaryDirectory() as directory:
+            source_dir = os.path.join(directory, "src")
+            os.makedirs(source_dir)
+            fillers = "".join(FILLER.format(n=n, m=n % 7 + 2) for n in range(size))
+            with open(os.path.join(source_dir, "OrderService.cs"), "w", encoding="utf-8") as f:
+                f.write(TEMPLATE.format(fillers=fillers))
+            index_path = os.path.join(directory, "code_index.json")
+            update_project_index(source_dir, workers=1, index_path=index_path)
+
+            whole_seconds, whole = best_time(
+                lambda: summary_prompt(whole_file_code(source_dir), TARGET, "method", index_path)[1],
+                args.repeat)
+            sliced_seconds, sliced = best_time(
+                lambda: summary_prompt(retrieve_relevant_code(TARGET, "method", index_path)[0],
+                                       TARGET, "method", index_path)[1],
+                args.repeat)
+            print(f"{size:>8} {count_tokens(whole_file_code(source_dir)):>12} "
+                  f"{count_tokens(whole):>18} {count_tokens(sliced):>14} "
+                  f"{whole_seconds * 1000:>9.2f} {sliced_seconds * 1000:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
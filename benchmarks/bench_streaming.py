@@ -0,0 +1,86 @@
+"""Load-test the streaming model path against the mock model server.
+
+Usage:
+    python benchmarks/bench_streaming.py [--url URL] [--requests N] [--concurrency N]
+        [--tokens N] [--first-token-delay S] [--token-delay S]
+
+Without --url a mock server (benchmarks/mock_llm_server.py) is started
+in-process with the given delays. --requests prompts are then streamed
+from --concurrency threads through an OpenAI provider pointed at it,
+with the response cache off and no rate limits. Time to the first piece
+of text and to the end of the answer are reported (median and 95th
+percentile); the gap between the two is what streaming hides from the
+user.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import llm_cache  # noqa: E402
+import providers  # noqa: E402
+from mock_llm_server import start_in_background  # noqa: E402
+
+MODEL = "gpt-4-turbo"
+
+
+def timed_stream(prompt):
+    """Return (seconds to first text, seconds to the end, characters received)."""
+    start = time.perf_counter()
+    first = None
+    size = 0
+    for text in providers.generate_stream(MODEL, prompt):
+        if first is None:
+            first = time.perf_counter() - start
+        size += len(text)
+    return first, time.perf_counter() - start, size
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure time to first token over the streaming model path")
+    parser.add_argument("--url", default=None, help="Base URL of a running OpenAI-compatible API (default: start the mock)")
+    parser.add_argument("--requests", type=int, default=20, help="Prompts to send")
+    parser.add_argument("--concurrency", type=int, default=4, help="Prompts in flight at once")
+    parser.add_argument("--tokens", type=int, default=100, help="Words per answer (in-process mock only)")
+    parser.add_argument("--first-token-delay", type=float, default=0.3, help="Mock delay before the first word")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Mock delay between words")
+    args = parser.parse_args()
+
+    server = None
+    if args.url is None:
+        server, args.url = start_in_background(port=0, tokens=args.tokens,
+                                               first_token_delay=args.first_token_delay,
+                                               token_delay=args.token_delay)
+    providers.register(providers.OpenAIProvider(args.concurrency, 0, 0, base_url=args.url))
+    llm_cache.ENABLED = False
+    os.environ.setdefault("OPENAI_API_KEY", "mock")
+
+    prompts = [f"Benchmark prompt {i}" for i in range(args.requests)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(timed_stream, prompts))
+    wall = time.perf_counter() - start
+    if server is not None:
+        server.shutdown()
+
+    first = [r[0] for r in results if r[0] is not None]
+    total = [r[1] for r in results]
+    print(f"{args.requests} streamed answers, {args.concurrency} at a time, against {args.url}")
+    print(f"time to first text: median {statistics.median(first) * 1000:8.1f} ms, "
+          f"p95 {percentile(first, 0.95) * 1000:8.1f} ms")
+    print(f"time to full answer: median {statistics.median(total) * 1000:8.1f} ms, "
+          f"p95 {percentile(total, 0.95) * 1000:8.1f} ms")
+    print(f"wall time {wall:.2f}s, {sum(r[2] for r in results)} characters received")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Local stand-in for an OpenAI-compatible chat completions API.
+
+Usage:
+    python benchmarks/mock_llm_server.py [--port N] [--tokens N]
+        [--first-token-delay S] [--token-delay S]
+        [--fail-every N] [--fail-status CODE] [--retry-after S]
+        [--rpm N] [--window S]
+
+POST /v1/chat/completions answers every prompt with --tokens words, the
+first after --first-token-delay seconds and each further one after
+--token-delay seconds. With "stream": true in the request the words are
+sent as server-sent events in OpenAI's chunk format (ending with
+"data: [DONE]"), otherwise as one JSON completion once all are
+"generated". Connections are kept alive between requests.
+
+With --fail-every N every Nth request is answered with --fail-status
+(429 by default) instead, carrying a Retry-After header if --retry-after
+is given, to exercise the client's retries. With --rpm N, like the real
+APIs, requests beyond N in any --window seconds (60 by default) get a
+429 with a Retry-After until the window has room again.
+
+Point the app at it to exercise the model path offline:
+    CODEVISION_OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=mock \
+        CODEVISION_LLM_CACHE=0 python app.py
+"""
+import argparse
+import json
+import math
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class MockModelHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; don't let them wait on delayed ACKs
+    disable_nagle_algorithm = True
+    # Set by make_server()
+    tokens = 200
+    first_token_delay = 0.5
+    token_delay = 0.02
+    fail_every = 0
+    fail_status = 429
+    retry_after = None
+    rpm = 0
+    window = 60.0
+    # Requests seen by this server, for --fail-every and --rpm
+    served = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (ConnectionResetError, BrokenPipeError):
+            # Clients may hang up on a kept-alive connection at any time
+            pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _words(self, prompt):
+        # Deterministic text that varies with the prompt
+        seed = len(prompt)
+        for i in range(self.tokens):
+            if i == 0:
+                time.sleep(self.first_token_delay)
+            else:
+                time.sleep(self.token_delay)
+            yield f"word{(seed + i) % 1000} "
+
+    def _write_chunk(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_POST(self):
+        if self.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+            prompt = "".join(m.get("content", "") for m in request.get("messages", []))
+        except (ValueError, AttributeError):
+            self._send_json(400, {"error": {"message": "Invalid JSON body"}})
+            return
+        model = request.get("model", "mock")
+
+        status, retry_after = None, None
+        with self.served["lock"]:
+            self.served["count"] += 1
+            now = time.monotonic()
+            times = self.served["times"]
+            while times and times[0] <= now - self.window:
+                times.popleft()
+            if self.rpm and len(times) >= self.rpm:
+                self.served["limited"] += 1
+                status, retry_after = 429, math.ceil(times[0] + self.window - now)
+            elif self.fail_every and self.served["count"] % self.fail_every == 0:
+                status, retry_after = self.fail_status, self.retry_after
+            else:
+                times.append(now)
+        if status is not None:
+            body = json.dumps({"error": {"message": "Injected failure"}}).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            if retry_after is not None:
+                self.send_header("Retry-After", str(retry_after))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        if not request.get("stream"):
+            text = "".join(self._words(prompt))
+            self._send_json(200, {
+                "object": "chat.completion",
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                             "finish_reason": "stop"}],
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for word in self._words(prompt):
+            chunk = {"object": "chat.completion.chunk", "model": model,
+                     "choices": [{"index": 0, "delta": {"content": word}}]}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+
+def make_server(port=8765, tokens=200, first_token_delay=0.5, token_delay=0.02, host="127.0.0.1",
+                fail_every=0, fail_status=429, retry_after=None, rpm=0, window=60.0):
+    """Return a mock server (not yet serving) with its own copy of the settings."""
+    handler = type("ConfiguredMockModelHandler", (MockModelHandler,), {
+        "tokens": tokens,
+        "first_token_delay": first_token_delay,
+        "token_delay": token_delay,
+        "fail_every": fail_every,
+        "fail_status": fail_status,
+        "retry_after": retry_after,
+        "rpm": rpm,
+        "window": window,
+        "served": {"count": 0, "limited": 0, "times": deque(), "lock": threading.Lock()},
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    # Counters visible to the benchmarks
+    server.served = handler.served
+    return server
+
+
+def start_in_background(**kwargs):
+    """Start a mock server on a daemon thread; returns (server, base URL)."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a mock OpenAI-compatible chat API with configurable delays")
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    parser.add_argument("--tokens", type=int, default=200, help="Words per answer")
+    parser.add_argument("--first-token-delay", type=float, default=0.5, help="Seconds before the first word")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between further words")
+    parser.add_argument("--fail-every", type=int, default=0, help="Fail every Nth request (0: never)")
+    parser.add_argument("--fail-status", type=int, default=429, help="Status of the failed requests")
+    parser.add_argument("--retry-after", type=float, default=None, help="Retry-After seconds sent with failures")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests allowed per window (0: unlimited)")
+    parser.add_argument("--window", type=float, default=60.0, help="Rate limit window in seconds")
+    args = parser.parse_args()
+
+    server = make_server(args.port, args.tokens, args.first_token_delay, args.token_delay,
+                         fail_every=args.fail_every, fail_status=args.fail_status, retry_after=args.retry_after,
+                         rpm=args.rpm, window=args.window)
+    print(f"Mock model API on http://127.0.0.1:{args.port}/v1 "
+          f"({args.tokens} words, first after {args.first_token_delay}s, then every {args.token_delay}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
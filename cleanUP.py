@@ -1,5 +1,17 @@
+import argparse
 import os
 import shutil
+import time
+
+import llm_cache
+import project_cache
+from workspace import DEFAULT_WORKSPACE, WORKSPACES_DIR, Workspace
+
+INPUT_FOLDER = '/workspaces/CodeVision1/input'
+# Job results are only downloadable while the job is remembered (jobs.py)
+JOB_RESULT_MAX_AGE = int(os.getenv("CODEVISION_JOB_RETENTION", "3600"))
+# Uploads interrupted mid-stream leave .part files behind
+PARTIAL_UPLOAD_MAX_AGE = 3600
 
 def delete_folder(folder_path):
     if os.path.exists(folder_path):
@@ -24,7 +36,51 @@ def delete_zip_files_in_directory(directory_path):
     else:
         print(f"Directory does not exist: {directory_path}")
 
-if __name__ == "__main__":
+def delete_older_than(directory_path, max_age, suffix=None):
+    """Delete entries of directory_path not modified for max_age seconds."""
+    if not os.path.exists(directory_path):
+        return
+    cutoff = time.time() - max_age
+    for filename in os.listdir(directory_path):
+        path = os.path.join(directory_path, filename)
+        if suffix and not filename.endswith(suffix):
+            continue
+        try:
+            if os.path.getmtime(path) >= cutoff:
+                continue
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+            print(f"Successfully deleted: {path}")
+        except Exception as e:
+            print(f"Error deleting {path}: {e}")
+
+def job_dirs():
+    """Job result folders of the shared layout and of every project workspace."""
+    dirs = [DEFAULT_WORKSPACE.jobs_dir]
+    if os.path.isdir(WORKSPACES_DIR):
+        for name in sorted(os.listdir(WORKSPACES_DIR)):
+            dirs.append(Workspace(os.path.join(WORKSPACES_DIR, name)).jobs_dir)
+    return dirs
+
+def clean_up(max_age=project_cache.MAX_AGE_SECONDS, max_bytes=project_cache.MAX_BYTES):
+    """
+    Age- and size-based cleanup: drop cached projects that are stale or over
+    the size budget, project workspaces untouched for max_age, expired job
+    results, interrupted uploads and LLM responses over the cache limit.
+    Everything still in use is kept.
+    """
+    for archive_hash in project_cache.cleanup(max_age, max_bytes):
+        print(f"Removed cached project: {archive_hash}")
+    for jobs_dir in job_dirs():
+        delete_older_than(jobs_dir, JOB_RESULT_MAX_AGE)
+    delete_older_than(WORKSPACES_DIR, max_age)
+    delete_older_than(INPUT_FOLDER, PARTIAL_UPLOAD_MAX_AGE, suffix=".part")
+    llm_cache.evict()
+
+def clean_all():
+    """Delete every output folder and uploaded .zip."""
     paths_to_delete = [
         '/workspaces/CodeVision1/output/ZIP/Extracted',
         '/workspaces/CodeVision1/output/',
@@ -37,5 +93,18 @@ if __name__ == "__main__":
         delete_folder(path)
 
     # Delete .zip files under /workspaces/CodeVision1/input
-    input_folder = '/workspaces/CodeVision1/input'
-    delete_zip_files_in_directory(input_folder)
+    delete_zip_files_in_directory(INPUT_FOLDER)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Remove stale CodeVision outputs")
+    parser.add_argument("--all", action="store_true", help="Delete all outputs and uploads, cached or not")
+    parser.add_argument("--max-age-days", type=float, default=project_cache.MAX_AGE_SECONDS / 86400,
+                        help="Drop cached projects unused for this many days")
+    parser.add_argument("--max-mb", type=int, default=project_cache.MAX_BYTES // (1024 * 1024),
+                        help="Size budget of the project cache")
+    args = parser.parse_args()
+
+    if args.all:
+        clean_all()
+    else:
+        clean_up(int(args.max_age_days * 86400), args.max_mb * 1024 * 1024)
@@ -0,0 +1,179 @@
+import hashlib
+import json
+import os
+import threading
+from collections import deque
+
+INDEX_FILE = "code_index.json"
+
+
+class CodeIndex:
+    """Long-lived, in-memory view of code_index.json.
+
+    The JSON file is parsed once and kept in memory together with lookup
+    tables by method, class, file and call edge. Every access goes through
+    refresh(), which reloads the data only when the file on disk changed
+    (mtime/size first, content hash to confirm).
+
+    Call edges are kept as forward (caller -> callees) and reverse
+    (callee -> callers) adjacency maps keyed by method id, the bare method
+    name used in "method_calls". They are rebuilt whenever the index is
+    saved by a scan or reloaded from disk, and transitive queries over them
+    are memoized until the next rebuild.
+    """
+
+    def __init__(self, path=INDEX_FILE):
+        self.path = path
+        self.data = {}
+        self.version = None
+        self._stat = None
+        self._lock = threading.RLock()
+        self._methods = {}
+        self._methods_lower = {}
+        self._classes = {}
+        self._callees = {}
+        self._callers = {}
+        self._closure_cache = {}
+
+    def _file_stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _build_lookups(self):
+        methods, methods_lower, classes = {}, {}, {}
+        callees, callers = {}, {}
+        for file_path, file_data in self.data.items():
+            for method in file_data["methods"]:
+                methods.setdefault(method, []).append(file_path)
+                methods_lower.setdefault(method.lower(), []).append(file_path)
+            for class_name in file_data["classes"]:
+                classes.setdefault(class_name, []).append(file_path)
+            for caller, called in file_data["method_calls"]:
+                # dicts as ordered sets: one edge per pair, first-seen order
+                callees.setdefault(caller, {})[called] = None
+                callers.setdefault(called, {})[caller] = None
+        self._methods = methods
+        self._methods_lower = methods_lower
+        self._classes = classes
+        self._callees = {k: tuple(v) for k, v in callees.items()}
+        self._callers = {k: tuple(v) for k, v in callers.items()}
+        self._closure_cache = {}
+
+    def _closure(self, adjacency, direction, method_name, max_depth):
+        key = (direction, method_name, max_depth)
+        cached = self._closure_cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Breadth-first walk; the start node is only reported if a cycle
+        # leads back to it.
+        reached = {}
+        frontier = deque([(method_name, 0)])
+        while frontier:
+            node, depth = frontier.popleft()
+            if max_depth is not None and depth >= max_depth:
+                continue
+            for neighbour in adjacency.get(node, ()):
+                if neighbour not in reached:
+                    reached[neighbour] = depth + 1
+                    frontier.append((neighbour, depth + 1))
+
+        result = tuple(reached)
+        self._closure_cache[key] = result
+        return result
+
+    def load(self):
+        """(Re)load the index from disk unconditionally."""
+        with self._lock:
+            stat = self._file_stat()
+            with open(self.path, "rb") as json_file:
+                raw = json_file.read()
+            self.data = json.loads(raw.decode("utf-8"))
+            self.version = hashlib.sha256(raw).hexdigest()
+            self._stat = stat
+            self._build_lookups()
+        return self
+
+    def refresh(self):
+        """Reload the index if code_index.json changed since it was last read."""
+        with self._lock:
+            stat = self._file_stat()
+            if stat is None or stat == self._stat:
+                # Nothing on disk yet (first scan) or nothing changed
+                return self
+            if self._stat is not None:
+                # mtime moved but the content may be identical (e.g. touched or
+                # rewritten with the same scan result); confirm with the hash.
+                with open(self.path, "rb") as json_file:
+                    raw = json_file.read()
+                if hashlib.sha256(raw).hexdigest() == self.version:
+                    self._stat = stat
+                    return self
+            return self.load()
+
+    def save(self, data):
+        """Write data to code_index.json and keep it as the in-memory copy."""
+        with self._lock:
+            raw = json.dumps(data, indent=4).encode("utf-8")
+            with open(self.path, "wb") as json_file:
+                json_file.write(raw)
+            # Round-trip so the in-memory copy has exactly the on-disk shape.
+            self.data = json.loads(raw.decode("utf-8"))
+            self.version = hashlib.sha256(raw).hexdigest()
+            self._stat = self._file_stat()
+            self._build_lookups()
+        return self
+
+    def files(self):
+        """Return the indexed file paths in index order."""
+        return list(self.data)
+
+    def file(self, file_path):
+        """Return the index entry for a file, or None."""
+        return self.data.get(file_path)
+
+    def files_for_method(self, method_name, ignore_case=False):
+        """Return the files that define method_name."""
+        if ignore_case:
+            return list(self._methods_lower.get(method_name.lower(), []))
+        return list(self._methods.get(method_name, []))
+
+    def files_for_class(self, class_name):
+        """Return the files that define class_name."""
+        return list(self._classes.get(class_name, []))
+
+    def callees(self, method_name):
+        """Return the methods called directly by method_name, in call order."""
+        return list(self._callees.get(method_name, ()))
+
+    def callers(self, method_name):
+        """Return the methods that call method_name directly."""
+        return list(self._callers.get(method_name, ()))
+
+    def transitive_callees(self, method_name, max_depth=None):
+        """Return every method reachable from method_name, nearest first.
+
+        max_depth limits the number of call edges followed (1 == callees()).
+        """
+        return list(self._closure(self._callees, "callees", method_name, max_depth))
+
+    def transitive_callers(self, method_name, max_depth=None):
+        """Return every method that reaches method_name, nearest first."""
+        return list(self._closure(self._callers, "callers", method_name, max_depth))
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_code_index(path=INDEX_FILE):
+    """Return the shared CodeIndex for path, reloading it if the file changed."""
+    key = os.path.abspath(path)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = _indexes[key] = CodeIndex(path)
+    return index.refresh()
@@ -0,0 +1,194 @@
+import os
+import re
+
+from code_index import get_code_index, INDEX_FILE
+from retrieval import class_skeleton
+from tokens import count_tokens
+
+# The code sent with an analysis prompt, cut from the index's class and
+# method spans instead of whole files: the target itself (a method's full
+# text inside its class header, or a class's full text), the usings of its
+# files, and then the signatures of the methods it calls and of the methods
+# calling it, nearest first, as long as they fit the token budget. The
+# prompt no longer grows with the size of the files around the target.
+SLICE_TOKENS = int(os.getenv("CODEVISION_SLICE_TOKENS", "3000"))
+
+_BODY_OPENER = re.compile(r"\s*(?:\{|=>)$")
+
+
+def _line_start(code, offset):
+    # Keep the indentation of the first line
+    return code.rfind("\n", 0, offset) + 1
+
+
+def signature(code, method_span):
+    """Return a method's declaration without its body."""
+    if method_span["body_start"] is None:
+        return code[method_span["start"]:method_span["end"]].strip()
+    text = code[method_span["start"]:method_span["body_start"]].rstrip()
+    return _BODY_OPENER.sub("", text) + ";"
+
+
+def _class_header(code, class_span):
+    return code[_line_start(code, class_span["start"]):class_span["body_start"]]
+
+
+def _enclosing_class(class_spans, method_span):
+    enclosing = None
+    for class_span in class_spans:
+        if (class_span["name"] == method_span["class"]
+                and class_span["start"] <= method_span["start"] < class_span["end"]):
+            # The innermost one wins
+            if enclosing is None or class_span["start"] > enclosing["start"]:
+                enclosing = class_span
+    return enclosing
+
+
+class _Sources:
+    """File texts read once per slice."""
+
+    def __init__(self):
+        self._texts = {}
+
+    def get(self, file_path):
+        if file_path not in self._texts:
+            try:
+                with open(file_path, "r", encoding="utf-8") as f:
+                    self._texts[file_path] = f.read()
+            except FileNotFoundError:
+                self._texts[file_path] = None
+        return self._texts[file_path]
+
+
+def _target_sections(code_index, sources, target_name, target_type, files):
+    """Yield (file, usings, target text, index entry, file text) for each file defining the target."""
+    for file_path in files:
+        entry = code_index.file(file_path)
+        code = sources.get(file_path)
+        if entry is None or code is None:
+            continue
+        usings = "".join(f"using {name};\n" for name in entry["dependencies"])
+        if target_type == 'class':
+            parts = []
+            for class_span in entry["class_spans"]:
+                if class_span["name"] == target_name:
+                    parts.append(code[_line_start(code, class_span["start"]):class_span["end"]])
+            if parts:
+                yield file_path, usings, "\n\n".join(parts), entry, code
+        else:
+            by_class = {}
+            for method_span in entry["method_spans"]:
+                if method_span["name"].lower() != target_name.lower():
+                    continue
+                class_span = _enclosing_class(entry["class_spans"], method_span)
+                text = code[_line_start(code, method_span["start"]):method_span["end"]]
+                key = (class_span["start"], _class_header(code, class_span)) if class_span else (None, "")
+                by_class.setdefault(key, []).append(text)
+            parts = []
+            for (_, header), methods in by_class.items():
+                if header:
+                    indent = header[:len(header) - len(header.lstrip(" \t"))]
+                    parts.append(header + "\n" + "\n\n".join(methods) + f"\n{indent}}}")
+                else:
+                    parts.extend(methods)
+            if parts:
+                yield file_path, usings, "\n\n".join(parts), entry, code
+
+
+def _own_methods(code_index, target_name, target_type, files):
+    """Names of the target's methods: a class's methods, or the method as spelled in the code."""
+    own = set()
+    for file_path in files:
+        entry = code_index.file(file_path)
+        if entry is None:
+            continue
+        for span in entry["method_spans"]:
+            if target_type == 'class':
+                if span["class"] == target_name:
+                    own.add(span["name"])
+            elif span["name"].lower() == target_name.lower():
+                own.add(span["name"])
+    return own
+
+
+def _neighbours(code_index, own):
+    """Callees then callers of the methods in own, direct ones first, each name once."""
+    starts = sorted(own)
+    direct_callees, direct_callers, callees, callers = {}, {}, {}, {}
+    for name in starts:
+        direct_callees.update(dict.fromkeys(code_index.callees(name)))
+        direct_callers.update(dict.fromkeys(code_index.callers(name)))
+        callees.update(dict.fromkeys(code_index.transitive_callees(name)))
+        callers.update(dict.fromkeys(code_index.transitive_callers(name)))
+
+    seen = set()
+    for label, names in (("calls", direct_callees), ("called by", direct_callers),
+                         ("calls", callees), ("called by", callers)):
+        for name in names:
+            if name not in own and (label, name) not in seen:
+                seen.add((label, name))
+                yield label, name
+
+
+def slice_target(target_name, target_type='method', files=None, index_path=INDEX_FILE, token_budget=SLICE_TOKENS):
+    """
+    Return the code to analyze for a class or method, cut to a token budget.
+
+    The target's own code always goes in (a method whole, inside its class
+    header; a class whole, or with its method bodies elided if it does not
+    fit). Signatures of the methods it calls and that call it, directly or
+    through others, fill what is left of the budget, nearest first.
+
+    Args:
+        target_name (str): Class or method name
+        target_type (str, optional): 'method' or 'class'
+        files (list, optional): The files defining the target (default: from the index)
+        index_path (str, optional): The project's code_index.json
+        token_budget (int, optional): Tokens the slice may use
+
+    Returns:
+        str: The slice, or None if the target is not in any of the files
+    """
+    code_index = get_code_index(index_path)
+    if files is None:
+        if target_type == 'class':
+            files = code_index.files_for_class(target_name)
+        else:
+            files = code_index.files_for_method(target_name, ignore_case=True)
+    sources = _Sources()
+
+    sections = []
+    for file_path, usings, text, entry, code in _target_sections(code_index, sources, target_name, target_type, files):
+        section = f"// File: {file_path}\n{usings}\n{text}"
+        if target_type == 'class' and count_tokens(section) > token_budget:
+            skeletons = [code[_line_start(code, span["start"]):span["start"]]
+                         + class_skeleton(code, span, entry["method_spans"])
+                         for span in entry["class_spans"] if span["name"] == target_name]
+            section = f"// File: {file_path}\n{usings}\n" + "\n\n".join(skeletons)
+        sections.append(section)
+    if not sections:
+        return None
+    used = sum(count_tokens(section) for section in sections)
+
+    related = []
+    for label, name in _neighbours(code_index, _own_methods(code_index, target_name, target_type, files)):
+        for file_path in code_index.files_for_method(name):
+            entry = code_index.file(file_path)
+            code = sources.get(file_path)
+            if code is None:
+                continue
+            for method_span in entry["method_spans"]:
+                if method_span["name"] != name:
+                    continue
+                text = (f"// {label}: {method_span['class']}.{name} "
+                        f"({os.path.basename(file_path)}:{method_span['start_line']})\n"
+                        f"{signature(code, method_span)}")
+                tokens = count_tokens(text)
+                if used + tokens > token_budget:
+                    continue
+                related.append(text)
+                used += tokens
+
+    if related:
+        sections.append(f"// Related methods of {target_name} (signatures only)\n" + "\n".join(related))
+    return "\n\n".join(sections)
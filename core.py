@@ -1,30 +1,58 @@
 import os
 import json
+import hashlib
 import re
-import google.generativeai as genai
-import networkx as nx
-import matplotlib.pyplot as plt
-import tiktoken
-
-# Configure Gemini API
-genai.configure(api_key="GEMINI_API_KEY")
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import project_cache
+from code_index import get_code_index, INDEX_FILE
+from context_slicer import slice_target
+from csharp_parser import parse_csharp
+from project_fs import archive_hash_of
+from workspace import DEFAULT_WORKSPACE
+from method_list import build_method_list, method_list_path, save_method_list
+from dependency_graph import render_graph
+from embedding_index import get_embeddings
+from providers import generate, generate_stream
+
+# Decision points counted by calculate_cyclomatic_complexity, in metrics order
+COMPLEXITY_PATTERNS = {
+    "if_statements": r'\bif\s*\(',
+    "else_statements": r'\belse\s*{',
+    "elif_statements": r'\belse\s+if\s*\(',
+    "switch_statements": r'\bswitch\s*\(',
+    "case_branches": r'\bcase\s+[\w\d_.]+:',
+    "while_loops": r'\bwhile\s*\(',
+    "for_loops": r'\bfor\s*\(',
+    "do_while_loops": r'\bdo\s*{',
+    "foreach_loops": r'\bforeach\s*\(',
+    "try_catch_blocks": r'\bcatch\s*[({\s]',
+    "conditional_ops": r'\?\s*[\w\d_.]+\s*:',  # Ternary operators
+    "logical_ops": r'(?:&&|\|\|)'  # Logical AND/OR operators
+}
+
+# All patterns fused into one scan. Each alternative sits in a lookahead so
+# different kinds may overlap (`else if (` is an elif and an if), just as
+# they did when every pattern ran its own findall. No two patterns can
+# match at the same position, so the alternation order does not matter.
+# The leading class (every pattern's first character) lets the engine skip
+# most positions without trying the twelve alternatives.
+COMPLEXITY_SCAN = re.compile(
+    "(?=[cdefisw?&|])(?=" + "|".join(f"(?P<{name}>{pattern})" for name, pattern in COMPLEXITY_PATTERNS.items()) + ")"
+)
 
 def calculate_cyclomatic_complexity(code):
     # Count decision points and store metrics
-    metrics = {
-        "if_statements": len(re.findall(r'\bif\s*\(', code)),
-        "else_statements": len(re.findall(r'\belse\s*{', code)),
-        "elif_statements": len(re.findall(r'\belse\s+if\s*\(', code)),
-        "switch_statements": len(re.findall(r'\bswitch\s*\(', code)),
-        "case_branches": len(re.findall(r'\bcase\s+[\w\d_.]+:', code)),
-        "while_loops": len(re.findall(r'\bwhile\s*\(', code)),
-        "for_loops": len(re.findall(r'\bfor\s*\(', code)),
-        "do_while_loops": len(re.findall(r'\bdo\s*{', code)),
-        "foreach_loops": len(re.findall(r'\bforeach\s*\(', code)),
-        "try_catch_blocks": len(re.findall(r'\bcatch\s*[({\s]', code)),
-        "conditional_ops": len(re.findall(r'\?\s*[\w\d_.]+\s*:', code)),  # Ternary operators
-        "logical_ops": len(re.findall(r'(?:&&|\|\|)', code))  # Logical AND/OR operators
-    }
+    metrics = dict.fromkeys(COMPLEXITY_PATTERNS, 0)
+    match_end = dict.fromkeys(COMPLEXITY_PATTERNS, 0)
+    for match in COMPLEXITY_SCAN.finditer(code):
+        name = match.lastgroup
+        # findall never returns overlapping matches of the same pattern
+        if match.start(name) >= match_end[name]:
+            metrics[name] += 1
+            match_end[name] = match.end(name)
 
     # Calculate complexity
     # Base complexity is 1
@@ -33,26 +61,16 @@ def calculate_cyclomatic_complexity(code):
 
     return complexity, metrics
 
-def calculate_class_complexity(code, class_name):
-    """Calculate complexity metrics for a specific class."""
-    # Find the class block
-    class_pattern = rf'class\s+{class_name}\s*{{([^{{}}]*(?:{{[^{{}}]*}}[^{{}}]*)*)}}'
-    class_match = re.search(class_pattern, code, re.DOTALL)
-    
-    if not class_match:
-        return None, None
-        
-    class_code = class_match.group(1)
-    
-    # Calculate basic class metrics
+def class_complexity_from_info(class_info):
+    """Calculate complexity metrics for a class parsed by csharp_parser."""
     class_metrics = {
-        "properties": len(re.findall(r'(?:public|private|protected)\s+\w+\s+\w+\s*{(?:\s*get\s*;\s*set\s*;|\s*{\s*.*?\s*}\s*)*\s*}', class_code)),
-        "methods": len(re.findall(r'(?:public|private|protected)\s+\w+\s+\w+\s*\(.*?\)\s*{', class_code)),
-        "fields": len(re.findall(r'(?:public|private|protected)\s+\w+\s+\w+\s*;', class_code)),
-        "nested_classes": len(re.findall(r'class\s+\w+', class_code)),
-        "interfaces_implemented": len(re.findall(r':\s*([^{]+)', class_code.split('\n')[0])),
+        "properties": class_info["properties"],
+        "methods": len(class_info["methods"]),
+        "fields": class_info["fields"],
+        "nested_classes": len(class_info["nested"]),
+        "interfaces_implemented": len(class_info["bases"]),
     }
-    
+
     # Calculate weighted class complexity
     complexity = (
         class_metrics["properties"] * 0.5 +
@@ -61,31 +79,41 @@ def calculate_class_complexity(code, class_name):
         class_metrics["nested_classes"] * 2.0 +
         class_metrics["interfaces_implemented"] * 0.5
     )
-    
+
     return complexity, class_metrics
 
-# Function to extract classes, methods, function calls, and dependencies
-def parse_csharp_code(file_path):
-    with open(file_path, "r", encoding="utf-8") as file:
-        code = file.read()
+def calculate_class_complexity(code, class_name):
+    """Calculate complexity metrics for a specific class."""
+    for class_info in parse_csharp(code)["classes"]:
+        if class_info["name"] == class_name:
+            return class_complexity_from_info(class_info)
+    return None, None
 
-    # Existing patterns
-    classes = re.findall(r'class\s+(\w+)', code)
-    methods = re.findall(r'(public|private|protected)?\s*(\w+)\s+(\w+)\s*\(.*\)', code)
-    dependencies = re.findall(r'using\s+([\w\.]+);', code)
+# Function to extract classes, methods, function calls, and dependencies
+def parse_csharp_code(file_path, code=None):
+    if code is None:
+        with open(file_path, "r", encoding="utf-8") as file:
+            code = file.read()
+
+    # One tokenizer walk gives types, methods (with spans), usings and calls
+    parsed = parse_csharp(code)
+    type_infos = [c for c in parsed["classes"] if c["kind"] != "enum"]
+    classes = [c["name"] for c in type_infos]
+    methods = [m["name"] for m in parsed["methods"]]
+    dependencies = parsed["usings"]
 
     # Calculate complexity for each method
     method_complexities = {}
     method_metrics = {}
-    for method in methods:
-        method_name = method[2]
-        method_pattern = rf'{method_name}\s*\([^)]*\)\s*{{([^{{}}]*(?:{{[^{{}}]*}}[^{{}}]*)*)}}'
-        method_matches = re.findall(method_pattern, code, re.DOTALL)
-        if method_matches:
-            method_code = method_matches[0]
-            complexity, metrics = calculate_cyclomatic_complexity(method_code)
-            method_complexities[method_name] = complexity
-            method_metrics[method_name] = metrics
+    for method in parsed["methods"]:
+        method_name = method["name"]
+        # Overloads share a name; the first body wins
+        if method["body_start"] is None or method_name in method_complexities:
+            continue
+        method_code = code[method["body_start"]:method["body_end"]]
+        complexity, metrics = calculate_cyclomatic_complexity(method_code)
+        method_complexities[method_name] = complexity
+        method_metrics[method_name] = metrics
 
     # Calculate overall complexity and metrics
     overall_complexity, overall_metrics = calculate_cyclomatic_complexity(code)
@@ -93,28 +121,29 @@ def parse_csharp_code(file_path):
     # Calculate class complexities
     class_complexities = {}
     class_metrics = {}
-    for class_name in classes:
-        complexity, metrics = calculate_class_complexity(code, class_name)
+    for class_info in type_infos:
+        complexity, metrics = class_complexity_from_info(class_info)
         if complexity:
-            class_complexities[class_name] = complexity
-            class_metrics[class_name] = metrics
+            class_complexities[class_info["name"]] = complexity
+            class_metrics[class_info["name"]] = metrics
 
     # Extract method calls
-    method_calls = []
-    method_call_pattern = r'(\w+)\s*\((.*?)\)\s*;?'
-    for method_name in methods:
-        method_code = re.findall(rf'\b{method_name[2]}\b.*?{{(.*?)}}', code, re.DOTALL)
-        if method_code:
-            called_methods = re.findall(method_call_pattern, method_code[0])
-            for called_method in called_methods:
-                method_calls.append((method_name[2], called_method[0]))
+    method_calls = [(caller, called) for caller, called, _ in parsed["calls"]]
 
     return {
         "file": file_path,
         "classes": classes,
-        "methods": [m[2] for m in methods],
+        "methods": methods,
         "dependencies": dependencies,
         "method_calls": method_calls,
+        "class_spans": [
+            {key: c[key] for key in ("name", "kind", "parent", "start", "body_start", "end", "start_line", "end_line")}
+            for c in parsed["classes"]
+        ],
+        "method_spans": [
+            {key: m[key] for key in ("name", "class", "start", "body_start", "body_end", "end", "start_line", "end_line")}
+            for m in parsed["methods"]
+        ],
         "cyclomatic_complexity": {
             "overall": overall_complexity,
             "overall_metrics": overall_metrics,
@@ -125,97 +154,217 @@ def parse_csharp_code(file_path):
         }
     }
 
-# Step 1: Scan the entire project and store relationships
-def scan_project(directory):
-    project_data = {}
-
+# Below this many files a process pool costs more than it saves
+PARALLEL_SCAN_MIN_FILES = 32
+
+# Parser processes are started once and reused by every scan. They are
+# spawned rather than forked: the server forks from a process with running
+# threads, which a child can inherit holding a lock.
+_scan_pool = None
+_scan_pool_workers = 0
+_scan_pool_lock = threading.Lock()
+
+
+def _get_scan_pool(workers):
+    """Return the shared parser pool, (re)creating it for a different worker count."""
+    global _scan_pool, _scan_pool_workers
+    with _scan_pool_lock:
+        if _scan_pool is not None and _scan_pool_workers != workers:
+            _scan_pool.shutdown(wait=False)
+            _scan_pool = None
+        if _scan_pool is None:
+            _scan_pool = ProcessPoolExecutor(max_workers=workers,
+                                             mp_context=multiprocessing.get_context("spawn"))
+            _scan_pool_workers = workers
+        return _scan_pool
+
+
+def shutdown_scan_pool(wait=True):
+    """Stop the parser processes; the next parallel scan starts new ones."""
+    global _scan_pool
+    with _scan_pool_lock:
+        pool, _scan_pool = _scan_pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait)
+
+def find_cs_files(directory):
+    """Return every .cs file under directory, sorted so scans are deterministic."""
+    cs_files = []
     for root, _, files in os.walk(directory):
         for file in files:
             if file.endswith(".cs"):
-                file_path = os.path.join(root, file)
-                file_data = parse_csharp_code(file_path)
-                project_data[file_path] = file_data
+                cs_files.append(os.path.join(root, file))
+    return sorted(cs_files)
+
+def scan_file(file_path):
+    """
+    Parse one file and stamp the entry with its content hash, mtime and size.
+    Returns None for a file that is not UTF-8, which is left out of the index.
+    """
+    with open(file_path, "rb") as file:
+        raw = file.read()
+    stat = os.stat(file_path)
+    try:
+        # Same newline handling as a text-mode read
+        code = raw.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+    except UnicodeDecodeError as e:
+        print(f"Error reading {file_path}: {e}")
+        return None
+    file_data = parse_csharp_code(file_path, code)
+    file_data["content_hash"] = hashlib.sha256(raw).hexdigest()
+    file_data["mtime"] = stat.st_mtime
+    file_data["size"] = stat.st_size
+    return file_data
+
+def _hash_file(file_path):
+    with open(file_path, "rb") as file:
+        return hashlib.sha256(file.read()).hexdigest()
+
+# Step 1: Scan the entire project and store relationships
+def update_project_index(directory, workers=None, incremental=True, index_path=INDEX_FILE):
+    """
+    Bring the code index up to date with the .cs files under directory.
 
-    with open("code_index.json", "w", encoding="utf-8") as json_file:
-        json.dump(project_data, json_file, indent=4)
+    Files whose mtime and size match their index entry are reused as-is;
+    files whose mtime moved but whose content hash did not are reused with
+    the new mtime. Only added and changed files are parsed again. Files
+    that are not UTF-8 are left out of the index.
 
+    Args:
+        directory (str): Project root to scan
+        workers (int, optional): Number of parser processes. Defaults to the
+            CPU count; 1 (or a small batch of files) parses in-process.
+        incremental (bool, optional): Reuse unchanged entries from the
+            current index. False re-parses everything.
+        index_path (str, optional): The project's code_index.json
+
+    Returns:
+        tuple: (index dict keyed by file path in sorted order,
+                {"added": [...], "changed": [...], "removed": [...]})
+    """
+    cs_files = find_cs_files(directory)
+    code_index = get_code_index(index_path)
+    previous = code_index.data if incremental else {}
+
+    project_data = {}
+    changes = {"added": [], "changed": [], "removed": []}
+    to_parse = []
+    touched = False
+    for file_path in cs_files:
+        entry = previous.get(file_path)
+        if entry is None:
+            changes["added"].append(file_path)
+            to_parse.append(file_path)
+            continue
+        stat = os.stat(file_path)
+        if entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size:
+            project_data[file_path] = entry
+        elif entry.get("content_hash") == _hash_file(file_path):
+            project_data[file_path] = dict(entry, mtime=stat.st_mtime, size=stat.st_size)
+            touched = True
+        else:
+            changes["changed"].append(file_path)
+            to_parse.append(file_path)
+    scanned = set(cs_files)
+    changes["removed"] = [file_path for file_path in previous if file_path not in scanned]
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+
+    if workers > 1 and len(to_parse) >= PARALLEL_SCAN_MIN_FILES:
+        chunksize = max(1, len(to_parse) // (workers * 4))
+        # map() yields in submission order, so the index order does not
+        # depend on which worker finishes first.
+        try:
+            results = list(_get_scan_pool(workers).map(scan_file, to_parse, chunksize=chunksize))
+        except BrokenProcessPool:
+            # A worker died; drop the pool so the next scan starts a new one
+            shutdown_scan_pool(wait=False)
+            raise
+    else:
+        results = [scan_file(file_path) for file_path in to_parse]
+
+    for file_path, file_data in zip(to_parse, results):
+        if file_data is not None:
+            project_data[file_path] = file_data
+            continue
+        # Unreadable files are skipped; one that was indexed before counts as removed
+        for kind in ("added", "changed"):
+            if file_path in changes[kind]:
+                changes[kind].remove(file_path)
+        if file_path in previous:
+            changes["removed"].append(file_path)
+    project_data = {file_path: project_data[file_path] for file_path in cs_files if file_path in project_data}
+
+    if to_parse or touched or changes["removed"] or not incremental:
+        code_index.save(project_data)
+
+    return project_data, changes
+
+def scan_project(directory, workers=None, incremental=True, index_path=INDEX_FILE):
+    """Update the code index for directory and return it (see update_project_index)."""
+    project_data, _ = update_project_index(directory, workers, incremental, index_path)
     return project_data
 
 # Step 2: Retrieve relevant code (Now includes cross-file context)
-def retrieve_related_methods(function_name, visited_methods=None):
+def retrieve_related_methods(function_name, visited_methods=None, max_depth=None, index_path=INDEX_FILE):
     if visited_methods is None:
         visited_methods = set()
 
-    with open("code_index.json", "r", encoding="utf-8") as json_file:
-        code_data = json.load(json_file)
+    code_index = get_code_index(index_path)
 
-    related_methods = set()
-    
-    # Find methods that directly contain the requested method
-    for file_data in code_data.values():
-        for method, called_method in file_data["method_calls"]:
-            if method == function_name and called_method not in visited_methods:
-                visited_methods.add(called_method)
-                related_methods.add(called_method)
-                # Recursively find methods called by this method
-                related_methods.update(retrieve_related_methods(called_method, visited_methods))
+    # Methods called by the requested method, directly or transitively
+    related_methods = set(code_index.transitive_callees(function_name, max_depth)) - visited_methods
+    visited_methods.update(related_methods)
 
     return related_methods
 
-def retrieve_relevant_code(target_name, target_type='method'):
-    with open("code_index.json", "r", encoding="utf-8") as json_file:
-        code_data = json.load(json_file)
+def retrieve_relevant_code(target_name, target_type='method', index_path=INDEX_FILE):
+    code_index = get_code_index(index_path)
 
     relevant_files = []
     all_related_items = set()
 
-    for file, file_data in code_data.items():
-        if target_type == 'class':
-            if target_name in file_data["classes"]:
+    if target_type == 'class':
+        for file in code_index.files_for_class(target_name):
+            if file in relevant_files:
+                continue
+            relevant_files.append(file)
+            all_related_items.add(target_name)
+            # Add all methods of this class
+            for method in code_index.file(file)["methods"]:
+                if method.startswith(f"{target_name}."):
+                    all_related_items.add(method)
+    else:  # method
+        # Fix: Case-insensitive comparison for more robust matching
+        for file in code_index.files_for_method(target_name, ignore_case=True):
+            if file not in relevant_files:
                 relevant_files.append(file)
-                all_related_items.add(target_name)
-                # Add all methods of this class
-                for method in file_data["methods"]:
-                    if method.startswith(f"{target_name}."):
-                        all_related_items.add(method)
-        else:  # method
-            for method in file_data["methods"]:
-                # Fix: Case-insensitive comparison for more robust matching
-                if method.lower() == target_name.lower():
-                    relevant_files.append(file)
-                    all_related_items.add(target_name)
-                    all_related_items.update(retrieve_related_methods(target_name))
-                    break
+        if relevant_files:
+            all_related_items.add(target_name)
+            all_related_items.update(retrieve_related_methods(target_name, index_path=index_path))
 
     if not relevant_files:
         return None, []
 
-    combined_code = ""
-    for file in relevant_files:
-        with open(file, "r", encoding="utf-8") as f:
-            combined_code += f"\n\n// File: " + file + "\n" + f.read()
+    # Only the target and the signatures around it, not the whole files
+    code_slice = slice_target(target_name, target_type, relevant_files, index_path)
+    if code_slice is None:
+        return None, []
 
-    return combined_code, list(all_related_items)
+    return code_slice, list(all_related_items)
 
 
 # Step 3: Retrieve code context using Gemini Flash
-def get_code_summary(code_snippet, target_name=None, target_type='method'):
+SUMMARY_MODEL = "gemini-2.0-flash"
+
+def summary_prompt(code_snippet, target_name=None, target_type='method', index_path=INDEX_FILE):
     """
-    Enhanced code analysis for refactoring decision support.
-    
-    Args:
-        code_snippet (str): The code to analyze
-        target_name (str, optional): The name of the method or class to analyze
-        target_type (str, optional): The type of the target ('method' or 'class')
-    
+    Build the refactoring analysis prompt for a target.
+
     Returns:
-        dict: Structured analysis results
+        tuple: (analysis data without the model's answer, prompt)
     """
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        print("Error: Gemini API key is not set.")
-        return None
-
     analysis_data = {
         "target_name": target_name,
         "complexity_metrics": {},
@@ -225,46 +374,39 @@ def get_code_summary(code_snippet, target_name=None, target_type='method'):
         "summary": ""
     }
 
-    try:
-        # Get method mapping and complexity metrics
-        with open("code_index.json", "r", encoding="utf-8") as json_file:
-            code_data = json.load(json_file)
-            
-        if target_name:
-            # Analyze callers
-            callers = []
-            for file_data in code_data.values():
-                for caller, called in file_data["method_calls"]:
-                    if called == target_name:
-                        callers.append(caller)
-            analysis_data["dependencies"] = callers
-
-            # Get complexity metrics based on target type
-            for file_data in code_data.values():
-                if target_type == 'class' and target_name in file_data["classes"]:
-                    complexity = file_data["cyclomatic_complexity"]
-                    class_complexity = complexity["per_class"].get(target_name, 'N/A')
-                    class_metrics = complexity["per_class_metrics"].get(target_name, {})
-                    analysis_data["complexity_metrics"] = {
-                        "class_complexity": class_complexity,
-                        "detailed_metrics": class_metrics,
-                        "methods": {
-                            method: complexity["per_method"].get(method, 'N/A')
-                            for method in file_data["methods"]
-                            if method.startswith(f"{target_name}.")
-                        }
-                    }
-                elif target_type == 'method' and target_name in file_data["methods"]:
-                    complexity = file_data["cyclomatic_complexity"]
-                    method_complexity = complexity["per_method"].get(target_name, 'N/A')
-                    method_metrics = complexity["per_method_metrics"].get(target_name, {})
-                    analysis_data["complexity_metrics"] = {
-                        "cyclomatic_complexity": method_complexity,
-                        "detailed_metrics": method_metrics
+    # Get method mapping and complexity metrics
+    code_index = get_code_index(index_path)
+        
+    if target_name:
+        # Analyze callers
+        analysis_data["dependencies"] = code_index.callers(target_name)
+
+        # Get complexity metrics based on target type
+        for file_data in code_index.data.values():
+            if target_type == 'class' and target_name in file_data["classes"]:
+                complexity = file_data["cyclomatic_complexity"]
+                class_complexity = complexity["per_class"].get(target_name, 'N/A')
+                class_metrics = complexity["per_class_metrics"].get(target_name, {})
+                analysis_data["complexity_metrics"] = {
+                    "class_complexity": class_complexity,
+                    "detailed_metrics": class_metrics,
+                    "methods": {
+                        method: complexity["per_method"].get(method, 'N/A')
+                        for method in file_data["methods"]
+                        if method.startswith(f"{target_name}.")
                     }
-
-        # Update the prompt to include appropriate metrics
-        prompt = f"""Analyze this {target_type} and provide:
+                }
+            elif target_type == 'method' and target_name in file_data["methods"]:
+                complexity = file_data["cyclomatic_complexity"]
+                method_complexity = complexity["per_method"].get(target_name, 'N/A')
+                method_metrics = complexity["per_method_metrics"].get(target_name, {})
+                analysis_data["complexity_metrics"] = {
+                    "cyclomatic_complexity": method_complexity,
+                    "detailed_metrics": method_metrics
+                }
+
+    # Update the prompt to include appropriate metrics
+    prompt = f"""Analyze this {target_type} and provide:
 1. Brief summary
 2. Code smells identified
 3. Specific refactoring suggestions
@@ -280,63 +422,215 @@ Current metrics:
 Additional context for {target_type}:
 - {'Class methods and their complexities' if target_type == 'class' else 'Method details'}
 """
+    return analysis_data, prompt
 
-        encoder = tiktoken.get_encoding("cl100k_base")
-        prompt_tokens = len(encoder.encode(prompt))
-        print(f"Number of tokens in the prompt: {prompt_tokens}")
-
-        # Get AI analysis
-        genai.configure(api_key=api_key)
-        model = genai.GenerativeModel(model_name="gemini-2.0-flash")
-        response = model.generate_content(prompt)
+def apply_summary(analysis_data, response_text):
+    """Fill in the model's answer and the code smells and suggestions found in it."""
+    if response_text:
+        analysis_data["summary"] = response_text
+        
+        # Extract structured information from response
+        # (You might want to add more structure to the prompt to get more structured responses)
+        code_smells = re.findall(r"Code smell[s]?:(.*?)(?=\n\n|\Z)", response_text, re.DOTALL)
+        refactoring = re.findall(r"Refactoring suggestion[s]?:(.*?)(?=\n\n|\Z)", response_text, re.DOTALL)
         
-        if response:
-            analysis_data["summary"] = response.text
-            
-            # Extract structured information from response
-            # (You might want to add more structure to the prompt to get more structured responses)
-            code_smells = re.findall(r"Code smell[s]?:(.*?)(?=\n\n|\Z)", response.text, re.DOTALL)
-            refactoring = re.findall(r"Refactoring suggestion[s]?:(.*?)(?=\n\n|\Z)", response.text, re.DOTALL)
-            
-            analysis_data["code_smells"] = [smell.strip() for smell in code_smells]
-            analysis_data["refactoring_suggestions"] = [ref.strip() for ref in refactoring]
-
-        return analysis_data
+        analysis_data["code_smells"] = [smell.strip() for smell in code_smells]
+        analysis_data["refactoring_suggestions"] = [ref.strip() for ref in refactoring]
+    return analysis_data
+
+def complete_summary(analysis_data, prompt):
+    """Ask the model for the analysis in one call; returns the filled analysis data, or None."""
+    try:
+        # Get AI analysis (identical prompts are served from the response cache)
+        response_text = generate(SUMMARY_MODEL, prompt)
+        if response_text is None:
+            return None
+
+        return apply_summary(analysis_data, response_text)
 
     except Exception as e:
         print(f"Error in code analysis: {e}")
         return None
 
+def get_code_summary(code_snippet, target_name=None, target_type='method', index_path=INDEX_FILE):
+    """
+    Enhanced code analysis for refactoring decision support.
+    
+    Args:
+        code_snippet (str): The code to analyze
+        target_name (str, optional): The name of the method or class to analyze
+        target_type (str, optional): The type of the target ('method' or 'class')
+        index_path (str, optional): The project's code_index.json
+    
+    Returns:
+        dict: Structured analysis results
+    """
+    try:
+        analysis_data, prompt = summary_prompt(code_snippet, target_name, target_type, index_path)
+    except Exception as e:
+        print(f"Error in code analysis: {e}")
+        return None
+    return complete_summary(analysis_data, prompt)
+
 
 # Step 4: Visualize Dependencies
-import json
-import networkx as nx
-import matplotlib.pyplot as plt
+def graph_path(target=None, graphs_dir=DEFAULT_WORKSPACE.graphs_dir):
+    """Return where visualize_dependencies() saves the graph for target."""
+    filename = f"dependencies_graph_{target}.png" if target else "dependencies_graph.png"
+    return os.path.join(graphs_dir, filename)
+
+def visualize_dependencies(target=None, index_path=INDEX_FILE, graphs_dir=DEFAULT_WORKSPACE.graphs_dir):
+    """Draw the dependency graph around target (the whole project if None); returns the PNG path."""
+    return render_graph(graph_path(target, graphs_dir), index_path, target)
+
+
+PROJECT_DIR = "/workspaces/CodeVision1/output/ZIP/Extracted/NumHandler"
+
+# Serialize updates of one code index (each workspace has its own); app.py
+# runs analyses on a thread pool.
+_scan_locks = {}
+_scan_locks_guard = threading.Lock()
+
+def _scan_lock(index_path):
+    with _scan_locks_guard:
+        return _scan_locks.setdefault(os.path.abspath(index_path), threading.Lock())
+
+def _restore_cached_index(directory, archive_hash, index_path):
+    # A project seen before starts from its cached index, so the scan below
+    # only has to confirm the files instead of parsing them. The cached
+    # copy is keyed by paths relative to the project root.
+    code_index = get_code_index(index_path)
+    prefix = os.path.join(directory, "")
+    if any(file_path.startswith(prefix) for file_path in code_index.files()):
+        return
+    cached = project_cache.artifact_path(archive_hash, "code_index.json")
+    if cached:
+        with open(cached, "r", encoding="utf-8") as f:
+            relative = json.load(f)
+        code_index.save({os.path.join(directory, path): entry for path, entry in relative.items()})
+
+def _store_cached_index(directory, archive_hash, index_path):
+    relative = {os.path.relpath(path, directory): entry for path, entry in get_code_index(index_path).data.items()}
+    tmp_path = f"{index_path}.cache.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(relative, f)
+    project_cache.store_artifact(archive_hash, "code_index.json", tmp_path)
+    os.remove(tmp_path)
+
+def index_project(directory, index_path=INDEX_FILE, workers=None):
+    """
+    Bring the code index of directory up to date and rebuild the method
+    list and the embeddings stored next to it when the index changed.
 
-def visualize_dependencies(target=None):
-    with open("code_index.json", "r", encoding="utf-8") as json_file:
-        code_data = json.load(json_file)
+    Projects extracted from an upload are cached by the archive's hash: a
+    project seen before starts from its cached index.
 
-    G = nx.DiGraph()
+    Returns:
+        dict: The changes reported by update_project_index
+    """
+    archive_hash = archive_hash_of(directory)
+    with _scan_lock(index_path):
+        if archive_hash:
+            _restore_cached_index(directory, archive_hash, index_path)
+        _, changes = update_project_index(directory, workers=workers, index_path=index_path)
+        if archive_hash and (any(changes.values())
+                             or not project_cache.artifact_path(archive_hash, "code_index.json")):
+            _store_cached_index(directory, archive_hash, index_path)
+        methods_path = method_list_path(index_path)
+        if any(changes.values()) or not os.path.exists(methods_path):
+            save_method_list(build_method_list(get_code_index(index_path).data), methods_path)
+        # Only chunks of changed files are embedded again
+        get_embeddings(index_path)
+    return changes
+
+def prepare_analysis(target, target_type='method', refact=False, workers=None, directory=PROJECT_DIR,
+                     workspace=DEFAULT_WORKSPACE):
+    """
+    Everything analyze_target() does before asking the model: scan the
+    project, gather the target's code, draw its graph and build the prompt.
 
-    for file_path, file_data in code_data.items():
-        # Get just the filename without path
-        file_name = os.path.basename(file_path)
-        for dep in file_data["dependencies"]:
-            G.add_edge(file_name, dep)
+    Returns:
+        tuple: (report lines so far, analysis data, prompt), or None if the
+        target is not in the project
+    """
+    index_path = workspace.code_index_path
+    index_project(directory, index_path, workers)
+    # Graphs of uploaded projects are cached by the archive's hash
+    archive_hash = archive_hash_of(directory)
+    code_snippet, related_items = retrieve_relevant_code(target, target_type, index_path)
 
-    plt.figure(figsize=(10, 6))
-    nx.draw(G, with_labels=True, node_color='lightblue', edge_color='gray', font_size=8)
+    if code_snippet is None:
+        return None
 
-    # Create static/images directory if it doesn't exist
-    static_dir = os.path.join(os.path.dirname(__file__), 'static', 'images')
-    os.makedirs(static_dir, exist_ok=True)
+    lines = [
+        f"Code Snippet: {code_snippet}",
+        f"Related Items: {related_items}",
+    ]
 
-    # Save the graph with target name in filename under static/images
-    filename = f"dependencies_graph_{target}.png" if target else "dependencies_graph.png"
-    filepath = os.path.join(static_dir, filename)
-    plt.savefig(filepath, dpi=300, bbox_inches='tight')
-    plt.close()
+    if not refact:
+        filepath = graph_path(target, workspace.graphs_dir)
+        graph_name = f"graphs/{os.path.basename(filepath)}"
+        if not (archive_hash and project_cache.restore_artifact(archive_hash, graph_name, filepath)):
+            filepath = visualize_dependencies(target, index_path, workspace.graphs_dir)
+            if archive_hash:
+                project_cache.store_artifact(archive_hash, graph_name, filepath)
+
+    analysis_data, prompt = summary_prompt(code_snippet, target, target_type, index_path)
+    return lines, analysis_data, prompt
+
+
+def analyze_target(target, target_type='method', refact=False, workers=None, directory=PROJECT_DIR,
+                   workspace=DEFAULT_WORKSPACE):
+    """
+    Scan the project, analyze one class or method and return the report.
+
+    Args:
+        target (str): Class or method name
+        target_type (str, optional): 'method' or 'class'
+        refact (bool, optional): Refactoring mode; skips the dependency graph
+        workers (int, optional): Parser processes for the project scan
+        directory (str, optional): Project root to scan
+        workspace (Workspace, optional): Where the code index and graph live
+
+    Returns:
+        str: The report text, or None if the target is not in the project
+    """
+    prepared = prepare_analysis(target, target_type, refact, workers, directory, workspace)
+    if prepared is None:
+        return None
+    lines, analysis_data, prompt = prepared
+
+    analysis = complete_summary(analysis_data, prompt)
+    if analysis:
+        lines.append(f"Target: {analysis['target_name']}")
+        lines.append(f"Complexity: {analysis['complexity_metrics']}")
+        lines.append(f"Code Smells: {analysis['code_smells']}")
+        lines.append(f"Refactoring Suggestions: {analysis['refactoring_suggestions']}")
+        lines.append(f"Detailed Summary: {analysis['summary']}")
+
+    return "\n".join(lines) + "\n"
+
+
+def stream_analysis(lines, analysis_data, prompt):
+    """
+    Yield the report for a prepare_analysis() result as the model writes it.
+
+    The code, metrics and the start of the summary come first; the summary
+    follows as it is generated, and the code smells and suggestions parsed
+    from it close the report.
+    """
+    yield "\n".join(lines + [
+        f"Target: {analysis_data['target_name']}",
+        f"Complexity: {analysis_data['complexity_metrics']}",
+        "Detailed Summary: ",
+    ])
+    parts = []
+    for text in generate_stream(SUMMARY_MODEL, prompt):
+        parts.append(text)
+        yield text
+    analysis = apply_summary(analysis_data, "".join(parts))
+    yield (f"\nCode Smells: {analysis['code_smells']}"
+           f"\nRefactoring Suggestions: {analysis['refactoring_suggestions']}\n")
 
 
 # Example Usage
@@ -346,25 +640,12 @@ if __name__ == "__main__":
     parser.add_argument('--target', required=True, help='Target name to analyze (class or method name)')
     parser.add_argument('--type', choices=['class', 'method'], default='method', help='Type of target to analyze')
     parser.add_argument('--refact', action='store_true', help='Run in refactoring mode')
+    parser.add_argument('--workers', type=int, default=None, help='Parser processes for the project scan (default: CPU count)')
     args = parser.parse_args()
 
-    scan_project("/workspaces/CodeVision1/output/ZIP/Extracted/NumHandler")
-    code_snippet, related_items = retrieve_relevant_code(args.target, args.type)
-    
-    if code_snippet is None:
+    report = analyze_target(args.target, args.type, args.refact, args.workers)
+    if report is None:
         print(f"No relevant code found for {args.type}: {args.target}")
         exit(1)
-        
-    print(f"Code Snippet: {code_snippet}")
-    print(f"Related Items: {related_items}")
-    
-    analysis = get_code_summary(code_snippet, args.target, args.type)
-    if analysis:
-        print(f"Target: {analysis['target_name']}")
-        print(f"Complexity: {analysis['complexity_metrics']}")
-        print(f"Code Smells: {analysis['code_smells']}")
-        print(f"Refactoring Suggestions: {analysis['refactoring_suggestions']}")
-        print(f"Detailed Summary: {analysis['summary']}")
-
-    if not args.refact:
-        visualize_dependencies(args.target)
+
+    print(report, end="")
@@ -1,6 +1,7 @@
-import os
 import re
 
+from project_fs import open_project
+
 def extract_methods_and_classes(file_content):
     # Pattern to match class definitions
     class_pattern = r'class\s+(\w+)'
@@ -37,21 +38,19 @@ def extract_methods_and_classes(file_content):
     return classes, methods
 
 def scan_cs_files(directory):
+    """Return the dropdown entries for a project directory or .zip (read in place)."""
     all_methods = []
     all_classes = []
     
-    for root, _, files in os.walk(directory):
-        for file in files:
-            if file.endswith('.cs'):
-                file_path = os.path.join(root, file)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                        classes, methods = extract_methods_and_classes(content)
-                        all_classes.extend(classes)
-                        all_methods.extend(methods)
-                except Exception as e:
-                    print(f"Error processing {file_path}: {str(e)}")
+    with open_project(directory) as project:
+        for file_path in project.paths(".cs"):
+            try:
+                content = project.read_text(file_path)
+                classes, methods = extract_methods_and_classes(content)
+                all_classes.extend(classes)
+                all_methods.extend(methods)
+            except Exception as e:
+                print(f"Error processing {file_path}: {str(e)}")
     
     # Format entries for dropdown
     dropdown_entries = []
@@ -60,8 +59,9 @@ def scan_cs_files(directory):
     
     return dropdown_entries
 
+SCAN_PATH = "/workspaces/CodeVision1/output/ZIP/Extracted/"
+
 if __name__ == "__main__":
-    scan_path = "/workspaces/CodeVision1/output/ZIP/Extracted/"
-    entries = scan_cs_files(scan_path)
+    entries = scan_cs_files(SCAN_PATH)
     for entry in entries:
         print(entry)
@@ -0,0 +1,401 @@
+import re
+from bisect import bisect_right
+
+# One alternation, one pass: whitespace, comments, preprocessor lines and
+# literals are matched (and dropped) before anything can look like code.
+TOKEN_PATTERN = re.compile(r'''
+    (?P<ws>[\s\ufeff]+)
+  | (?P<comment>//[^\n]*|/\*.*?\*/)
+  | (?P<preproc>\#[^\n]*)
+  | (?P<string>\$?@\$?"(?:[^"]|"")*"|\$?"(?:[^"\\\n]|\\.)*"|'(?:[^'\\\n]|\\.)*')
+  | (?P<id>@?[^\W\d]\w*)
+  | (?P<num>\d[\w.]*)
+  | (?P<op>=>|==|!=|<=|>=|&&|\|\||\?\?|\?\.|::|\+\+|--|.)
+''', re.DOTALL | re.VERBOSE)
+
+KEYWORDS = {
+    "abstract", "as", "base", "bool", "break", "byte", "case", "catch", "char",
+    "checked", "class", "const", "continue", "decimal", "default", "delegate",
+    "do", "double", "else", "enum", "event", "explicit", "extern", "false",
+    "finally", "fixed", "float", "for", "foreach", "goto", "if", "implicit",
+    "in", "int", "interface", "internal", "is", "lock", "long", "namespace",
+    "new", "null", "object", "operator", "out", "override", "params", "private",
+    "protected", "public", "readonly", "ref", "return", "sbyte", "sealed",
+    "short", "sizeof", "stackalloc", "static", "string", "struct", "switch",
+    "this", "throw", "true", "try", "typeof", "uint", "ulong", "unchecked",
+    "unsafe", "ushort", "using", "virtual", "void", "volatile", "while",
+    # contextual keywords that never name a called method
+    "await", "nameof", "when", "yield", "var", "async", "partial", "record",
+    "where", "get", "set", "init", "add", "remove", "and", "or", "not",
+}
+
+TYPE_KEYWORDS = {"class", "struct", "interface", "record", "enum"}
+
+# Keywords that can sit directly in front of a call (`return Foo()`);
+# any other identifier in that position makes `X Foo(` a declaration.
+CALL_PREFIX_KEYWORDS = {
+    "return", "await", "new", "throw", "in", "is", "as", "else", "yield",
+    "case", "when", "not", "and", "or", "out", "ref", "do",
+}
+
+# Tokens allowed between < and > of a generic argument list
+GENERIC_ARG_TOKENS = {".", ",", "?", "[", "]", "::"}
+
+
+def tokenize(code):
+    """Return the code tokens of a C# source as (kind, text, start, end)."""
+    tokens = []
+    for match in TOKEN_PATTERN.finditer(code):
+        kind = match.lastgroup
+        if kind in ("ws", "comment", "preproc"):
+            continue
+        tokens.append((kind, match.group(), match.start(), match.end()))
+    return tokens
+
+
+def _matching(tokens, i, open_text, close_text):
+    """Return the index of the token closing the bracket opened at tokens[i]."""
+    depth = 0
+    for j in range(i, len(tokens)):
+        text = tokens[j][1]
+        if text == open_text:
+            depth += 1
+        elif text == close_text:
+            depth -= 1
+            if depth == 0:
+                return j
+    return len(tokens) - 1
+
+
+def _generic_open(tokens, close_index, lower_bound):
+    """Return the index of the < matching the > at close_index, or None."""
+    depth = 0
+    for j in range(close_index, lower_bound - 1, -1):
+        kind, text = tokens[j][0], tokens[j][1]
+        if text == ">":
+            depth += 1
+        elif text == "<":
+            depth -= 1
+            if depth == 0:
+                return j
+        elif kind != "id" and text not in GENERIC_ARG_TOKENS:
+            return None
+    return None
+
+
+def _generic_close(tokens, open_index, limit=64):
+    """Return the index of the > matching the < at open_index, or None."""
+    depth = 0
+    for j in range(open_index, min(len(tokens), open_index + limit)):
+        kind, text = tokens[j][0], tokens[j][1]
+        if text == "<":
+            depth += 1
+        elif text == ">":
+            depth -= 1
+            if depth == 0:
+                return j
+        elif kind != "id" and text not in GENERIC_ARG_TOKENS:
+            return None
+    return None
+
+
+def _declared_name(tokens, paren_index, lower_bound):
+    """Return the token index of the name in front of `(`, skipping <T> args."""
+    j = paren_index - 1
+    if j >= lower_bound and tokens[j][1] == ">":
+        j = _generic_open(tokens, j, lower_bound)
+        if j is None:
+            return None
+        j -= 1
+    if j < lower_bound or tokens[j][0] != "id" or tokens[j][1] in KEYWORDS:
+        return None
+    return j
+
+
+def _qualified_name(tokens, indices):
+    """Return `A.B.C` if the tokens at indices spell a dotted name, else None."""
+    if not indices or len(indices) % 2 == 0:
+        return None
+    for position, i in enumerate(indices):
+        kind, text = tokens[i][0], tokens[i][1]
+        if position % 2 == 0 and (kind != "id" or text in KEYWORDS):
+            return None
+        if position % 2 == 1 and text != ".":
+            return None
+    return "".join(tokens[i][1] for i in indices)
+
+
+def _type_declaration(tokens, member):
+    """Return (keyword, name index) if the member tokens declare a type."""
+    for position, i in enumerate(member[:-1]):
+        text = tokens[i][1]
+        if text in TYPE_KEYWORDS:
+            name_index = member[position + 1]
+            if tokens[name_index][0] == "id" and tokens[name_index][1] not in KEYWORDS:
+                return text, position + 1
+    return None
+
+
+def _base_types(tokens, member, name_position):
+    """Return the base class / interface names listed after `:` in a type header."""
+    bases, current, depth, started = [], [], 0, False
+    for i in member[name_position + 1:]:
+        text = tokens[i][1]
+        if not started:
+            started = text == ":" and depth == 0
+            if text == "<":
+                depth += 1
+            elif text == ">":
+                depth -= 1
+            continue
+        if text == "where" and depth == 0:
+            break
+        if text == "<":
+            depth += 1
+        elif text == ">":
+            depth -= 1
+        if text == "," and depth == 0:
+            bases.append("".join(current))
+            current = []
+        else:
+            current.append(text)
+    if current:
+        bases.append("".join(current))
+    return bases
+
+
+def parse_csharp(code):
+    """
+    Parse C# source in a single, brace-aware walk over its tokens.
+
+    Strings, comments and preprocessor lines are skipped by the tokenizer,
+    so braces and calls inside them do not count.
+
+    Args:
+        code (str): C# source text
+
+    Returns:
+        dict: {
+            "usings": namespace names from `using X.Y;` directives,
+            "classes": one dict per class/struct/interface/record/enum with
+                name, kind, parent, bases, start/end offsets and lines,
+                body_start/body_end (text inside the braces), and the
+                member counts used for class complexity,
+            "methods": one dict per method/constructor with name, class,
+                start/end offsets and lines and body_start/body_end,
+            "calls": (caller, callee, offset) for every call site in a body
+        }
+    """
+    tokens = tokenize(code)
+    newlines = [m.start() for m in re.finditer("\n", code)]
+
+    def line_of(offset):
+        return bisect_right(newlines, offset - 1) + 1
+
+    usings, classes, methods, calls = [], [], [], []
+    stack = []        # scopes: namespace, type, enum, method, block
+    method = None     # innermost method scope, if inside a body
+    member = []       # token indices of the declaration being read
+    property_tail = False
+    n = len(tokens)
+    i = 0
+
+    while i < n:
+        kind, text, start, end = tokens[i]
+
+        # Inside a method body: only braces, statement ends and calls matter
+        if method is not None:
+            if text == "{":
+                stack.append({"kind": "block"})
+            elif text == "}":
+                scope = stack.pop() if stack else None
+                if scope is method:
+                    method["info"]["body_end"] = start
+                    method["info"]["end"] = end
+                    method["info"]["end_line"] = line_of(start)
+                    method = None
+                    member = []
+            elif text == "(":
+                method["parens"] += 1
+            elif text == ")":
+                method["parens"] -= 1
+            elif text == ";" and stack[-1] is method and method["expression"] and method["parens"] <= 0:
+                stack.pop()
+                method["info"]["body_end"] = start
+                method["info"]["end"] = end
+                method["info"]["end_line"] = line_of(start)
+                method = None
+                member = []
+            elif kind == "id" and i + 1 < n and text not in KEYWORDS:
+                next_index = i + 1
+                if tokens[next_index][1] == "<":
+                    close = _generic_close(tokens, next_index)
+                    next_index = close + 1 if close is not None else n
+                if next_index < n and tokens[next_index][1] == "(":
+                    previous = tokens[i - 1] if i else None
+                    # `Type Name(` inside a body is a local function, not a call
+                    is_declaration = (
+                        previous is not None and previous[0] == "id"
+                        and previous[1] not in CALL_PREFIX_KEYWORDS
+                    )
+                    if not is_declaration:
+                        calls.append((method["info"]["name"], text, start))
+            i += 1
+            continue
+
+        top = stack[-1]["kind"] if stack else None
+
+        # Property accessors, enum bodies, initializers: skip to the close
+        if top in ("block", "enum"):
+            if text == "{":
+                stack.append({"kind": "block"})
+            elif text == "}":
+                scope = stack.pop()
+                if scope.get("property"):
+                    member = []
+                    property_tail = True
+                elif scope["kind"] == "enum":
+                    scope["info"]["body_end"] = start
+                    scope["info"]["end"] = end
+                    scope["info"]["end_line"] = line_of(start)
+                    member = []
+            i += 1
+            continue
+
+        if text == "[" and not member:
+            # Attribute list
+            i = _matching(tokens, i, "[", "]") + 1
+            continue
+
+        if text == ";":
+            if member and tokens[member[0]][1] in ("using", "global") and top != "type":
+                name = _qualified_name(tokens, [j for j in member if tokens[j][1] not in ("using", "global")])
+                if name:
+                    usings.append(name)
+            elif member and top == "type" and not property_tail:
+                texts = {tokens[j][1] for j in member}
+                if "=>" in texts and "(" not in texts:
+                    # expression-bodied property
+                    stack[-1]["info"]["properties"] += 1
+                elif "delegate" not in texts:
+                    stack[-1]["info"]["fields"] += 1
+            member = []
+            property_tail = False
+            i += 1
+            continue
+
+        if text == "{":
+            texts = [tokens[j][1] for j in member]
+            declaration = _type_declaration(tokens, member) if member else None
+            if "namespace" in texts:
+                stack.append({"kind": "namespace"})
+            elif declaration:
+                type_keyword, name_position = declaration
+                parent = next((s["info"] for s in reversed(stack) if s["kind"] == "type"), None)
+                info = {
+                    "name": tokens[member[name_position]][1],
+                    "kind": type_keyword,
+                    "parent": parent["name"] if parent else None,
+                    "bases": _base_types(tokens, member, name_position),
+                    "start": tokens[member[0]][2],
+                    "start_line": line_of(tokens[member[0]][2]),
+                    "body_start": end,
+                    "properties": 0,
+                    "fields": 0,
+                    "methods": [],
+                    "nested": [],
+                }
+                if parent:
+                    parent["nested"].append(info["name"])
+                classes.append(info)
+                stack.append({"kind": "enum" if type_keyword == "enum" else "type", "info": info})
+            elif top == "type" and "(" in texts:
+                # operator or conversion body
+                stack.append({"kind": "block"})
+            elif top == "type":
+                if "=" in texts:
+                    # Initializer or lambda; the declaration continues after it
+                    stack.append({"kind": "block"})
+                    member.append(i)
+                    i += 1
+                    continue
+                stack[-1]["info"]["properties"] += 1
+                stack.append({"kind": "block", "property": True})
+            else:
+                stack.append({"kind": "block"})
+            member = []
+            property_tail = False
+            i += 1
+            continue
+
+        if text == "}":
+            scope = stack.pop() if stack else None
+            if scope and scope["kind"] in ("type", "enum"):
+                scope["info"]["body_end"] = start
+                scope["info"]["end"] = end
+                scope["info"]["end_line"] = line_of(start)
+            member = []
+            property_tail = False
+            i += 1
+            continue
+
+        if text == "(" and top == "type" and member:
+            texts = {tokens[j][1] for j in member}
+            name_index = None
+            if not texts & {"=", "delegate", "operator", "=>"}:
+                name_index = _declared_name(tokens, i, member[0])
+            if name_index is not None:
+                close = _matching(tokens, i, "(", ")")
+                k = close + 1
+                while k < n and tokens[k][1] not in ("{", ";", "=>"):
+                    if tokens[k][1] == "(":
+                        # constructor initializer: `: base(...)`
+                        k = _matching(tokens, k, "(", ")")
+                    k += 1
+                class_info = stack[-1]["info"]
+                info = {
+                    "name": tokens[name_index][1],
+                    "class": class_info["name"],
+                    "start": tokens[member[0]][2],
+                    "start_line": line_of(tokens[member[0]][2]),
+                    "body_start": None,
+                    "body_end": None,
+                    "end": None,
+                    "end_line": None,
+                }
+                methods.append(info)
+                class_info["methods"].append(info["name"])
+                if k >= n:
+                    break
+                body_token = tokens[k]
+                if body_token[1] == ";":
+                    # abstract, extern or interface member: no body
+                    info["end"] = body_token[3]
+                    info["end_line"] = line_of(body_token[2])
+                else:
+                    info["body_start"] = body_token[3]
+                    method = {
+                        "kind": "method",
+                        "info": info,
+                        "expression": body_token[1] == "=>",
+                        "parens": 0,
+                    }
+                    stack.append(method)
+                member = []
+                i = k + 1
+                continue
+
+        if property_tail and not member and text != "=":
+            property_tail = False
+        member.append(i)
+        i += 1
+
+    # Unterminated bodies (truncated or broken files) run to the end of the file
+    for info in classes + methods:
+        if info.get("end") is None:
+            if info["body_start"] is None:
+                info["body_start"] = len(code)
+            info["body_end"] = info["end"] = len(code)
+            info["end_line"] = line_of(len(code))
+
+    return {"usings": usings, "classes": classes, "methods": methods, "calls": calls}
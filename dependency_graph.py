@@ -0,0 +1,215 @@
+import hashlib
+import os
+import re
+import shutil
+import threading
+from collections import deque
+
+from code_index import get_code_index, INDEX_FILE
+
+# File-level dependency graph of a project: one node per .cs file and per
+# namespace it imports, "uses" edges from files to namespaces and "calls"
+# edges between files whose methods call each other. The graph is built
+# once per code index version; ego-subgraphs around a target, their
+# layouts and rendered images are cached by (version, target, radius).
+GRAPH_DPI = 150
+LAYOUT_SEED = 42
+DEFAULT_RADIUS = 1
+CACHE_DIR_NAME = "cache"
+
+_graphs = {}
+_layouts = {}
+_cache_lock = threading.Lock()
+# One render of a given image at a time
+_render_lock = threading.Lock()
+
+
+def project_root(code_index):
+    """Directory the file node ids are relative to (no server paths leave the module)."""
+    files = code_index.files()
+    if not files:
+        return ""
+    return os.path.commonpath(files) if len(files) > 1 else os.path.dirname(files[0])
+
+
+def build_graph(code_index):
+    """Return {"nodes": {id: {...}}, "edges": [(source, target, kind)]} for an index."""
+    nodes, edges = {}, {}
+    method_files = {}
+    root = project_root(code_index)
+    for file_path, file_data in code_index.data.items():
+        node = os.path.relpath(file_path, root)
+        nodes[node] = {"label": os.path.basename(file_path), "kind": "file"}
+        for method in file_data["methods"]:
+            method_files.setdefault(method, []).append(node)
+
+    for file_path, file_data in code_index.data.items():
+        file_path = os.path.relpath(file_path, root)
+        for namespace in file_data["dependencies"]:
+            nodes.setdefault(namespace, {"label": namespace, "kind": "namespace"})
+            edges[(file_path, namespace)] = "uses"
+        for _, called in file_data["method_calls"]:
+            for target_file in method_files.get(called, ()):
+                if target_file != file_path:
+                    edges.setdefault((file_path, target_file), "calls")
+
+    return {"nodes": nodes, "edges": [(source, target, kind) for (source, target), kind in edges.items()]}
+
+
+def get_graph(index_path=INDEX_FILE):
+    """Return (index version, graph), rebuilding the graph only when the index changed."""
+    code_index = get_code_index(index_path)
+    key = os.path.abspath(index_path)
+    with _cache_lock:
+        cached = _graphs.get(key)
+        if cached and cached[0] == code_index.version:
+            return cached
+    graph = build_graph(code_index)
+    with _cache_lock:
+        _graphs[key] = (code_index.version, graph)
+        # Layouts of older versions are never asked for again
+        for layout_key in [k for k in _layouts if k[0] == key and k[1] != code_index.version]:
+            del _layouts[layout_key]
+    return code_index.version, graph
+
+
+def target_files(code_index, target):
+    """Return the nodes of the files defining target, a class or method name."""
+    files = code_index.files_for_class(target) or code_index.files_for_method(target, ignore_case=True)
+    root = project_root(code_index)
+    return [os.path.relpath(f, root) for f in files if f in code_index.data]
+
+
+def ego_subgraph(graph, seeds, radius=DEFAULT_RADIUS):
+    """Return the part of graph within radius edges (either direction) of the seed nodes."""
+    neighbours = {}
+    for source, target, _ in graph["edges"]:
+        neighbours.setdefault(source, set()).add(target)
+        neighbours.setdefault(target, set()).add(source)
+
+    reached = {seed: 0 for seed in seeds if seed in graph["nodes"]}
+    frontier = deque(reached)
+    while frontier:
+        node = frontier.popleft()
+        if reached[node] >= radius:
+            continue
+        for neighbour in neighbours.get(node, ()):
+            if neighbour not in reached:
+                reached[neighbour] = reached[node] + 1
+                frontier.append(neighbour)
+
+    return {
+        "nodes": {node: graph["nodes"][node] for node in reached},
+        "edges": [edge for edge in graph["edges"] if edge[0] in reached and edge[1] in reached],
+    }
+
+
+def target_graph(index_path=INDEX_FILE, target=None, radius=DEFAULT_RADIUS):
+    """
+    Return (version, graph, seeds): the ego-subgraph around target, or the
+    whole project graph if target is None or not in the index.
+    """
+    version, graph = get_graph(index_path)
+    seeds = target_files(get_code_index(index_path), target) if target else []
+    if not seeds:
+        return version, graph, []
+    return version, ego_subgraph(graph, seeds, radius), seeds
+
+
+def graph_json(index_path=INDEX_FILE, target=None, radius=DEFAULT_RADIUS):
+    """Node/edge export of target_graph() for client-side rendering."""
+    version, graph, seeds = target_graph(index_path, target, radius)
+    seed_set = set(seeds)
+    return {
+        "version": version,
+        "target": target,
+        "radius": radius,
+        "nodes": [dict(attrs, id=node, seed=node in seed_set) for node, attrs in graph["nodes"].items()],
+        "edges": [{"source": source, "target": target_node, "kind": kind}
+                  for source, target_node, kind in graph["edges"]],
+    }
+
+
+def _cache_name(version, target, radius):
+    slug = re.sub(r"[^A-Za-z0-9_.-]", "_", target or "all")[:64]
+    return f"{(version or 'empty')[:16]}_{slug}_{radius}.png"
+
+
+def spring_layout(graph):
+    """Return {node: (x, y)} for graph, reproducible across runs."""
+    import networkx as nx  # only needed to lay out a graph that isn't cached
+
+    G = nx.DiGraph()
+    G.add_nodes_from(graph["nodes"])
+    G.add_edges_from((source, target_node) for source, target_node, _ in graph["edges"])
+    return nx.spring_layout(G, seed=LAYOUT_SEED)
+
+
+def draw_graph(graph, pos, seeds, path):
+    """
+    Draw graph at the given positions to a PNG at path.
+
+    Uses a standalone Figure on an Agg canvas rather than pyplot, so no GUI
+    backend is ever loaded and concurrent renders share no global state.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    seed_set = set(seeds)
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    ax.set_axis_off()
+    for source, target_node, _ in graph["edges"]:
+        ax.annotate(
+            "", xy=pos[target_node], xytext=pos[source],
+            arrowprops={"arrowstyle": "-|>", "color": "gray", "shrinkA": 10, "shrinkB": 10},
+        )
+    nodes = list(graph["nodes"])
+    if nodes:
+        ax.scatter(
+            [pos[node][0] for node in nodes], [pos[node][1] for node in nodes], s=300, zorder=2,
+            c=["orange" if node in seed_set else "lightblue" for node in nodes],
+        )
+    for node in nodes:
+        ax.text(pos[node][0], pos[node][1], graph["nodes"][node]["label"],
+                fontsize=8, ha="center", va="center", zorder=3)
+    fig.savefig(path, format="png", dpi=GRAPH_DPI, bbox_inches="tight")
+
+
+def render_graph(output_path, index_path=INDEX_FILE, target=None, radius=DEFAULT_RADIUS):
+    """
+    Draw target_graph() to output_path as a PNG.
+
+    Images are cached next to output_path by index version, target and
+    radius; an unchanged project is only ever laid out and drawn once.
+    Returns output_path.
+    """
+    version, graph, seeds = target_graph(index_path, target, radius)
+    cache_dir = os.path.join(os.path.dirname(output_path), CACHE_DIR_NAME)
+    cached_image = os.path.join(cache_dir, _cache_name(version, target, radius))
+
+    with _render_lock:
+        if not os.path.exists(cached_image):
+            layout_key = (os.path.abspath(index_path), version, target, radius)
+            with _cache_lock:
+                pos = _layouts.get(layout_key)
+            if pos is None:
+                pos = spring_layout(graph)
+                with _cache_lock:
+                    _layouts[layout_key] = pos
+
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = f"{cached_image}.{os.getpid()}.tmp.png"
+            draw_graph(graph, pos, seeds, tmp_path)
+            os.replace(tmp_path, cached_image)
+
+    # Published under the per-target name the pages link to
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    shutil.copyfile(cached_image, output_path)
+    return output_path
+
+
+def graph_etag(index_path=INDEX_FILE, target=None, radius=DEFAULT_RADIUS):
+    version = get_code_index(index_path).version or ""
+    return hashlib.sha256(f"{version}|{target}|{radius}".encode("utf-8")).hexdigest()[:32]
@@ -0,0 +1,285 @@
+import json
+import math
+import os
+import threading
+import zlib
+from collections import Counter
+
+from code_index import get_code_index, INDEX_FILE
+from retrieval import file_chunks, terms
+
+# Semantic search over the class and method chunks of a code index. Every
+# chunk is embedded once, at scan time, into a row of a float32 matrix saved
+# next to code_index.json (embeddings.npy, read back memory-mapped) with the
+# chunk list in embeddings.json. A query is one matrix-vector product over
+# the L2-normalised rows (cosine similarity) and a partial sort for the top k.
+#
+# The embedding function is pluggable (set_embedder); a local
+# sentence-transformers model is used when CODEVISION_EMBEDDING_MODEL names
+# one, otherwise a deterministic feature-hashing embedder that needs no
+# model and gives the same vectors on every machine.
+MATRIX_FILE = "embeddings.npy"
+META_FILE = "embeddings.json"
+EMBEDDING_MODEL = os.getenv("CODEVISION_EMBEDDING_MODEL", "")
+HASH_DIMENSIONS = int(os.getenv("CODEVISION_EMBEDDING_DIM", "256"))
+DEFAULT_TOP_K = 10
+# Longest chunk text that is embedded; the name and signature come first
+MAX_EMBED_CHARS = 4000
+EMBED_BATCH = 256
+CLASS_KINDS = ("class", "interface", "struct", "enum", "record")
+# Weight of a character trigram relative to a whole term
+TRIGRAM_WEIGHT = 0.25
+
+_embedder = None
+_embedder_lock = threading.Lock()
+_stores = {}
+_stores_lock = threading.Lock()
+_build_locks = {}
+
+
+class HashingEmbedder:
+    """
+    Feature hashing of identifier terms and their character trigrams.
+
+    Terms come from retrieval.terms (identifiers split at camelCase and _),
+    so "validated user input" lands near ValidateUserInput(); the trigrams
+    let inflections ("validated", "validation") meet. Deterministic: no
+    model, no randomised hashing.
+    """
+
+    def __init__(self, dimensions=HASH_DIMENSIONS):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def _features(self, text):
+        features = Counter()
+        for term in terms(text):
+            features[term] += 1
+            padded = f"<{term}>"
+            for i in range(len(padded) - 2):
+                features["#" + padded[i:i + 3]] += 1
+        return features
+
+    def embed(self, texts):
+        import numpy as np
+
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature, count in self._features(text).items():
+                weight = (1.0 + math.log(count)) * (TRIGRAM_WEIGHT if feature[0] == "#" else 1.0)
+                h = zlib.crc32(feature.encode("utf-8"))
+                # Low bits pick the column, the top bit the sign
+                matrix[row, h % self.dimensions] += weight if h >> 31 else -weight
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+class SentenceTransformerEmbedder:
+    """A local sentence-transformers model."""
+
+    def __init__(self, model_name):
+        from sentence_transformers import SentenceTransformer
+
+        self._model = SentenceTransformer(model_name)
+        self.dimensions = self._model.get_sentence_embedding_dimension()
+        self.name = f"sentence-transformers:{model_name}"
+
+    def embed(self, texts):
+        import numpy as np
+
+        vectors = self._model.encode(list(texts), batch_size=32, normalize_embeddings=True)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+def set_embedder(embedder):
+    """
+    Use embedder (an object with .name, .dimensions and .embed(texts) ->
+    L2-normalised float32 matrix) from now on. Stores built with another
+    embedder are rebuilt on their next use.
+    """
+    global _embedder
+    with _embedder_lock:
+        _embedder = embedder
+
+
+def get_embedder():
+    """Return the embedder in use, loading the configured one on first use."""
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            if EMBEDDING_MODEL:
+                try:
+                    _embedder = SentenceTransformerEmbedder(EMBEDDING_MODEL)
+                except Exception as e:
+                    print(f"Embedding model {EMBEDDING_MODEL} unavailable ({e}); using hashing embeddings")
+            if _embedder is None:
+                _embedder = HashingEmbedder()
+        return _embedder
+
+
+def embeddings_paths(index_path=INDEX_FILE):
+    """Return (matrix path, chunk list path) for the code index at index_path."""
+    directory = os.path.dirname(index_path)
+    return os.path.join(directory, MATRIX_FILE), os.path.join(directory, META_FILE)
+
+
+def embedding_text(chunk):
+    return f"{chunk['kind']} {chunk['name']}\n{chunk['text'][:MAX_EMBED_CHARS]}"
+
+
+def _load(index_path):
+    """Return the saved store (meta dict plus a memory-mapped "matrix"), or None."""
+    matrix_path, meta_path = embeddings_paths(index_path)
+    try:
+        st = os.stat(meta_path)
+    except FileNotFoundError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    key = os.path.abspath(meta_path)
+    with _stores_lock:
+        cached = _stores.get(key)
+        if cached and cached[0] == stamp:
+            return cached[1]
+
+    import numpy as np
+
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            store = json.load(f)
+        store["matrix"] = np.load(matrix_path, mmap_mode="r")
+    except (FileNotFoundError, ValueError) as e:
+        print(f"Ignoring unreadable embeddings next to {index_path}: {e}")
+        return None
+    if store["matrix"].shape[0] != len(store["chunks"]):
+        return None
+    store["kinds"] = np.array([chunk["kind"] for chunk in store["chunks"]])
+    with _stores_lock:
+        _stores[key] = (stamp, store)
+    return store
+
+
+def build_embeddings(index_path=INDEX_FILE, embedder=None):
+    """
+    Embed every chunk of the code index and save the store next to it.
+
+    Rows of files whose content hash is unchanged since the previous store
+    (made with the same embedder) are copied instead of embedded again.
+    Returns the store.
+    """
+    import numpy as np
+
+    embedder = embedder or get_embedder()
+    code_index = get_code_index(index_path)
+    previous = _load(index_path)
+    reusable = {}
+    if previous and previous["embedder"] == embedder.name:
+        for row, chunk in enumerate(previous["chunks"]):
+            reusable.setdefault((chunk["file"], chunk["hash"]), []).append(row)
+
+    chunks, old_rows, new_rows, texts = [], [], [], []
+    for file_path, entry in code_index.data.items():
+        content_hash = entry.get("content_hash")
+        rows = reusable.get((file_path, content_hash)) if content_hash else None
+        if rows:
+            for row in rows:
+                old_rows.append((len(chunks), row))
+                chunks.append(previous["chunks"][row])
+            continue
+        for chunk in file_chunks(file_path, entry):
+            new_rows.append(len(chunks))
+            texts.append(embedding_text(chunk))
+            chunks.append({"file": file_path, "name": chunk["name"], "kind": chunk["kind"],
+                           "lines": list(chunk["lines"]), "hash": content_hash})
+
+    matrix = np.zeros((len(chunks), embedder.dimensions), dtype=np.float32)
+    if old_rows:
+        targets, sources = zip(*old_rows)
+        matrix[list(targets)] = previous["matrix"][list(sources)]
+    for start in range(0, len(texts), EMBED_BATCH):
+        matrix[new_rows[start:start + EMBED_BATCH]] = embedder.embed(texts[start:start + EMBED_BATCH])
+
+    matrix_path, meta_path = embeddings_paths(index_path)
+    tmp_matrix = f"{matrix_path}.{os.getpid()}.tmp.npy"
+    np.save(tmp_matrix, matrix)
+    os.replace(tmp_matrix, matrix_path)
+    # The chunk list goes last: it is what readers check for freshness
+    tmp_meta = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp_meta, "w", encoding="utf-8") as f:
+        json.dump({"embedder": embedder.name, "index_version": code_index.version, "chunks": chunks}, f)
+    os.replace(tmp_meta, meta_path)
+    print(f"Embeddings: {len(chunks)} chunks ({len(texts)} embedded, {len(old_rows)} reused)")
+    return _load(index_path)
+
+
+def get_embeddings(index_path=INDEX_FILE):
+    """Return the store for the code index, (re)building it if it is missing or stale."""
+    code_index = get_code_index(index_path)
+    store = _load(index_path)
+    if store and store["index_version"] == code_index.version and store["embedder"] == get_embedder().name:
+        return store
+    key = os.path.abspath(index_path)
+    with _stores_lock:
+        lock = _build_locks.setdefault(key, threading.Lock())
+    with lock:
+        # Someone else may have rebuilt it while we waited
+        store = _load(index_path)
+        if store and store["index_version"] == code_index.version and store["embedder"] == get_embedder().name:
+            return store
+        return build_embeddings(index_path)
+
+
+def search(query, index_path=INDEX_FILE, top_k=DEFAULT_TOP_K, kinds=None):
+    """
+    Return the top_k chunks most similar to query, best first.
+
+    Args:
+        query (str): Free text, e.g. "where is user input validated"
+        index_path (str, optional): The project's code_index.json
+        top_k (int, optional): Number of results
+        kinds (iterable, optional): Only chunks of these kinds ("method", "class", ...)
+
+    Returns:
+        list: Chunk dicts (file, name, kind, lines) with a "score" (cosine similarity)
+    """
+    import numpy as np
+
+    store = get_embeddings(index_path)
+    if not store or not store["chunks"] or top_k <= 0:
+        return []
+    scores = store["matrix"] @ get_embedder().embed([query])[0]
+    if kinds:
+        scores = np.where(np.isin(store["kinds"], list(kinds)), scores, -np.inf)
+    k = min(top_k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return [dict(store["chunks"][i], score=float(scores[i])) for i in top if np.isfinite(scores[i])]
+
+
+def chunk_scores(query, index_path=INDEX_FILE):
+    """
+    Return {(file, kind, name): cosine similarity to query} for every chunk,
+    the best one where overloads share a name. Line numbers are left out of
+    the key: other views of the same file (the merged output, an enhanced
+    tree) place the same chunk on other lines.
+    """
+    store = get_embeddings(index_path)
+    if not store or not store["chunks"]:
+        return {}
+    scores = store["matrix"] @ get_embedder().embed([query])[0]
+    similarity = {}
+    for chunk, score in zip(store["chunks"], scores):
+        key = (chunk["file"], chunk["kind"], chunk["name"])
+        similarity[key] = max(similarity.get(key, -1.0), float(score))
+    return similarity
+
+
+def search_entries(query, index_path=INDEX_FILE, limit=DEFAULT_TOP_K):
+    """Return method-list entries ("Class.Method", "class:Name") ranked by similarity to query."""
+    entries, seen = [], set()
+    for hit in search(query, index_path, limit, kinds=("method",) + CLASS_KINDS):
+        entry = hit["name"] if hit["kind"] == "method" else f"class:{hit['name']}"
+        if entry not in seen:
+            seen.add(entry)
+            entries.append(entry)
+    return entries
@@ -1,87 +1,100 @@
 import os
-import requests
 import json
 import re
 import sys
-import tiktoken  # OpenAI's tokenization library
-import google.generativeai as genai  # Gemini API
-
-def call_openai_api(prompt):
-    """Call the OpenAI API with the provided prompt and return the response."""
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        print("Error: OpenAI API key is not set.")
-        return None
+import time
+import random
+import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import llm_cache
+from code_index import get_code_index
+from workspace import DEFAULT_WORKSPACE
+from merged_project import iter_sections
+from tokens import count_tokens, estimate_tokens
+from providers import generate, supported_models
 
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
-
-    # Token count estimation
-    encoder = tiktoken.get_encoding("cl100k_base")
-    prompt_tokens = len(encoder.encode(prompt))
-    print(f"Number of tokens in the prompt: {prompt_tokens}")
-
-    data = {
-        "model": "gpt-4-turbo",
-        "messages": [{"role": "user", "content": prompt}]
-    }
-    
-    try:
-        response = requests.post(url, headers=headers, json=data)
-        if response.status_code == 200:
-            raw_response = response.json()
-            return raw_response.get("choices", [{}])[0].get("message", {}).get("content", None)
-        else:
-            print(f"Error with API request: {response.status_code} {response.text}")
-            return None
-    except Exception as e:
-        print(f"Error calling OpenAI API: {e}")
-        return None
+# Chunked enhancement defaults (see enhance_chunked)
+CHUNK_TOKENS = int(os.getenv("CODEVISION_CHUNK_TOKENS", "12000"))
+OUTLINE_TOKENS = 2000
+CHUNK_WORKERS = int(os.getenv("CODEVISION_CHUNK_WORKERS", "4"))
+CHUNK_RETRIES = 3
+CHUNK_RETRY_BASE_DELAY = 2.0
 
-def call_gemini_api(prompt):
-    """Call the Gemini API with the provided prompt and return the response."""
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        print("Error: Gemini API key is not set.")
-        return None
+def call_model(model_name, prompt):
+    """Send the prompt to the selected model and return its text, or None."""
+    return generate(model_name, prompt)
 
-    # Token count estimation
-    encoder = tiktoken.get_encoding("cl100k_base")
-    prompt_tokens = len(encoder.encode(prompt))
-    print(f"Number of tokens in the prompt: {prompt_tokens}")
+def extract_file_sections(file_path):
+    """Return (file name, file path, content) for every file in merged_output.txt."""
+    return list(iter_sections(file_path))
 
-    genai.configure(api_key=api_key)
-    
-    try:
-        model = genai.GenerativeModel(model_name="gemini-2.0-flash")
-        response = model.generate_content(prompt)
-        return response.text if response else None
-    except Exception as e:
-        print(f"Error calling Gemini API: {e}")
-        return None
-    
 def extract_files_from_merged_output(file_path):
     """Extract individual file content from merged_output.txt."""
-    with open(file_path, "r", encoding="utf-8") as file:
-        content = file.read()
+    return {file_name: file_content for file_name, _, file_content in extract_file_sections(file_path)}
 
-    file_sections = re.split(r"===== (.*?) \((.*?)\) =====", content)[1:]
-    extracted_files = {}
-
-    for i in range(0, len(file_sections), 3):
-        file_name = file_sections[i].strip()
-        file_path = file_sections[i+1].strip()
-        file_content = file_sections[i+2].strip()
-        extracted_files[file_name] = file_content
+def save_enhanced_files(output, output_dir):
+    """Write every ===== FILE: ... ===== section of a model response; return the paths written."""
+    os.makedirs(output_dir, exist_ok=True)
+    
+    created_files = []
+    
+    # More flexible regex pattern that handles variations in the format
+    patterns = [
+        # Pattern 1: Standard format with ```language
+        r'===== FILE: ([^\n]+?) =====\n```(?:[^\n]*)?\n(.*?)\n```(?:\n===== END FILE =====)?',
+        # Pattern 2: Format without code blocks
+        r'===== FILE: ([^\n]+?) =====\n(.*?)(?:\n===== END FILE =====|\n===== FILE:)',
+        # Pattern 3: Simple format
+        r'===== FILE: ([^\n]+?) =====\n(.*?)\n=====',
+    ]
+    
+    print("\nTrying different regex patterns...")
+    
+    for pattern in patterns:
+        matches = list(re.finditer(pattern, output, re.DOTALL))
+        if matches:
+            print(f"Found {len(matches)} files using pattern: {pattern}")
+            break
+    
+    if not matches:
+        print("Error: No files found in the output. Raw output sample:")
+        print(output[:1000])
+        return created_files
+    
+    for match in matches:
+        filename = match.group(1).strip()
+        content = match.group(2).strip()
+        
+        print(f"\nProcessing: {filename}")
+        
+        # Clean up the filename
+        filename = re.sub(r'^/tmp/[^/]+/', '', filename)  # Remove temp path
+        filename = filename.replace('\\', '/').lstrip('/')  # Normalize slashes
+        
+        # Handle case where content might still have markdown markers
+        content = re.sub(r'^```[^\n]*\n', '', content)  # Remove opening ```
+        content = re.sub(r'\n```$', '', content)        # Remove closing ```
+        
+        safe_filename = os.path.normpath(filename).lstrip(os.sep)
+        output_path = os.path.join(output_dir, safe_filename)
+        
+        print(f"Writing to: {output_path}")
+        print(f"Content length: {len(content)} bytes")
+        
+        try:
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            with open(output_path, "w", encoding="utf-8") as f:
+                f.write(content)
+            created_files.append(output_path)
+            print(f"✓ Saved: {output_path}")
+        except Exception as e:
+            print(f"Error saving {output_path}: {e}")
 
-    return extracted_files
+    return created_files
 
-def enhance(model_name):
-    """Enhance the entire project content from merged_output.txt."""
-    input_file = "output/merged_output.txt"
+def enhance(model_name, workspace=DEFAULT_WORKSPACE):
+    """Enhance the entire project content from the workspace's merged_output.txt."""
+    input_file = workspace.merged_output
     prompt_file = "input/prompt.txt"
     
     print(f"Enhancing project using model: {model_name}")
@@ -90,6 +103,10 @@ def enhance(model_name):
         print("Error: Required files not found.")
         return
 
+    if model_name not in supported_models():
+        print(f"Error: Unsupported model {model_name}")
+        return
+
     # Read prompt template
     with open(prompt_file, "r", encoding="utf-8") as file:
         prompt_template = file.read()
@@ -102,78 +119,17 @@ def enhance(model_name):
     prompt = prompt_template.format(project_content=project_content)
 
     # Call appropriate API
-    if model_name == "gpt-4-turbo":
-        output = call_openai_api(prompt)
-    elif model_name == "gemini-2.0-flash":
-        output = call_gemini_api(prompt)
-    else:
-        print(f"Error: Unsupported model {model_name}")
-        return
+    output = call_model(model_name, prompt)
 
     if output:
         # Save enhanced project
-        output_file = "output/enhanced_project.txt"
+        output_file = workspace.enhanced_project
         with open(output_file, "w", encoding="utf-8") as f:
             f.write(output)
         print(f"Enhanced project saved to {output_file}")
 
         # Extract and save individual files
-        output_dir = "/workspaces/CodeVision1/output/enhancedFiles"
-        os.makedirs(output_dir, exist_ok=True)
-        
-        created_files = []
-        
-        # More flexible regex pattern that handles variations in the format
-        patterns = [
-            # Pattern 1: Standard format with ```language
-            r'===== FILE: ([^\n]+?) =====\n```(?:[^\n]*)?\n(.*?)\n```(?:\n===== END FILE =====)?',
-            # Pattern 2: Format without code blocks
-            r'===== FILE: ([^\n]+?) =====\n(.*?)(?:\n===== END FILE =====|\n===== FILE:)',
-            # Pattern 3: Simple format
-            r'===== FILE: ([^\n]+?) =====\n(.*?)\n=====',
-        ]
-        
-        print("\nTrying different regex patterns...")
-        
-        for pattern in patterns:
-            matches = list(re.finditer(pattern, output, re.DOTALL))
-            if matches:
-                print(f"Found {len(matches)} files using pattern: {pattern}")
-                break
-        
-        if not matches:
-            print("Error: No files found in the output. Raw output sample:")
-            print(output[:1000])
-            return
-        
-        for match in matches:
-            filename = match.group(1).strip()
-            content = match.group(2).strip()
-            
-            print(f"\nProcessing: {filename}")
-            
-            # Clean up the filename
-            filename = re.sub(r'^/tmp/[^/]+/', '', filename)  # Remove temp path
-            filename = filename.replace('\\', '/').lstrip('/')  # Normalize slashes
-            
-            # Handle case where content might still have markdown markers
-            content = re.sub(r'^```[^\n]*\n', '', content)  # Remove opening ```
-            content = re.sub(r'\n```$', '', content)        # Remove closing ```
-            
-            safe_filename = os.path.normpath(filename).lstrip(os.sep)
-            output_path = os.path.join(output_dir, safe_filename)
-            
-            print(f"Writing to: {output_path}")
-            print(f"Content length: {len(content)} bytes")
-            
-            try:
-                os.makedirs(os.path.dirname(output_path), exist_ok=True)
-                with open(output_path, "w", encoding="utf-8") as f:
-                    f.write(content)
-                created_files.append(output_path)
-                print(f"✓ Saved: {output_path}")
-            except Exception as e:
-                print(f"Error saving {output_path}: {e}")
+        created_files = save_enhanced_files(output, workspace.enhanced_files_dir)
         
         # Print summary of created files
         print("\nSummary of created files:")
@@ -182,11 +138,173 @@ def enhance(model_name):
     else:
         print("Project enhancement failed.")
 
+def split_into_chunks(sections, chunk_tokens):
+    """
+    Group merged-output sections into chunks of at most chunk_tokens tokens.
+
+    Files keep their merged-output order; a file larger than the budget is
+    sent on its own.
+    """
+    chunks = []
+    current, current_tokens = [], 0
+    for section in sections:
+        tokens = count_tokens(section[2])
+        if current and current_tokens + tokens > chunk_tokens:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        if tokens > chunk_tokens:
+            print(f"Warning: {section[0]} ({tokens} tokens) exceeds the chunk budget and is sent alone")
+        current.append(section)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+def project_outline(chunk, index_data, outline_tokens):
+    """
+    Describe the files outside a chunk from the code index.
+
+    Files whose classes or methods the chunk mentions come first; the
+    outline stops at about outline_tokens (estimated, not encoded).
+    """
+    chunk_names = {os.path.basename(section[1]) for section in chunk}
+    chunk_text = "\n".join(section[2] for section in chunk)
+    chunk_words = set(re.findall(r"\w+", chunk_text))
+
+    referenced, others = [], []
+    for file_path, file_data in index_data.items():
+        if os.path.basename(file_path) in chunk_names:
+            continue
+        line = (f"- {os.path.basename(file_path)}: classes {', '.join(file_data['classes']) or '-'}; "
+                f"methods {', '.join(file_data['methods']) or '-'}; "
+                f"uses {', '.join(file_data['dependencies']) or '-'}")
+        symbols = set(file_data["classes"]) | set(file_data["methods"])
+        (referenced if symbols & chunk_words else others).append(line)
+
+    lines, budget = [], outline_tokens
+    for line in referenced + others:
+        tokens = estimate_tokens(line + "\n")
+        if tokens > budget:
+            break
+        lines.append(line)
+        budget -= tokens
+    return "\n".join(lines) if lines else "(no other files)"
+
+def enhance_chunk(model_name, prompt, label, max_retries):
+    """Call the model for one chunk, retrying with exponential backoff."""
+    for attempt in range(max_retries + 1):
+        output = call_model(model_name, prompt)
+        if output and "===== FILE:" in output:
+            return output
+        # Don't let the retry be answered by the same cached response
+        llm_cache.discard(model_name, prompt)
+        if attempt < max_retries:
+            delay = CHUNK_RETRY_BASE_DELAY * (2 ** attempt) + random.uniform(0, CHUNK_RETRY_BASE_DELAY)
+            print(f"Chunk {label}: no usable response, retrying in {delay:.1f}s "
+                  f"({attempt + 1}/{max_retries})")
+            time.sleep(delay)
+    print(f"Chunk {label}: giving up after {max_retries + 1} attempts")
+    return None
+
+def enhance_chunked(model_name, max_workers=CHUNK_WORKERS, chunk_tokens=CHUNK_TOKENS,
+                    outline_tokens=OUTLINE_TOKENS, max_retries=CHUNK_RETRIES, workspace=DEFAULT_WORKSPACE,
+                    progress=None):
+    """
+    Enhance the project from the workspace's merged_output.txt in token-budgeted chunks.
+
+    Each chunk carries an outline of the rest of the project taken from
+    code_index.json and is sent concurrently (at most max_workers at a
+    time). A failed chunk is retried on its own and, if it still fails,
+    only its files are missing from the result. The responses are written
+    to the same enhancedFiles layout and enhanced_project.txt as enhance().
+    progress, if given, is called as progress(completed, total) each time a
+    chunk finishes.
+
+    Returns:
+        list: Files of the project that no chunk produced
+    """
+    input_file = workspace.merged_output
+    prompt_file = "input/promptForChunk.txt"
+
+    print(f"Enhancing project in chunks using model: {model_name}")
+
+    if not os.path.exists(input_file) or not os.path.exists(prompt_file):
+        print("Error: Required files not found.")
+        return None
+
+    if model_name not in supported_models():
+        print(f"Error: Unsupported model {model_name}")
+        return None
+
+    with open(prompt_file, "r", encoding="utf-8") as file:
+        prompt_template = file.read()
+
+    sections = extract_file_sections(input_file)
+    print(f"Project size: about {sum(estimate_tokens(content) for _, _, content in sections)} tokens")
+    chunks = split_into_chunks(sections, chunk_tokens)
+    try:
+        index_data = get_code_index(workspace.code_index_path).data
+    except Exception as e:
+        print(f"Warning: code index not available ({e}); chunks get no project outline")
+        index_data = {}
+    print(f"{len(sections)} files in {len(chunks)} chunks, {max_workers} in parallel")
+
+    prompts = []
+    for chunk in chunks:
+        chunk_content = "".join(f"===== {name} ({path}) =====\n{content}\n\n" for name, path, content in chunk)
+        prompts.append(prompt_template.format(
+            project_content=chunk_content,
+            project_outline=project_outline(chunk, index_data, outline_tokens),
+        ))
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(enhance_chunk, model_name, prompt, f"{number + 1}/{len(chunks)}", max_retries)
+            for number, prompt in enumerate(prompts)
+        ]
+        if progress is not None:
+            progress(0, len(futures))
+            for completed, _ in enumerate(as_completed(futures), 1):
+                progress(completed, len(futures))
+        outputs = [future.result() for future in futures]
+
+    # Reassemble in chunk order so enhanced_project.txt reads like one response
+    output_file = workspace.enhanced_project
+    with open(output_file, "w", encoding="utf-8") as f:
+        f.write("\n\n".join(output for output in outputs if output))
+    print(f"Enhanced project saved to {output_file}")
+
+    created_files = []
+    missing = []
+    for chunk, output in zip(chunks, outputs):
+        if output:
+            created_files.extend(save_enhanced_files(output, workspace.enhanced_files_dir))
+        else:
+            missing.extend(path for _, path, _ in chunk)
+
+    print("\nSummary of created files:")
+    for file_path in created_files:
+        print(f"- {file_path}")
+    if missing:
+        print("\nFiles not enhanced (chunk failed):")
+        for file_path in missing:
+            print(f"- {file_path}")
+    return missing
+
 # Run the enhancement process
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(description="Enhance the merged project with an LLM")
+    parser.add_argument("model_name", nargs="?", help="gpt-4-turbo or gemini-2.0-flash")
+    parser.add_argument("--chunked", action="store_true", help="Enhance in token-budgeted chunks sent concurrently")
+    parser.add_argument("--workers", type=int, default=CHUNK_WORKERS, help="Concurrent chunk requests")
+    parser.add_argument("--chunk-tokens", type=int, default=CHUNK_TOKENS, help="Token budget of each chunk's files")
+    args = parser.parse_args()
+
+    if not args.model_name:
         print("Error: Model name argument is missing.")
         sys.exit(1)
 
-    model_name = sys.argv[1]
-    enhance(model_name)
+    if args.chunked:
+        enhance_chunked(args.model_name, max_workers=args.workers, chunk_tokens=args.chunk_tokens)
+    else:
+        enhance(args.model_name)
@@ -46,6 +46,8 @@ def process_files(source_directory, target_directory):
 
     print(f"\nProcessing complete. Total files processed: {files_processed}")
 
-directory = "/workspaces/CodeVision1/output/enhancedFiles"
-target_directory = "/workspaces/CodeVision1/output/ClassFiles"
-process_files(directory, target_directory)
+ENHANCED_FILES_DIR = "/workspaces/CodeVision1/output/enhancedFiles"
+CLASS_FILES_DIR = "/workspaces/CodeVision1/output/ClassFiles"
+
+if __name__ == "__main__":
+    process_files(ENHANCED_FILES_DIR, CLASS_FILES_DIR)
@@ -0,0 +1,155 @@
+import email.utils
+import os
+import random
+import threading
+import time
+from collections import deque
+
+# Shared HTTP layer for the model APIs. One pooled session per process keeps
+# connections alive between calls, every request has connect and read
+# timeouts, and 429/5xx answers and dropped connections are retried with
+# jittered exponential backoff, honouring Retry-After. The latency of every
+# call (all attempts included) is recorded under the caller's name.
+CONNECT_TIMEOUT = float(os.getenv("CODEVISION_HTTP_CONNECT_TIMEOUT", "10"))
+READ_TIMEOUT = float(os.getenv("CODEVISION_HTTP_READ_TIMEOUT", "120"))
+MAX_RETRIES = int(os.getenv("CODEVISION_HTTP_RETRIES", "4"))
+POOL_SIZE = int(os.getenv("CODEVISION_HTTP_POOL_SIZE", "16"))
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+# A longer Retry-After fails the call instead of stalling the pipeline
+RETRY_AFTER_MAX = 120.0
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+# Latencies kept per name for the percentiles in stats()
+LATENCY_SAMPLES = 1000
+
+_session = None
+_session_lock = threading.Lock()
+_stats = {}
+_stats_lock = threading.Lock()
+
+
+def get_session():
+    """Return the shared keep-alive session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                # Retries are done here, where Retry-After and metrics are visible
+                adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=0)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+    return _session
+
+
+def close():
+    """Close the pooled connections; the next request opens a new session."""
+    global _session
+    with _session_lock:
+        session, _session = _session, None
+    if session is not None:
+        session.close()
+
+
+def retry_after_seconds(value):
+    """Return the delay a Retry-After header asks for (seconds or HTTP date), or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def backoff_delay(attempt):
+    """Full-jitter exponential backoff for the given retry (0-based)."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def _record(name, seconds, status, retries):
+    with _stats_lock:
+        entry = _stats.setdefault(name, {"calls": 0, "errors": 0, "retries": 0,
+                                         "latencies": deque(maxlen=LATENCY_SAMPLES)})
+        entry["calls"] += 1
+        entry["retries"] += retries
+        if status is None or status >= 400:
+            entry["errors"] += 1
+        entry["latencies"].append(seconds)
+
+
+def post(url, name="http", timeout=None, retries=MAX_RETRIES, **kwargs):
+    """
+    POST through the shared session and return the final response.
+
+    429 and 5xx answers and connection errors or timeouts are retried up to
+    `retries` times. The last response is returned whatever its status (the
+    caller checks it, as with requests.post); if the last attempt raised,
+    that exception propagates. Other keyword arguments go to requests.
+
+    Args:
+        url (str): Request URL
+        name (str, optional): Metrics bucket, e.g. the API being called
+        timeout (tuple, optional): (connect, read) seconds
+        retries (int, optional): Retries after the first attempt
+    """
+    import requests
+
+    session = get_session()
+    timeout = timeout or (CONNECT_TIMEOUT, READ_TIMEOUT)
+    start = time.perf_counter()
+    attempt = 0
+    while True:
+        try:
+            response = session.post(url, timeout=timeout, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= retries:
+                _record(name, time.perf_counter() - start, None, attempt)
+                raise
+            delay = backoff_delay(attempt)
+            print(f"{name}: {e.__class__.__name__}, retrying in {delay:.1f}s")
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                _record(name, time.perf_counter() - start, response.status_code, attempt)
+                return response
+            retry_after = retry_after_seconds(response.headers.get("Retry-After"))
+            if retry_after is not None and retry_after > RETRY_AFTER_MAX:
+                _record(name, time.perf_counter() - start, response.status_code, attempt)
+                return response
+            if retry_after is not None:
+                # A little jitter so throttled callers don't come back in lockstep
+                delay = retry_after + random.uniform(0, BACKOFF_BASE)
+            else:
+                delay = backoff_delay(attempt)
+            # Hand the connection back to the pool before sleeping
+            response.close()
+            print(f"{name}: HTTP {response.status_code}, retrying in {delay:.1f}s")
+        time.sleep(delay)
+        attempt += 1
+
+
+def _percentile(values, fraction):
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+def stats():
+    """Return per-name call, error and retry counts and latency percentiles (ms)."""
+    with _stats_lock:
+        snapshot = {name: dict(entry, latencies=sorted(entry["latencies"])) for name, entry in _stats.items()}
+    result = {}
+    for name, entry in snapshot.items():
+        latencies = entry.pop("latencies")
+        if latencies:
+            entry["p50_ms"] = round(_percentile(latencies, 0.5) * 1000, 1)
+            entry["p95_ms"] = round(_percentile(latencies, 0.95) * 1000, 1)
+            entry["max_ms"] = round(latencies[-1] * 1000, 1)
+        result[name] = entry
+    return result
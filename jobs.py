@@ -0,0 +1,78 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+# Long-running work (project enhancement) runs here instead of inside the
+# HTTP request; MAX_JOBS bounds how many run at once, the rest queue.
+MAX_JOBS = int(os.getenv("CODEVISION_MAX_JOBS", "2"))
+# Finished jobs are forgotten after this many seconds
+JOB_RETENTION_SECONDS = int(os.getenv("CODEVISION_JOB_RETENTION", "3600"))
+
+_executor = ThreadPoolExecutor(max_workers=MAX_JOBS, thread_name_prefix="codevision-job")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def _update(job_id, **fields):
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is not None:
+            job.update(fields, updated=time.time())
+
+
+def _prune():
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    with _jobs_lock:
+        for job_id in [k for k, job in _jobs.items()
+                       if job["status"] in ("done", "failed") and job["updated"] < cutoff]:
+            del _jobs[job_id]
+
+
+def _run(job_id, func, args):
+    def progress(stage, percent):
+        _update(job_id, stage=stage, percent=percent)
+
+    _update(job_id, status="running", stage="starting")
+    try:
+        result = func(*args, progress=progress)
+    except Exception as e:
+        _update(job_id, status="failed", error=str(e))
+        return
+    _update(job_id, status="done", stage="done", percent=100, result=result)
+
+
+def submit_job(func, *args):
+    """
+    Queue func(*args, progress=callback) on the job executor.
+
+    func reports progress by calling progress(stage, percent); its return
+    value (e.g. the path of a produced file) becomes the job result.
+
+    Returns:
+        str: The job id
+    """
+    _prune()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with _jobs_lock:
+        _jobs[job_id] = {
+            "id": job_id,
+            "status": "queued",
+            "stage": "queued",
+            "percent": 0,
+            "result": None,
+            "error": None,
+            "created": now,
+            "updated": now,
+        }
+    _executor.submit(_run, job_id, func, args)
+    return job_id
+
+
+def get_job(job_id):
+    """Return a snapshot of the job's state, or None if it is unknown."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        return dict(job) if job is not None else None
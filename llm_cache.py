@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+# On-disk cache of model responses keyed by (model, prompt, parameters).
+# Entries older than TTL are ignored; once the directory grows past
+# MAX_BYTES the least recently used entries are deleted.
+CACHE_DIR = os.getenv("CODEVISION_LLM_CACHE_DIR", "/workspaces/CodeVision1/output/llm_cache")
+TTL_SECONDS = int(os.getenv("CODEVISION_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+MAX_BYTES = int(os.getenv("CODEVISION_LLM_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+ENABLED = os.getenv("CODEVISION_LLM_CACHE", "1") != "0"
+# Stores between full scans of the directory; other processes write to it too
+RESCAN_EVERY = 256
+
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_lock = threading.Lock()
+# Running size of the cache directory: seeded by the first evict(), then
+# kept up to date by store() and the removals of this process
+_total_bytes = None
+_stores_since_scan = 0
+
+
+def cache_key(model_name, prompt, params=None):
+    """Return the content hash identifying a request."""
+    payload = json.dumps({"model": model_name, "prompt": prompt, "params": params or {}},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _entry_path(key):
+    # Two-level fan-out keeps directories small
+    return os.path.join(CACHE_DIR, key[:2], f"{key}.json")
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def _add_bytes(delta):
+    global _total_bytes
+    with _lock:
+        if _total_bytes is not None:
+            _total_bytes += delta
+
+
+def _remove(path):
+    try:
+        size = os.path.getsize(path)
+        os.remove(path)
+    except OSError:
+        return False
+    _add_bytes(-size)
+    return True
+
+
+def get_cached(model_name, prompt, params=None):
+    """Return the cached response for this request, or None."""
+    if not ENABLED:
+        return None
+    path = _entry_path(cache_key(model_name, prompt, params))
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except (FileNotFoundError, ValueError):
+        _count("misses")
+        return None
+
+    if time.time() - entry.get("created", 0) > TTL_SECONDS:
+        _remove(path)
+        _count("misses")
+        return None
+
+    # mtime doubles as the last-used time for LRU eviction
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    _count("hits")
+    return entry["response"]
+
+
+def store(model_name, prompt, response, params=None):
+    """Cache a response (None is never cached) and evict if over the size limit."""
+    global _stores_since_scan
+    if not ENABLED or response is None:
+        return
+    path = _entry_path(cache_key(model_name, prompt, params))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"created": time.time(), "model": model_name, "response": response}, f)
+    size = os.path.getsize(tmp_path)
+    try:
+        replaced = os.path.getsize(path)
+    except OSError:
+        replaced = 0
+    os.replace(tmp_path, path)
+    _count("stores")
+    _add_bytes(size - replaced)
+
+    # The directory is only walked when the running total says it is too
+    # big, on first use, or now and then to pick up other processes' entries
+    with _lock:
+        _stores_since_scan += 1
+        over = _total_bytes is not None and _total_bytes > MAX_BYTES
+        scan = over or _total_bytes is None or _stores_since_scan >= RESCAN_EVERY
+    if over:
+        # Make room for more than this one entry, so a full cache is not walked on every store
+        evict(MAX_BYTES * 9 // 10)
+    elif scan:
+        evict()
+
+
+def discard(model_name, prompt, params=None):
+    """Drop a cached response, e.g. one the caller found unusable."""
+    _remove(_entry_path(cache_key(model_name, prompt, params)))
+
+
+def evict(max_bytes=None):
+    """
+    Delete least recently used entries until the cache fits in max_bytes,
+    and reset the running size total from what is on disk.
+    """
+    max_bytes = MAX_BYTES if max_bytes is None else max_bytes
+    entries = []
+    total = 0
+    for root, _, files in os.walk(CACHE_DIR):
+        for file in files:
+            if not file.endswith(".json"):
+                continue
+            path = os.path.join(root, file)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+    if total > max_bytes:
+        for _, size, path in sorted(entries):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            _count("evictions")
+            if total <= max_bytes:
+                break
+
+    global _total_bytes, _stores_since_scan
+    with _lock:
+        _total_bytes = total
+        _stores_since_scan = 0
+
+
+def stats():
+    """Return hit/miss/store/eviction counters for this process."""
+    with _lock:
+        counters = dict(_stats)
+    lookups = counters["hits"] + counters["misses"]
+    counters["hit_rate"] = counters["hits"] / lookups if lookups else 0.0
+    return counters
@@ -0,0 +1,263 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import threading
+
+# Indexed merge of a project's .cs files.
+#
+# Layout: MAGIC, then the UTF-8 content of every file back to back, then a
+# JSON index {"files": [{"name", "path", "offset", "length"}, ...],
+# "text_sha256": ...} (byte offsets from the start of the file; older merges
+# have only the list), then a trailer of the index offset (<Q) and MAGIC.
+# text_sha256 is the hash of the merged_output.txt export_text() writes,
+# which tells whether a text next to the merge is still its export. The index is written last so the writer can stream files without
+# holding them; readers find it through the fixed-size trailer and then
+# only touch the bytes of the files they ask for.
+MAGIC = b"CVMERGE1"
+TRAILER = struct.Struct("<Q8s")
+SEPARATOR = "=" * 80
+HEADER_PATTERN = re.compile(r"^===== (.*?) \((.*?)\) =====$")
+
+
+def pack_path_for(text_path):
+    """Return the indexed merge that sits next to a merged_output.txt."""
+    return os.path.splitext(text_path)[0] + ".cvm"
+
+
+class MergedWriter:
+    """Stream files into an indexed merge; the index is written on close()."""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = []
+        self._text_digest = hashlib.sha256()
+        self._tmp_path = f"{path}.{os.getpid()}.tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._file.write(MAGIC)
+
+    def add(self, name, file_path, content):
+        data = content.encode("utf-8")
+        self.entries.append({"name": name, "path": file_path, "offset": self._file.tell(), "length": len(data)})
+        self._file.write(data)
+        self._text_digest.update(_text_header(name, file_path).encode("utf-8") + data + _TEXT_FOOTER_BYTES)
+
+    def close(self):
+        if self._file is None:
+            return
+        index_offset = self._file.tell()
+        index = {"files": self.entries, "text_sha256": self._text_digest.hexdigest()}
+        self._file.write(json.dumps(index).encode("utf-8"))
+        self._file.write(TRAILER.pack(index_offset, MAGIC))
+        self._file.close()
+        self._file = None
+        # Readers never see a half-written merge
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class MergedReader:
+    """Memory-mapped access to an indexed merge.
+
+    Iterating yields (name, path, content) one file at a time; read() seeks
+    straight to a single file by path or name.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise ValueError(f"{path} is not a merged project file")
+        if len(self._map) < len(MAGIC) + TRAILER.size or self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a merged project file")
+        index_offset, magic = TRAILER.unpack(self._map[-TRAILER.size:])
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is truncated")
+        index = json.loads(self._map[index_offset:-TRAILER.size].decode("utf-8"))
+        if isinstance(index, list):
+            index = {"files": index, "text_sha256": None}
+        self.entries = index["files"]
+        self.text_sha256 = index["text_sha256"]
+        self._by_key = {}
+        for entry in self.entries:
+            self._by_key.setdefault(entry["path"], entry)
+            self._by_key.setdefault(entry["name"], entry)
+
+    def _content(self, entry):
+        start = entry["offset"]
+        return self._map[start:start + entry["length"]].decode("utf-8")
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __iter__(self):
+        for entry in self.entries:
+            yield entry["name"], entry["path"], self._content(entry)
+
+    def text_size(self):
+        """Return the size in bytes of the merged_output.txt export_text() writes from this merge."""
+        return sum(len(_text_header(entry["name"], entry["path"]).encode("utf-8")) + entry["length"]
+                   + len(_TEXT_FOOTER) for entry in self.entries)
+
+    def read(self, key):
+        """Return the content of the file with this path (or name), or None."""
+        entry = self._by_key.get(key)
+        return self._content(entry) if entry else None
+
+    def close(self):
+        if getattr(self, "_map", None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+_TEXT_FOOTER = "\n\n" + SEPARATOR + "\n\n"
+_TEXT_FOOTER_BYTES = _TEXT_FOOTER.encode("utf-8")
+
+# sha256 of merged texts by path, with the (mtime, size) they were hashed at
+_text_hashes = {}
+_text_hashes_lock = threading.Lock()
+
+
+def _text_header(name, file_path):
+    return f"===== {name} ({file_path}) =====\n"
+
+
+def write_text_section(outfile, name, file_path, content):
+    """Write one file in the ===== name (path) ===== text format."""
+    outfile.write(_text_header(name, file_path))
+    outfile.write(content)
+    outfile.write(_TEXT_FOOTER)
+
+
+def export_text(pack_path, text_path):
+    """Write the legacy merged_output.txt text from an indexed merge."""
+    # No newline translation, so the size matches MergedReader.text_size()
+    with MergedReader(pack_path) as reader, open(text_path, "w", encoding="utf-8", newline="\n") as outfile:
+        for name, file_path, content in reader:
+            write_text_section(outfile, name, file_path, content)
+        text_sha256 = reader.text_sha256
+    if text_sha256:
+        # The text was just written from the merge: no need to hash it again
+        _remember_text_hash(text_path, text_sha256)
+
+
+def _text_stamp(text_path):
+    st = os.stat(text_path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _remember_text_hash(text_path, text_sha256):
+    stamp = _text_stamp(text_path)
+    with _text_hashes_lock:
+        _text_hashes[os.path.abspath(text_path)] = (stamp, text_sha256)
+
+
+def _text_hash(text_path):
+    """Return the sha256 of a merged text, hashing it again only after it changed."""
+    stamp = _text_stamp(text_path)
+    with _text_hashes_lock:
+        cached = _text_hashes.get(os.path.abspath(text_path))
+    if cached and cached[0] == stamp:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(text_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    with _text_hashes_lock:
+        _text_hashes[os.path.abspath(text_path)] = (stamp, digest.hexdigest())
+    return digest.hexdigest()
+
+
+def _iter_text_sections(text_path):
+    # Line-by-line so only the current file is held in memory
+    name = file_path = None
+    lines = []
+    with open(text_path, "r", encoding="utf-8") as infile:
+        for line in infile:
+            match = HEADER_PATTERN.match(line.rstrip("\n"))
+            if match:
+                if name is not None:
+                    yield name, file_path, "".join(lines)
+                name, file_path = match.group(1).strip(), match.group(2).strip()
+                lines = []
+            elif name is not None:
+                lines.append(line)
+    if name is not None:
+        yield name, file_path, "".join(lines)
+
+
+def open_merged(text_path):
+    """
+    Return a MergedReader over the indexed merge next to text_path, or None
+    if there is none or the text no longer matches it.
+
+    The text is exported from the merge, so it is current when it is
+    byte for byte what the merge would export: first its size is compared,
+    then its sha256 with the one stored in the merge (mtimes say nothing:
+    the text is written after the merge, and restored merges keep their
+    cached mtime). Merges written before the hash was stored never match.
+    """
+    pack_path = pack_path_for(text_path)
+    if not os.path.exists(pack_path):
+        return None
+    try:
+        reader = MergedReader(pack_path)
+    except (OSError, ValueError) as e:
+        print(f"Ignoring {pack_path}: {e}")
+        return None
+    try:
+        current = not os.path.exists(text_path) or (
+            os.path.getsize(text_path) == reader.text_size()
+            and reader.text_sha256 is not None and _text_hash(text_path) == reader.text_sha256)
+    except OSError:
+        current = False
+    if not current:
+        reader.close()
+        return None
+    return reader
+
+
+def iter_sections(text_path):
+    """
+    Yield (name, path, content) for every file of a merged project.
+
+    Uses the indexed merge next to text_path when the text still matches
+    it, otherwise parses the text. Content is stripped the same way in
+    both cases, without the trailing separator.
+    """
+    reader = open_merged(text_path)
+    if reader is not None:
+        with reader:
+            for name, file_path, content in reader:
+                yield name, file_path, content.strip()
+    else:
+        for name, file_path, content in _iter_text_sections(text_path):
+            yield name, file_path, content.strip().rstrip("=").strip()
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import threading
+
+# The class/method dropdown, built from the code index whenever a scan
+# changes it and saved next to code_index.json as methods.json. Readers
+# keep the parsed list in memory until the file changes.
+METHODS_FILE = "methods.json"
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+
+_lists = {}
+_lists_lock = threading.Lock()
+
+
+def method_list_path(index_path):
+    """Return where the method list for this code index is stored."""
+    return os.path.join(os.path.dirname(index_path), METHODS_FILE)
+
+
+def build_method_list(index_data):
+    """
+    Return the dropdown entries for an index: "class:Name" for every type,
+    then "Class.Method" for every method except constructors, each sorted.
+    """
+    classes, methods = set(), set()
+    for file_data in index_data.values():
+        classes.update(file_data["classes"])
+        for span in file_data.get("method_spans", ()):
+            if span["name"] != span["class"]:
+                methods.add(f"{span['class']}.{span['name']}")
+    return [f"class:{c}" for c in sorted(classes)] + sorted(methods)
+
+
+def save_method_list(entries, path):
+    """Write the entries with their ETag (hash of the list)."""
+    raw = json.dumps(entries).encode("utf-8")
+    payload = {"etag": hashlib.sha256(raw).hexdigest()[:32], "entries": entries}
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f)
+    os.replace(tmp_path, path)
+
+
+def load_method_list(path):
+    """
+    Return (etag, entries) for a saved method list, or None if there is none.
+    The parsed list is kept in memory until the file changes.
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    key = os.path.abspath(path)
+    with _lists_lock:
+        cached = _lists.get(key)
+        if cached and cached[0] == stamp:
+            return cached[1]
+    with open(path, "r", encoding="utf-8") as f:
+        payload = json.load(f)
+    result = (payload["etag"], payload["entries"])
+    with _lists_lock:
+        _lists[key] = (stamp, result)
+    return result
+
+
+def _display_name(entry):
+    return entry[6:] if entry.startswith("class:") else entry
+
+
+def _fuzzy_score(query, text):
+    # Subsequence match; lower is better (span of the match, then length)
+    position, first = 0, None
+    for char in query:
+        position = text.find(char, position)
+        if position < 0:
+            return None
+        if first is None:
+            first = position
+        position += 1
+    return (position - first, len(text))
+
+
+def filter_entries(entries, query="", mode="prefix", offset=0, limit=DEFAULT_PAGE_SIZE):
+    """
+    Filter and page the entries.
+
+    mode "prefix" keeps entries whose class or method name starts with
+    query; "fuzzy" keeps entries containing query's characters in order,
+    best matches first. Matching ignores case.
+
+    Returns:
+        tuple: (number of matching entries, the requested page)
+    """
+    query = query.lower()
+    if not query:
+        matches = entries
+    elif mode == "fuzzy":
+        scored = []
+        for entry in entries:
+            score = _fuzzy_score(query, _display_name(entry).lower())
+            if score is not None:
+                scored.append((score, entry))
+        scored.sort()
+        matches = [entry for _, entry in scored]
+    else:
+        matches = [entry for entry in entries
+                   if any(part.startswith(query) for part in _display_name(entry).lower().split("."))
+                   or _display_name(entry).lower().startswith(query)]
+    limit = max(0, min(limit, MAX_PAGE_SIZE))
+    offset = max(0, offset)
+    return len(matches), matches[offset:offset + limit]
@@ -1,8 +1,7 @@
-import os
 import sys
-import tiktoken  # OpenAI's tokenization library
-import google.generativeai as genai  # Gemini API
-import requests
+from providers import generate
+from retrieval import select_context
+from workspace import DEFAULT_WORKSPACE
 
 def read_file(file_path):
     """Read the content of a file."""
@@ -16,90 +15,49 @@ def read_file(file_path):
         print(f"Error reading file {file_path}: {e}")
         return None
 
-def call_gemini_api(prompt):
-    """Call the Gemini API with the provided prompt and return the response."""
-    api_key = os.getenv("GEMINI_API_KEY")
-    if not api_key:
-        print("Error: Gemini API key is not set.")
-        return None
-    
-    # Token count estimation
-    encoder = tiktoken.get_encoding("cl100k_base")
-    prompt_tokens = len(encoder.encode(prompt))
-    
-    genai.configure(api_key=api_key)
-    
-    try:
-        model = genai.GenerativeModel(model_name="gemini-2.0-flash")
-        response = model.generate_content(prompt)
-        return response.text if response else None
-    except Exception as e:
-        print(f"Error calling Gemini API: {e}")
-        return None
-
-def call_openai_api(prompt):
-    """Call the OpenAI API with the provided prompt and return the response."""
-    api_key = os.getenv("OPENAI_API_KEY")
-    if not api_key:
-        print("Error: OpenAI API key is not set.")
-        return None
-
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
+def build_query_prompt(user_query, project_type, workspace=DEFAULT_WORKSPACE):
+    """
+    Build the chat prompt for a question about the project.
 
-    # Token count estimation
-    encoder = tiktoken.get_encoding("cl100k_base")
-    
-    data = {
-        "model": "gpt-4-turbo",
-        "messages": [{"role": "user", "content": prompt}]
-    }
-    
-    try:
-        response = requests.post(url, headers=headers, json=data)
-        if response.status_code == 200:
-            raw_response = response.json()
-            return raw_response.get("choices", [{}])[0].get("message", {}).get("content", None)
-        else:
-            print(f"Error with API request: {response.status_code} {response.text}")
-            return None
-    except Exception as e:
-        print(f"Error calling OpenAI API: {e}")
-        return None
-
-def process_query(user_query, model, project_type):
-    """Generate a structured prompt and get a response."""
+    Returns:
+        tuple: (prompt, None), or (None, error message) if a part is missing
+    """
     # Define file paths
     prompt_template_path = "/workspaces/CodeVision1/input/promptForChat.txt"
     
     if project_type == "raw":
-        class_content_path = "/workspaces/CodeVision1/output/merged_output.txt"
+        class_content_path = workspace.merged_output
     elif project_type == "enhanced":
-        class_content_path = "/workspaces/CodeVision1/output/enhanced_project.txt"
+        class_content_path = workspace.enhanced_project
 
     # Read prompt template
     prompt_template = read_file(prompt_template_path)
     if not prompt_template:
-        return "Error: Prompt template not available."
+        return None, "Error: Prompt template not available."
 
-    # Read class content
-    class_content = read_file(class_content_path)
+    # Only the chunks relevant to the query go into the prompt
+    class_content, stats = select_context(user_query, project_type, workspace=workspace)
+    if class_content:
+        print(f"Retrieval: {stats['selected']}/{stats['chunks']} chunks, "
+              f"{stats['context_tokens']} of {stats['project_tokens']} project tokens "
+              f"({stats['saved_tokens']} saved)")
+    else:
+        # No chunks (e.g. unparseable output); fall back to the whole file
+        class_content = read_file(class_content_path)
     if not class_content:
-        return "Error: Class content not found."
+        return None, "Error: Class content not found."
 
     # Format the final prompt
-    final_prompt = prompt_template.replace("{enhanced_merged_output}", class_content).replace("{userQuery}", user_query)
+    return prompt_template.replace("{enhanced_merged_output}", class_content).replace("{userQuery}", user_query), None
+
+def process_query(user_query, model, project_type, workspace=DEFAULT_WORKSPACE):
+    """Generate a structured prompt and get a response."""
+    final_prompt, error = build_query_prompt(user_query, project_type, workspace)
+    if final_prompt is None:
+        return error
 
-    if model == "gpt-4-turbo":
-            response = call_openai_api(final_prompt)
-    elif model == "gemini-2.0-flash":
-            response = call_gemini_api(final_prompt)    
-    # Call Gemini API
-    response = call_gemini_api(final_prompt)
-    #print(response)
+    # The selected model's provider answers (it used to always be Gemini)
+    response = generate(model, final_prompt)
     return response if response else "Error: Unable to get a response from the AI."
 
 if __name__ == "__main__":
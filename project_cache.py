@@ -0,0 +1,137 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+# Derived artifacts of an uploaded project, stored under the sha256 of the
+# uploaded archive: PROJECTS_DIR/<hash>/<artifact name>. An identical
+# re-upload finds its merged output, method list, code index, graphs and
+# enhanced zips here instead of rebuilding them. meta.json records when the
+# project was created and last used, which drives cleanup().
+PROJECTS_DIR = os.getenv("CODEVISION_PROJECTS_DIR", "/workspaces/CodeVision1/output/projects")
+MAX_AGE_SECONDS = int(os.getenv("CODEVISION_PROJECT_CACHE_DAYS", "14")) * 24 * 3600
+MAX_BYTES = int(os.getenv("CODEVISION_PROJECT_CACHE_MB", "2048")) * 1024 * 1024
+META_FILE = "meta.json"
+
+# Artifact names are file names, optionally under one or more folders
+# ("graphs/x.png"); no part may be empty or start with a dot, so a name
+# cannot climb out of its project's directory.
+_ARTIFACT_PART = re.compile(r"^[A-Za-z0-9_][A-Za-z0-9_.\-]*$")
+_ARCHIVE_HASH = re.compile(r"^[0-9a-f]{64}$")
+
+_lock = threading.Lock()
+
+
+def hash_file(path, chunk_size=1024 * 1024):
+    """Return the sha256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def project_dir(archive_hash):
+    return os.path.join(PROJECTS_DIR, archive_hash)
+
+
+def _artifact_file(archive_hash, name):
+    """Return where artifact name of a project is stored; raises ValueError for unsafe names."""
+    parts = name.split("/")
+    if not _ARCHIVE_HASH.match(archive_hash) or not all(_ARTIFACT_PART.match(part) for part in parts):
+        raise ValueError(f"Invalid cache artifact {archive_hash}/{name}")
+    return os.path.join(project_dir(archive_hash), *parts)
+
+
+def _touch(archive_hash):
+    meta_path = os.path.join(project_dir(archive_hash), META_FILE)
+    now = time.time()
+    try:
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (FileNotFoundError, ValueError):
+        meta = {"created": now}
+    meta["last_used"] = now
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+
+
+def artifact_path(archive_hash, name):
+    """Return the cached artifact's path if it exists (and mark the project used), else None."""
+    path = _artifact_file(archive_hash, name)
+    if not os.path.exists(path):
+        return None
+    with _lock:
+        _touch(archive_hash)
+    return path
+
+
+def store_artifact(archive_hash, name, src_path):
+    """Copy src_path into the project's cache as name."""
+    dest = _artifact_file(archive_hash, name)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    tmp_path = f"{dest}.{os.getpid()}.{threading.get_ident()}.tmp"
+    shutil.copy2(src_path, tmp_path)
+    os.replace(tmp_path, dest)
+    with _lock:
+        _touch(archive_hash)
+    return dest
+
+
+def restore_artifact(archive_hash, name, dest_path):
+    """Copy a cached artifact to dest_path; returns False if it is not cached."""
+    path = artifact_path(archive_hash, name)
+    if path is None:
+        return False
+    os.makedirs(os.path.dirname(dest_path) or ".", exist_ok=True)
+    shutil.copy2(path, dest_path)
+    return True
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for file in files:
+            try:
+                total += os.path.getsize(os.path.join(root, file))
+            except OSError:
+                pass
+    return total
+
+
+def cleanup(max_age=MAX_AGE_SECONDS, max_bytes=MAX_BYTES):
+    """
+    Remove cached projects unused for max_age seconds, then the least
+    recently used ones until the cache fits in max_bytes.
+
+    Returns:
+        list: Hashes of the removed projects
+    """
+    if not os.path.isdir(PROJECTS_DIR):
+        return []
+    now = time.time()
+    projects = []
+    for archive_hash in os.listdir(PROJECTS_DIR):
+        path = project_dir(archive_hash)
+        if not os.path.isdir(path):
+            continue
+        try:
+            with open(os.path.join(path, META_FILE), "r", encoding="utf-8") as f:
+                last_used = json.load(f).get("last_used", 0)
+        except (FileNotFoundError, ValueError):
+            last_used = os.path.getmtime(path)
+        projects.append([last_used, _dir_size(path), archive_hash])
+
+    removed = []
+    total = sum(size for _, size, _ in projects)
+    with _lock:
+        for last_used, size, archive_hash in sorted(projects):
+            if now - last_used <= max_age and total <= max_bytes:
+                break
+            shutil.rmtree(project_dir(archive_hash), ignore_errors=True)
+            total -= size
+            removed.append(archive_hash)
+    return removed
@@ -0,0 +1,139 @@
+import io
+import json
+import os
+import shutil
+import threading
+import zipfile
+
+# Read-only view of an uploaded project, either a directory or a .zip read
+# in place. Stages that only need the .cs sources (merging, method listing)
+# go through this instead of extracting the archive themselves; the stages
+# that need real files on disk (core.py, packaging) share one extraction
+# made by extract_once().
+
+EXTRACT_MARKER = ".codevision_extracted"
+
+_extract_lock = threading.Lock()
+
+
+class DirProjectFS:
+    """A project that is already a directory tree."""
+
+    def __init__(self, root):
+        self.root = root
+
+    def paths(self, extension=".cs"):
+        """Return the project files with this extension, sorted."""
+        found = []
+        for root, _, files in os.walk(self.root):
+            for file in files:
+                if file.lower().endswith(extension):
+                    found.append(os.path.join(root, file))
+        return sorted(found)
+
+    def open(self, path):
+        return open(path, "r", encoding="utf-8")
+
+    def read_text(self, path):
+        with self.open(path) as f:
+            return f.read()
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ZipProjectFS:
+    """A project read straight from its .zip; members are decompressed lazily on open()."""
+
+    def __init__(self, zip_path):
+        self.root = zip_path
+        self._zip = zipfile.ZipFile(zip_path, "r")
+        # ZipFile can't serve concurrent reads from one handle
+        self._lock = threading.Lock()
+
+    def paths(self, extension=".cs"):
+        """Return the archive members with this extension, sorted."""
+        return sorted(info.filename for info in self._zip.infolist()
+                      if not info.is_dir() and info.filename.lower().endswith(extension))
+
+    def open(self, path):
+        """Return a text stream over one member, decompressed as it is read."""
+        return io.TextIOWrapper(self._zip.open(path), encoding="utf-8")
+
+    def read_text(self, path):
+        with self._lock, self.open(path) as f:
+            return f.read()
+
+    def close(self):
+        self._zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def open_project(path):
+    """Return a project filesystem for a .zip archive or a directory."""
+    if path.lower().endswith(".zip") and os.path.isfile(path):
+        return ZipProjectFS(path)
+    return DirProjectFS(path)
+
+
+def _archive_stamp(zip_path, archive_hash=None):
+    if archive_hash:
+        # Content identity survives re-uploads of the same archive
+        return {"sha256": archive_hash}
+    st = os.stat(zip_path)
+    return {"archive": os.path.abspath(zip_path), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def extract_once(zip_path, dest_dir, archive_hash=None):
+    """
+    Extract zip_path into dest_dir unless that exact archive is already there.
+
+    A marker file records which archive the directory holds (its sha256 if
+    archive_hash is given, else path, size and mtime), so every stage can
+    call this and only the first one extracts. Returns dest_dir.
+    """
+    marker = os.path.join(dest_dir, EXTRACT_MARKER)
+    stamp = _archive_stamp(zip_path, archive_hash)
+    with _extract_lock:
+        try:
+            with open(marker, "r", encoding="utf-8") as f:
+                if json.load(f) == stamp:
+                    return dest_dir
+        except (FileNotFoundError, ValueError):
+            pass
+
+        if os.path.exists(dest_dir):
+            shutil.rmtree(dest_dir)
+        os.makedirs(dest_dir)
+        with zipfile.ZipFile(zip_path, "r") as zip_ref:
+            zip_ref.extractall(dest_dir)
+        with open(marker, "w", encoding="utf-8") as f:
+            json.dump(stamp, f)
+    return dest_dir
+
+
+def invalidate_extractions(directory):
+    """Forget every extraction under directory so the next extract_once() starts clean."""
+    for root, _, files in os.walk(directory):
+        if EXTRACT_MARKER in files:
+            os.remove(os.path.join(root, EXTRACT_MARKER))
+
+
+def archive_hash_of(directory):
+    """Return the sha256 of the archive extracted into directory, if known."""
+    try:
+        with open(os.path.join(directory, EXTRACT_MARKER), "r", encoding="utf-8") as f:
+            return json.load(f).get("sha256")
+    except (FileNotFoundError, ValueError):
+        return None
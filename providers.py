@@ -0,0 +1,325 @@
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+
+import http_client
+import llm_cache
+from tokens import estimate_tokens
+
+# Every model call goes through generate() or generate_stream() here. The
+# response cache is checked first; a call that has to go to the API then
+# takes a slot from its provider's concurrency semaphore and its share of
+# the provider's requests-per-minute and tokens-per-minute budgets, so
+# enhancement chunks and chat requests running at the same time queue up
+# below the API's rate limits instead of being throttled by it.
+# A limit of 0 means unlimited.
+
+OPENAI_BASE_URL = os.getenv("CODEVISION_OPENAI_BASE_URL", "https://api.openai.com/v1").rstrip("/")
+OPENAI_CONCURRENCY = int(os.getenv("CODEVISION_OPENAI_CONCURRENCY", "4"))
+OPENAI_RPM = int(os.getenv("CODEVISION_OPENAI_RPM", "500"))
+OPENAI_TPM = int(os.getenv("CODEVISION_OPENAI_TPM", "30000"))
+GEMINI_CONCURRENCY = int(os.getenv("CODEVISION_GEMINI_CONCURRENCY", "4"))
+GEMINI_RPM = int(os.getenv("CODEVISION_GEMINI_RPM", "2000"))
+GEMINI_TPM = int(os.getenv("CODEVISION_GEMINI_TPM", "4000000"))
+RATE_WINDOW_SECONDS = 60
+
+
+class ProviderError(Exception):
+    """The model could not be asked, or its answer broke off."""
+
+
+class RateLimiter:
+    """
+    At most `limit` units (requests or tokens) in any `window` seconds.
+
+    A call's units count from acquire() until a window after release(),
+    i.e. after its response arrived: the API counts a request when it gets
+    there, which the client can only bound from the end of the call.
+    """
+
+    def __init__(self, limit, window=RATE_WINDOW_SECONDS):
+        self.limit = limit
+        self.window = window
+        # [release time, or None while in flight, amount]
+        self._used = []
+        self._lock = threading.Lock()
+
+    def _expire(self, now):
+        self._used = [entry for entry in self._used if entry[0] is None or entry[0] > now - self.window]
+
+    def acquire(self, amount=1):
+        """Take amount from the budget, waiting until it fits; returns a handle for release()."""
+        if not self.limit:
+            return None
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._expire(now)
+                # More than the whole limit at once still goes through, alone
+                if sum(entry[1] for entry in self._used) + amount <= self.limit or not self._used:
+                    entry = [None, amount]
+                    self._used.append(entry)
+                    return entry
+                done = [entry[0] for entry in self._used if entry[0] is not None]
+                wait = min(done) + self.window - now if done else self.window
+            # Also woken up early to notice calls that finished meanwhile
+            time.sleep(min(max(wait, 0.01), 1.0))
+
+    def release(self, entry):
+        """Start the window of an acquired amount now that its call is over."""
+        if entry is not None:
+            with self._lock:
+                entry[0] = time.monotonic()
+
+    def record(self, amount):
+        """Count usage only known afterwards (the answer's tokens) without waiting."""
+        if not self.limit or amount <= 0:
+            return
+        with self._lock:
+            self._used.append([time.monotonic(), amount])
+
+
+class Provider(ABC):
+    """
+    A model API with its own concurrency and rate budgets.
+
+    Subclasses set name, label, api_key_env and models and implement
+    _generate() and _stream(); callers use generate() and stream(). A
+    subclass missing either cannot be instantiated, so it fails when it
+    is registered rather than on its first request.
+    """
+
+    name = None
+    label = None
+    api_key_env = None
+    models = ()
+
+    def __init__(self, max_concurrency, rpm, tpm, window=RATE_WINDOW_SECONDS):
+        self._slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency > 0 else nullcontext()
+        self.requests = RateLimiter(rpm, window)
+        self.tokens = RateLimiter(tpm, window)
+        self._stats = {"calls": 0, "in_flight": 0, "waited_seconds": 0.0}
+        self._stats_lock = threading.Lock()
+
+    def api_key(self):
+        api_key = os.getenv(self.api_key_env)
+        if not api_key:
+            raise ProviderError(f"{self.label} API key is not set.")
+        return api_key
+
+    @contextmanager
+    def _budget(self, prompt):
+        # A slot first, so waiting for the rate budget doesn't let a burst through
+        start = time.monotonic()
+        with self._slots:
+            request = self.requests.acquire(1)
+            tokens = self.tokens.acquire(estimate_tokens(prompt))
+            with self._stats_lock:
+                self._stats["calls"] += 1
+                self._stats["in_flight"] += 1
+                self._stats["waited_seconds"] += time.monotonic() - start
+            try:
+                yield
+            finally:
+                self.requests.release(request)
+                self.tokens.release(tokens)
+                with self._stats_lock:
+                    self._stats["in_flight"] -= 1
+
+    def generate(self, model_name, prompt):
+        """Return the model's answer to prompt; raises ProviderError."""
+        cached = llm_cache.get_cached(model_name, prompt)
+        if cached is not None:
+            return cached
+        api_key = self.api_key()
+        print(f"Number of tokens in the prompt: ~{estimate_tokens(prompt)}")
+        with self._budget(prompt):
+            text = self._generate(api_key, model_name, prompt)
+        self.tokens.record(estimate_tokens(text or ""))
+        llm_cache.store(model_name, prompt, text)
+        return text
+
+    def stream(self, model_name, prompt):
+        """Yield the model's answer to prompt as it is generated; raises ProviderError."""
+        cached = llm_cache.get_cached(model_name, prompt)
+        if cached is not None:
+            yield cached
+            return
+        api_key = self.api_key()
+        parts = []
+        with self._budget(prompt):
+            for text in self._stream(api_key, model_name, prompt):
+                parts.append(text)
+                yield text
+        answer = "".join(parts)
+        self.tokens.record(estimate_tokens(answer))
+        # Only answers that arrived in full are cached
+        llm_cache.store(model_name, prompt, answer)
+
+    def stats(self):
+        with self._stats_lock:
+            return dict(self._stats, waited_seconds=round(self._stats["waited_seconds"], 3))
+
+    @abstractmethod
+    def _generate(self, api_key, model_name, prompt):
+        """Return the model's whole answer; raises ProviderError."""
+
+    @abstractmethod
+    def _stream(self, api_key, model_name, prompt):
+        """Yield the model's answer in pieces as they arrive; raises ProviderError."""
+
+
+def iter_sse_data(lines):
+    """Yield the data payload of every server-sent event in an iterable of text lines."""
+    data = []
+    for line in lines:
+        if not line:
+            if data:
+                yield "\n".join(data)
+                data = []
+        elif line.startswith("data:"):
+            data.append(line[5:].lstrip(" "))
+    if data:
+        yield "\n".join(data)
+
+
+class OpenAIProvider(Provider):
+    """OpenAI-compatible chat completions over the pooled HTTP client."""
+
+    name = "openai"
+    label = "OpenAI"
+    api_key_env = "OPENAI_API_KEY"
+    models = ("gpt-4-turbo",)
+
+    def __init__(self, max_concurrency, rpm, tpm, window=RATE_WINDOW_SECONDS, base_url=OPENAI_BASE_URL):
+        super().__init__(max_concurrency, rpm, tpm, window)
+        # Point it at benchmarks/mock_llm_server.py to run offline
+        self.base_url = base_url.rstrip("/")
+
+    def _post(self, api_key, model_name, prompt, stream):
+        import requests  # loaded on first uncached call
+        data = {"model": model_name, "messages": [{"role": "user", "content": prompt}]}
+        if stream:
+            data["stream"] = True
+        try:
+            # Pooled connection, timeouts and retries on 429/5xx
+            return http_client.post(
+                f"{self.base_url}/chat/completions",
+                name=self.name,
+                headers={"Content-Type": "application/json", "Authorization": f"Bearer {api_key}"},
+                json=data,
+                stream=stream,
+            )
+        except requests.RequestException as e:
+            raise ProviderError(f"Error calling OpenAI API: {e}") from e
+
+    def _generate(self, api_key, model_name, prompt):
+        response = self._post(api_key, model_name, prompt, stream=False)
+        if response.status_code != 200:
+            raise ProviderError(f"Error with API request: {response.status_code} {response.text}")
+        return response.json().get("choices", [{}])[0].get("message", {}).get("content", None)
+
+    def _stream(self, api_key, model_name, prompt):
+        import requests
+        response = self._post(api_key, model_name, prompt, stream=True)
+        with response:
+            if response.status_code != 200:
+                raise ProviderError(f"Error with API request: {response.status_code} {response.text}")
+            try:
+                for data in iter_sse_data(response.iter_lines(decode_unicode=True)):
+                    if data == "[DONE]":
+                        break
+                    choices = json.loads(data).get("choices") or [{}]
+                    text = choices[0].get("delta", {}).get("content")
+                    if text:
+                        yield text
+            except requests.RequestException as e:
+                raise ProviderError(f"OpenAI stream interrupted: {e}") from e
+
+
+class GeminiProvider(Provider):
+    """Google Gemini through google.generativeai."""
+
+    name = "gemini"
+    label = "Gemini"
+    api_key_env = "GEMINI_API_KEY"
+    models = ("gemini-2.0-flash",)
+
+    def _model(self, api_key, model_name):
+        import google.generativeai as genai  # Gemini API, loaded on first uncached call
+        genai.configure(api_key=api_key)
+        return genai.GenerativeModel(model_name=model_name)
+
+    def _generate(self, api_key, model_name, prompt):
+        try:
+            response = self._model(api_key, model_name).generate_content(prompt)
+            return response.text if response else None
+        except Exception as e:
+            raise ProviderError(f"Error calling Gemini API: {e}") from e
+
+    def _stream(self, api_key, model_name, prompt):
+        try:
+            for chunk in self._model(api_key, model_name).generate_content(prompt, stream=True):
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # A chunk without text parts (e.g. only safety ratings)
+                    continue
+                if text:
+                    yield text
+        except Exception as e:
+            raise ProviderError(f"Error calling Gemini API: {e}") from e
+
+
+_providers = {}
+_models = {}
+
+
+def register(provider):
+    """Add a provider (replacing one of the same name) and route its models to it."""
+    old = _providers.get(provider.name)
+    if old is not None:
+        for model_name in old.models:
+            _models.pop(model_name, None)
+    _providers[provider.name] = provider
+    for model_name in provider.models:
+        _models[model_name] = provider
+    return provider
+
+
+register(OpenAIProvider(OPENAI_CONCURRENCY, OPENAI_RPM, OPENAI_TPM))
+register(GeminiProvider(GEMINI_CONCURRENCY, GEMINI_RPM, GEMINI_TPM))
+
+
+def supported_models():
+    return tuple(_models)
+
+
+def get_provider(model_name):
+    """Return the provider serving model_name; raises ProviderError for unknown models."""
+    provider = _models.get(model_name)
+    if provider is None:
+        raise ProviderError(f"Unsupported model {model_name}")
+    return provider
+
+
+def generate(model_name, prompt):
+    """Send the prompt to the selected model and return its text, or None (the error is printed)."""
+    try:
+        return get_provider(model_name).generate(model_name, prompt)
+    except ProviderError as e:
+        print(f"Error: {e}")
+        return None
+
+
+def generate_stream(model_name, prompt):
+    """Yield the selected model's answer to prompt as it is generated; raises ProviderError."""
+    return get_provider(model_name).stream(model_name, prompt)
+
+
+def stats():
+    """Per provider: calls sent, calls in flight and total seconds spent waiting for a budget."""
+    return {name: provider.stats() for name, provider in _providers.items()}
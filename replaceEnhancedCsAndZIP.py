@@ -2,6 +2,8 @@ import os
 import shutil
 import zipfile
 
+from project_fs import EXTRACT_MARKER, invalidate_extractions
+
 def find_interface_implementation_pair(file_name, src_folder):
     """Find interface file for a given implementation file."""
     if not file_name.startswith('I') and file_name.endswith('.cs'):
@@ -61,6 +63,8 @@ def zip_directory(directory, zip_path):
     with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
         for root, _, files in os.walk(directory):
             for file in files:
+                if file == EXTRACT_MARKER:
+                    continue
                 file_path = os.path.join(root, file)
                 arcname = os.path.relpath(file_path, directory)
                 zipf.write(file_path, arcname)
@@ -92,12 +96,13 @@ def print_csproj_files(directory):
     if not found:
         print("No .csproj files found in the directory.")
 
-def copy_additional_files(dest_folder):
+ADDITIONAL_FILES = [
+    "/workspaces/CodeVision1/output/enhanced_project.txt",
+    "/workspaces/CodeVision1/output/merged_output.txt"
+]
+
+def copy_additional_files(dest_folder, additional_files=ADDITIONAL_FILES):
     """Copy additional required files to the destination folder."""
-    additional_files = [
-        "/workspaces/CodeVision1/output/enhanced_project.txt",
-        "/workspaces/CodeVision1/output/merged_output.txt"
-    ]
     
     for file_path in additional_files:
         if os.path.exists(file_path):
@@ -113,23 +118,31 @@ def copy_additional_files(dest_folder):
         else:
             print(f"Warning: Additional file not found: {file_path}")
 
-if __name__ == "__main__":
-    # Define paths
-    src_folder = "/workspaces/CodeVision1/output/ClassFiles"
-    dest_folder = "/workspaces/CodeVision1/output/ZIP/Extracted"
-    zip_path = "/workspaces/CodeVision1/output/ZIP/Extracted_files.zip"
-    
+def replace_and_zip(src_folder, dest_folder, zip_path, additional_files=ADDITIONAL_FILES):
+    """Copy enhanced files over the extracted project and zip it; True if a zip was made."""
     # Replace files
     if replace_modified_files(src_folder, dest_folder):
+        # The tree no longer matches the uploaded archive
+        invalidate_extractions(dest_folder)
+
         # Print .csproj files before zipping
         print("\nChecking for .csproj files:")
         print_csproj_files(dest_folder)
         
         # Copy additional files
         print("\nCopying additional files:")
-        copy_additional_files(dest_folder)
+        copy_additional_files(dest_folder, additional_files)
         
         # Create zip file
         zip_directory(dest_folder, zip_path)
+        return True
     else:
         print("No files were replaced. Zip creation skipped.")
+        return False
+
+SRC_FOLDER = "/workspaces/CodeVision1/output/ClassFiles"
+DEST_FOLDER = "/workspaces/CodeVision1/output/ZIP/Extracted"
+ZIP_PATH = "/workspaces/CodeVision1/output/ZIP/Extracted_files.zip"
+
+if __name__ == "__main__":
+    replace_and_zip(SRC_FOLDER, DEST_FOLDER, ZIP_PATH)
@@ -0,0 +1,311 @@
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+from code_index import get_code_index
+from csharp_parser import parse_csharp
+from merged_project import iter_sections, open_merged, pack_path_for
+from tokens import count_tokens, count_tokens_stream, truncate_tokens
+from workspace import DEFAULT_WORKSPACE
+
+
+# How much project code a chat prompt may carry
+TOP_K = int(os.getenv("CODEVISION_RETRIEVAL_TOP_K", "12"))
+CONTEXT_TOKENS = int(os.getenv("CODEVISION_RETRIEVAL_TOKENS", "6000"))
+TRUNCATED_NOTE = "\n// ... (truncated)"
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "code", "do", "does",
+    "for", "from", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or",
+    "project", "show", "that", "the", "this", "to", "what", "when", "where",
+    "which", "who", "why", "with", "you",
+}
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def terms(text):
+    """Split text into lowercase search terms, breaking identifiers at camelCase and _."""
+    result = []
+    for word in re.findall(r"[A-Za-z_][A-Za-z0-9_]*", text):
+        lower = word.lower()
+        if lower in STOPWORDS:
+            continue
+        result.append(lower)
+        parts = re.findall(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+", word)
+        if len(parts) > 1:
+            result.extend(part.lower() for part in parts if part.lower() not in STOPWORDS)
+    return result
+
+
+class BM25Index:
+    """Okapi BM25 over a fixed list of documents."""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(terms(document)) for document in documents]
+        self.lengths = [sum(tf.values()) for tf in self.term_freqs]
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        doc_freq = Counter()
+        for tf in self.term_freqs:
+            doc_freq.update(tf.keys())
+        n = len(documents)
+        self.idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    def scores(self, query):
+        """Return one relevance score per document."""
+        query_terms = [term for term in terms(query) if term in self.idf]
+        results = []
+        for tf, length in zip(self.term_freqs, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self.avg_length) if self.avg_length else self.k1
+            for term in query_terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            results.append(score)
+        return results
+
+
+def class_skeleton(code, class_span, method_spans):
+    """Return the text of a class with the bodies of its methods elided."""
+    pieces, position = [], class_span["start"]
+    for method in method_spans:
+        if (method["class"] == class_span["name"] and method.get("body_start") is not None
+                and class_span["start"] <= method["body_start"] < class_span["end"]):
+            pieces.append(code[position:method["body_start"]])
+            pieces.append(" ... ")
+            position = method["body_end"]
+    pieces.append(code[position:class_span["end"]])
+    return "".join(pieces)
+
+
+def chunk_source(file_path, code, class_spans, method_spans):
+    """
+    Split one file into class- and method-level chunks.
+
+    A class chunk is the class with its method bodies elided; every method
+    with a body is its own chunk. Files without types are one chunk.
+    """
+    chunks = []
+    for method in method_spans:
+        if method.get("end") is None:
+            continue
+        chunks.append({
+            "file": file_path,
+            "name": f"{method['class']}.{method['name']}",
+            "kind": "method",
+            "lines": (method["start_line"], method["end_line"]),
+            "text": code[method["start"]:method["end"]],
+        })
+
+    for class_span in class_spans:
+        chunks.append({
+            "file": file_path,
+            "name": class_span["name"],
+            "kind": class_span["kind"],
+            "lines": (class_span["start_line"], class_span["end_line"]),
+            "text": class_skeleton(code, class_span, method_spans),
+        })
+
+    if not class_spans and code.strip():
+        chunks.append({
+            "file": file_path,
+            "name": os.path.basename(file_path),
+            "kind": "file",
+            "lines": (1, code.count("\n") + 1),
+            "text": code,
+        })
+    return chunks
+
+
+def _parsed_chunks(file_path, code):
+    parsed = parse_csharp(code)
+    return chunk_source(file_path, code, parsed["classes"], parsed["methods"])
+
+
+def _enhanced_sections(path):
+    with open(path, "r", encoding="utf-8") as f:
+        content = f.read()
+    pattern = r"===== FILE: ([^\n]+?) =====\n(?:```[^\n]*\n)?(.*?)(?:\n```)?\s*(?:===== END FILE =====|(?======))"
+    for match in re.finditer(pattern, content, re.DOTALL):
+        yield match.group(1).strip(), match.group(2)
+
+
+def _source_path(project_type, workspace):
+    # What the prompt carried before retrieval: the whole merged or enhanced project
+    return workspace.merged_output if project_type == "raw" else workspace.enhanced_project
+
+
+def _stat_stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _source_signature(project_type, workspace):
+    path = _source_path(project_type, workspace)
+    stamp = _stat_stamp(path)
+    if project_type == "raw":
+        pack_stamp = _stat_stamp(pack_path_for(path))
+        if stamp is None and pack_stamp is None:
+            return None
+        # The index decides which files are chunked and under which paths
+        return (path, stamp, pack_stamp, get_code_index(workspace.code_index_path).version)
+    if stamp is None:
+        return None
+    return (path, stamp)
+
+
+def file_chunks(file_path, entry):
+    """Return the chunks of one code index entry ([] if the file is gone)."""
+    if not os.path.exists(file_path):
+        return []
+    with open(file_path, "r", encoding="utf-8") as f:
+        code = f.read()
+    if "method_spans" in entry:
+        # The scan already has class and method spans for every file
+        return chunk_source(file_path, code, entry["class_spans"], entry["method_spans"])
+    return _parsed_chunks(file_path, code)
+
+
+def _raw_chunks(workspace):
+    # The raw project is the merged output, i.e. the sources as uploaded:
+    # enhancement overwrites the extracted tree (and the index follows it),
+    # so neither the files on disk nor the index spans describe it any more.
+    # Each file is parsed from its merged text instead.
+    chunks = []
+    code_index = get_code_index(workspace.code_index_path)
+    reader = open_merged(workspace.merged_output)
+    if reader is not None and code_index.data:
+        project_dir = workspace.project_dir()
+        with reader:
+            # Chunks carry the index's paths, which the embeddings are keyed by
+            for file_path in code_index.files():
+                code = reader.read(file_path)
+                if code is None and project_dir:
+                    code = reader.read(os.path.relpath(file_path, project_dir).replace(os.sep, "/"))
+                if code is not None:
+                    chunks.extend(_parsed_chunks(file_path, code))
+        if chunks:
+            return chunks
+    for _, file_path, code in iter_sections(workspace.merged_output):
+        chunks.extend(_parsed_chunks(file_path, code))
+    return chunks
+
+
+def _build_chunks(project_type, workspace):
+    if project_type == "raw":
+        return _raw_chunks(workspace)
+    chunks = []
+    for file_path, code in _enhanced_sections(workspace.enhanced_project):
+        chunks.extend(_parsed_chunks(file_path, code))
+    return chunks
+
+
+def get_chunks(project_type, workspace=DEFAULT_WORKSPACE):
+    """Return (chunks, BM25 index) for the raw or enhanced project, rebuilt when it changes."""
+    signature = _source_signature(project_type, workspace)
+    if signature is None:
+        return [], None
+    key = (workspace.root, project_type)
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached and cached[0] == signature:
+            return cached[1], cached[2]
+    chunks = _build_chunks(project_type, workspace)
+    bm25 = BM25Index([f"{chunk['name']} {chunk['text']}" for chunk in chunks]) if chunks else None
+    with _cache_lock:
+        _cache[key] = (signature, chunks, bm25, {})
+    return chunks, bm25
+
+
+def project_tokens(project_type, workspace=DEFAULT_WORKSPACE):
+    """Return the tokens of the whole project text the prompt used to carry (counted once per version)."""
+    path = _source_path(project_type, workspace)
+    stamp = _stat_stamp(path)
+    if stamp is None:
+        return 0
+    key = (workspace.root, project_type)
+    with _cache_lock:
+        cached = _cache.get(key)
+        counts = cached[3] if cached else {}
+        if stamp in counts:
+            return counts[stamp]
+    count = count_tokens_stream(path)
+    with _cache_lock:
+        counts[stamp] = count
+    return count
+
+
+def format_chunk(chunk):
+    start, end = chunk["lines"]
+    return f"// File: {chunk['file']} | {chunk['kind']} {chunk['name']} (lines {start}-{end})\n{chunk['text']}"
+
+
+def _blend_semantic(query, chunks, scores, workspace):
+    # BM25 finds the query's words; the embeddings also find code about the
+    # same thing under other names. Both are brought to about [0, 1] and added.
+    from embedding_index import chunk_scores  # imports this module
+
+    similarity = chunk_scores(query, workspace.code_index_path)
+    if not similarity:
+        return scores
+    top = max(scores) or 1.0
+    return [score / top + max(0.0, similarity.get((chunk["file"], chunk["kind"], chunk["name"]), 0.0))
+            for chunk, score in zip(chunks, scores)]
+
+
+def select_context(query, project_type, top_k=TOP_K, token_budget=CONTEXT_TOKENS, workspace=DEFAULT_WORKSPACE):
+    """
+    Pick the project chunks most relevant to query within a token budget.
+
+    Returns:
+        tuple: (context text or None if no chunks, stats dict with the
+                chunk counts and the prompt tokens used and saved)
+    """
+    chunks, bm25 = get_chunks(project_type, workspace)
+    if not chunks:
+        return None, {}
+
+    scores = bm25.scores(query)
+    if project_type == "raw" and get_code_index(workspace.code_index_path).data:
+        scores = _blend_semantic(query, chunks, scores, workspace)
+    ranked = sorted(range(len(chunks)), key=lambda i: scores[i], reverse=True)
+
+    selected, used = [], 0
+    for i in ranked:
+        if len(selected) >= top_k:
+            break
+        if scores[i] <= 0 and selected:
+            break
+        text = format_chunk(chunks[i])
+        tokens = count_tokens(text)
+        if used + tokens > token_budget:
+            continue
+        selected.append(text)
+        used += tokens
+
+    if not selected and ranked:
+        # Every relevant chunk is over the budget: send the best one cut to fit
+        # rather than nothing, which would make the caller paste the whole project
+        text = truncate_tokens(format_chunk(chunks[ranked[0]]), token_budget - count_tokens(TRUNCATED_NOTE))
+        text += TRUNCATED_NOTE
+        selected.append(text)
+        used = count_tokens(text)
+
+    full_tokens = project_tokens(project_type, workspace)
+    stats = {
+        "chunks": len(chunks),
+        "selected": len(selected),
+        "context_tokens": used,
+        "project_tokens": full_tokens,
+        "saved_tokens": max(0, full_tokens - used),
+    }
+    return "\n\n".join(selected), stats
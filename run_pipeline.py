@@ -1,68 +1,141 @@
-import subprocess
+import os
+import shutil
 import sys
 
-def run_script(script_name, *args):
-    """Runs a Python script with optional arguments."""
+import project_cache
+from enhance import enhance_chunked
+from extractCSharpCode import process_files
+from replaceEnhancedCsAndZIP import replace_and_zip
+from workspace import DEFAULT_WORKSPACE
+
+class PipelineError(Exception):
+    """A pipeline stage failed; the job fails with this message."""
+
+def run_stage(stage_name, func, *args, **kwargs):
+    """Runs one pipeline stage in-process and returns its result; a failure raises PipelineError."""
     try:
-        cmd = ["python", script_name] + list(args)
-        result = subprocess.run(cmd, check=True)
-        print(f"{script_name} executed successfully.")
-    except subprocess.CalledProcessError as e:
-        print(f"Error running {script_name}: {e}")
+        result = func(*args, **kwargs)
+    except Exception as e:
+        print(f"Error running {stage_name}: {e}")
+        raise PipelineError(f"{stage_name} failed: {e}") from e
+    print(f"{stage_name} executed successfully.")
+    return result
+
+def _clear_outputs(workspace):
+    # Nothing of an earlier run may end up in this run's zip
+    for path in (workspace.enhanced_files_dir, workspace.class_files_dir):
+        shutil.rmtree(path, ignore_errors=True)
+    if os.path.exists(workspace.zip_path):
+        os.remove(workspace.zip_path)
+
+def _no_progress(stage, percent):
+    pass
+
+def run_pipeline(uploaded_filename, model_name, progress=None, workspace=DEFAULT_WORKSPACE):
+    """
+    Enhance the uploaded project and repackage it as Extracted_files.zip.
+
+    Every stage reads and writes inside workspace, so pipelines of different
+    projects can run at the same time. progress, if given, is called as
+    progress(stage, percent) before each stage and as enhancement chunks
+    finish.
+
+    Outputs of an earlier run are removed first. Raises PipelineError if a
+    stage fails, if any file could not be enhanced or if no zip was made.
+    """
+    if progress is None:
+        progress = _no_progress
 
-def main():
-    # Ensure the script is called with the correct number of arguments
-    if len(sys.argv) < 2:
-        print("Error: Filename argument is missing.")
-        return
-    
-    uploaded_filename = sys.argv[1]
-    model_name = sys.argv[2] 
-    # Prompt or use the uploaded filename as the project name
-    project_name = uploaded_filename  # Use the uploaded file name as the project name
-    
-    # Construct the directory to scan dynamically
-    directory_to_scan = f"/workspaces/CodeVision1/input/{project_name}"
-    output_file = "/workspaces/CodeVision1/output/merged_output.txt"
-    
     #this will combine the input in 1 file
     #print(f"Scanning project: {project_name}...")
     #print("Starting scanAndMerge.py...\n")
-    #run_script("scanAndMerge.py", directory_to_scan, output_file)
+    #run_stage("scanAndMerge.py", scan_and_merge_cs_files, directory_to_scan, output_file)
     #print()
     #print()
-    
+
+    _clear_outputs(workspace)
+
     #this will call the model and enhance the code
     print("Starting enhance.py...\n")
-    run_script("enhance.py", model_name) 
+    progress("enhancing", 5)
+    # Enhancement is most of the run: finished chunks move the job from 5% to 70%
+    missing = run_stage("enhance.py", enhance_chunked, model_name, workspace=workspace,
+                        progress=lambda completed, total: progress("enhancing", 5 + 65 * completed // max(total, 1)))
+    if missing is None:
+        raise PipelineError("enhance.py failed: project files or prompt not found, or unsupported model")
+    if missing:
+        raise PipelineError(f"{len(missing)} files could not be enhanced: {', '.join(missing)}")
     print()
     print()
 
     #this will clean file & get required code and save it in Class files
     print("Starting extractCSharpCode.py...\n")
-    run_script("extractCSharpCode.py")
+    progress("extracting", 70)
+    run_stage("extractCSharpCode.py", process_files, workspace.enhanced_files_dir, workspace.class_files_dir)
     print()
     print()
-    
+
     #this will extract .zip file that was uploaded in ZIP/Extracted folder
     #print("Starting ExtractZIP.py...\n")
-    #run_script("ExtractZIP.py")
+    #run_stage("ExtractZIP.py", extract_zip)
     #print()
     #print()
-    
+
     #this will replace ClassFiles in the Extracted Folder & ZIP it
     print("Starting replaceEnhancedCsAndZIP.py...\n")
-    run_script("replaceEnhancedCsAndZIP.py")
+    progress("packaging", 85)
+    zipped = run_stage("replaceEnhancedCsAndZIP.py", replace_and_zip, workspace.class_files_dir,
+                       workspace.extracted_dir, workspace.zip_path,
+                       [workspace.enhanced_project, workspace.merged_output])
+    if not zipped or not os.path.exists(workspace.zip_path):
+        raise PipelineError("No enhanced files to package; zip not created.")
     print()
     print()
-    
+
     #Removes temp files & folders
     #print("Starting cleanUp.py...\n")
-    #run_script("cleanUP.py")
+    #run_stage("cleanUP.py", clean_up)
     #print()
     #print()
-    
+
     print("Pipeline execution complete.\n")
 
+def run_pipeline_job(uploaded_filename, model_name, workspace, progress):
+    """
+    Job-queue entry point: run the pipeline and keep a private copy of the zip.
+
+    The enhanced zip is cached per uploaded archive and model, so enhancing
+    an identical upload again is served from the project cache. Only a zip
+    this run made with every file enhanced is cached; a failed run raises.
+    """
+    # A later run in the same workspace overwrites its zip; the result is this job's own copy
+    job_dir = os.path.join(workspace.jobs_dir, os.urandom(8).hex())
+    result_path = os.path.join(job_dir, os.path.basename(workspace.zip_path))
+
+    archive_path = workspace.archive_path(uploaded_filename)
+    archive_hash = project_cache.hash_file(archive_path) if os.path.isfile(archive_path) else None
+    artifact = f"enhanced_{model_name}.zip"
+    if archive_hash and project_cache.restore_artifact(archive_hash, artifact, result_path):
+        progress("cached", 100)
+        return result_path
+
+    run_pipeline(uploaded_filename, model_name, progress, workspace)
+
+    os.makedirs(job_dir, exist_ok=True)
+    shutil.copy2(workspace.zip_path, result_path)
+    if archive_hash:
+        project_cache.store_artifact(archive_hash, artifact, result_path)
+    return result_path
+
+def main():
+    # Ensure the script is called with the correct number of arguments
+    if len(sys.argv) < 2:
+        print("Error: Filename argument is missing.")
+        return
+
+    uploaded_filename = sys.argv[1]
+    model_name = sys.argv[2]
+    run_pipeline(uploaded_filename, model_name)
+
 if __name__ == "__main__":
     main()
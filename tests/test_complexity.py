@@ -0,0 +1,34 @@
+"""The fused complexity counter must agree with the per-regex counter it replaced.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+from bench_complexity import EDGE_CASES, legacy_cyclomatic_complexity, samples  # noqa: E402
+from bench_parser import load_sources  # noqa: E402
+from core import calculate_cyclomatic_complexity  # noqa: E402
+
+SAMPLES = list(samples(load_sources(os.path.join(ROOT, "NumHandler.zip"))))
+
+
+def test_sample_set_has_methods():
+    # Files, method bodies and the edge cases, not just the edge cases
+    assert len(SAMPLES) > len(EDGE_CASES) + 1
+    assert any(":" in label for label, _ in SAMPLES[:-len(EDGE_CASES)])
+
+
+@pytest.mark.parametrize("label,code", SAMPLES, ids=[label for label, _ in SAMPLES])
+def test_fused_matches_legacy(label, code):
+    assert calculate_cyclomatic_complexity(code) == legacy_cyclomatic_complexity(code)
+
+
+def test_empty_code():
+    assert calculate_cyclomatic_complexity("") == legacy_cyclomatic_complexity("")
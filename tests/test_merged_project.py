@@ -0,0 +1,68 @@
+"""When the indexed merge may stand in for merged_output.txt.
+
+Run with:
+    python -m pytest tests
+"""
+import json
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from merged_project import (MAGIC, TRAILER, MergedWriter, export_text, iter_sections,  # noqa: E402
+                            open_merged, pack_path_for)
+
+FILES = [
+    ("A.cs", "src/A.cs", "public class A\n{\n    public int One() { return 1; }\n}\n"),
+    ("B.cs", "src/B.cs", "public class B { }\n"),
+]
+
+
+def _merge(tmp_path):
+    text_path = str(tmp_path / "merged_output.txt")
+    with MergedWriter(pack_path_for(text_path)) as writer:
+        for name, file_path, content in FILES:
+            writer.add(name, file_path, content)
+    export_text(pack_path_for(text_path), text_path)
+    return text_path
+
+
+def _is_current(text_path):
+    reader = open_merged(text_path)
+    if reader is None:
+        return False
+    reader.close()
+    return True
+
+
+def test_exported_text_uses_the_merge(tmp_path):
+    text_path = _merge(tmp_path)
+    assert _is_current(text_path)
+    assert [content for _, _, content in iter_sections(text_path)] == [content.strip() for _, _, content in FILES]
+
+
+def test_same_size_rewrite_is_not_served_from_the_merge(tmp_path):
+    text_path = _merge(tmp_path)
+    with open(text_path, "r", encoding="utf-8") as f:
+        text = f.read()
+    with open(text_path, "w", encoding="utf-8", newline="\n") as f:
+        f.write(text.replace("return 1;", "return 2;"))
+
+    assert not _is_current(text_path)
+    assert "return 2;" in dict((name, content) for name, _, content in iter_sections(text_path))["A.cs"]
+
+
+def test_merge_without_text_hash_is_not_trusted(tmp_path):
+    text_path = _merge(tmp_path)
+    pack_path = pack_path_for(text_path)
+    # Rewrite the index the way merges were written before the hash was stored
+    with open(pack_path, "rb") as f:
+        data = f.read()
+    index_offset, _ = TRAILER.unpack(data[-TRAILER.size:])
+    entries = json.loads(data[index_offset:-TRAILER.size].decode("utf-8"))["files"]
+    with open(pack_path, "wb") as f:
+        f.write(data[:index_offset] + json.dumps(entries).encode("utf-8") + TRAILER.pack(index_offset, MAGIC))
+
+    assert not _is_current(text_path)
+    assert len(list(iter_sections(text_path))) == len(FILES)
@@ -0,0 +1,88 @@
+"""The semantic blend of chat retrieval must find the embedding of every raw chunk.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import sys
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from embedding_index import chunk_scores  # noqa: E402
+from retrieval import _blend_semantic, get_chunks  # noqa: E402
+from uploads import prepare_project  # noqa: E402
+from workspace import Workspace  # noqa: E402
+
+# Leading blank lines and an overload: neither may stop a chunk from matching
+ORDERS_SOURCE = """
+
+using System;
+
+namespace Shop
+{
+    public class OrderService
+    {
+        public bool ValidateOrder(Order order)
+        {
+            return order != null && order.Total > 0;
+        }
+
+        public bool ValidateOrder(Order order, bool strict)
+        {
+            return ValidateOrder(order) && (!strict || order.Lines.Count > 0);
+        }
+    }
+}
+"""
+
+STOCK_SOURCE = """namespace Shop
+{
+    public class Stock
+    {
+        public int Available(string sku)
+        {
+            return sku.Length;
+        }
+    }
+}
+"""
+
+
+def _prepared_workspace(tmp_path):
+    workspace = Workspace(str(tmp_path / "workspace")).create()
+    zip_path = workspace.archive_path("Shop.zip")
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        archive.writestr("Shop/OrderService.cs", ORDERS_SOURCE)
+        archive.writestr("Shop/Stock.cs", STOCK_SOURCE)
+    workspace.set_archive("Shop.zip")
+    prepare_project(zip_path, workspace.merged_output, workspace.project_dir(),
+                    index_path=workspace.code_index_path)
+    return workspace
+
+
+def test_every_raw_chunk_has_an_embedding(tmp_path):
+    workspace = _prepared_workspace(tmp_path)
+    chunks, _ = get_chunks("raw", workspace)
+    similarity = chunk_scores("validate the order", workspace.code_index_path)
+
+    assert chunks
+    missing = [(chunk["file"], chunk["kind"], chunk["name"]) for chunk in chunks
+               if (chunk["file"], chunk["kind"], chunk["name"]) not in similarity]
+    assert missing == []
+
+
+def test_blend_adds_similarity_to_bm25(tmp_path):
+    workspace = _prepared_workspace(tmp_path)
+    chunks, bm25 = get_chunks("raw", workspace)
+    query = "validate the order"
+    scores = bm25.scores(query)
+    blended = _blend_semantic(query, chunks, scores, workspace)
+
+    top = max(scores) or 1.0
+    similarity = chunk_scores(query, workspace.code_index_path)
+    for chunk, score, blend in zip(chunks, scores, blended):
+        expected = score / top + max(0.0, similarity[(chunk["file"], chunk["kind"], chunk["name"])])
+        assert abs(blend - expected) < 1e-9
+    assert any(blend > score / top for score, blend in zip(scores, blended))
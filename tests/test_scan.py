@@ -0,0 +1,67 @@
+"""Scanning and preparing a project with a file that is not UTF-8.
+
+Run with:
+    python -m pytest tests
+"""
+import os
+import sys
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from core import update_project_index  # noqa: E402
+from uploads import prepare_project  # noqa: E402
+
+# "café" in cp1252: 0xE9 is not valid UTF-8
+LATIN1_SOURCE = "public class A\n{\n    // café\n    public void Run() { }\n}\n".encode("cp1252")
+UTF8_SOURCE = "public class B\n{\n    public int Count(int x) { return x; }\n}\n".encode("utf-8")
+
+
+def _write(directory, name, data):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path
+
+
+def test_non_utf8_file_is_left_out_of_the_index(tmp_path):
+    source_dir = tmp_path / "src"
+    source_dir.mkdir()
+    _write(source_dir, "A.cs", LATIN1_SOURCE)
+    b_path = _write(source_dir, "B.cs", UTF8_SOURCE)
+    index_path = str(tmp_path / "code_index.json")
+
+    project_data, changes = update_project_index(str(source_dir), workers=1, index_path=index_path)
+    assert list(project_data) == [b_path]
+    assert changes == {"added": [b_path], "changed": [], "removed": []}
+
+    # Rescanning an unchanged tree reports nothing, the skipped file included
+    _, changes = update_project_index(str(source_dir), workers=1, index_path=index_path)
+    assert changes == {"added": [], "changed": [], "removed": []}
+
+
+def test_file_turning_non_utf8_counts_as_removed(tmp_path):
+    source_dir = tmp_path / "src"
+    source_dir.mkdir()
+    a_path = _write(source_dir, "A.cs", LATIN1_SOURCE.replace(b"\xe9", b"e"))
+    index_path = str(tmp_path / "code_index.json")
+    update_project_index(str(source_dir), workers=1, index_path=index_path)
+
+    _write(source_dir, "A.cs", LATIN1_SOURCE + b"// changed\n")
+    project_data, changes = update_project_index(str(source_dir), workers=1, index_path=index_path)
+    assert project_data == {}
+    assert changes == {"added": [], "changed": [], "removed": [a_path]}
+
+
+def test_prepare_project_skips_non_utf8_file(tmp_path):
+    zip_path = str(tmp_path / "project.zip")
+    with zipfile.ZipFile(zip_path, "w") as archive:
+        archive.writestr("Project/A.cs", LATIN1_SOURCE)
+        archive.writestr("Project/B.cs", UTF8_SOURCE)
+    extract_dir = str(tmp_path / "extracted")
+
+    summary = prepare_project(zip_path, str(tmp_path / "merged_output.txt"), extract_dir,
+                              index_path=str(tmp_path / "code_index.json"))
+    assert summary["files"] == 1
+    assert summary["entries"] >= 2
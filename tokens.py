@@ -0,0 +1,95 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+# One encoder per process; tiktoken encoders are thread-safe once loaded.
+ENCODING = "cl100k_base"
+# Rough average for source code and English with cl100k_base
+CHARS_PER_TOKEN = 4
+# Exact counts remembered per content hash
+COUNT_CACHE_SIZE = 4096
+# Streaming counter block size in characters
+STREAM_BLOCK_CHARS = 1 << 20
+
+_encoder = None
+_encoder_lock = threading.Lock()
+_counts = OrderedDict()
+_counts_lock = threading.Lock()
+
+
+def get_encoder():
+    """Return the shared tiktoken encoder, loading it on first use."""
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                import tiktoken  # OpenAI's tokenization library; slow to import
+                _encoder = tiktoken.get_encoding(ENCODING)
+    return _encoder
+
+
+def content_hash(text):
+    """Return the sha256 of text, the key of the token count cache."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def count_tokens(text):
+    """Return the exact token count of text, cached by content hash."""
+    if not text:
+        return 0
+    key = content_hash(text)
+    with _counts_lock:
+        count = _counts.get(key)
+        if count is not None:
+            _counts.move_to_end(key)
+            return count
+    count = len(get_encoder().encode(text))
+    with _counts_lock:
+        _counts[key] = count
+        if len(_counts) > COUNT_CACHE_SIZE:
+            _counts.popitem(last=False)
+    return count
+
+
+def truncate_tokens(text, max_tokens):
+    """Return the longest prefix of text, cut at a line end where possible, of at most max_tokens tokens."""
+    encoder = get_encoder()
+    encoded = encoder.encode(text)
+    if len(encoded) <= max_tokens:
+        return text
+    prefix = encoder.decode(encoded[:max(0, max_tokens)])
+    cut = prefix.rfind("\n")
+    return prefix[:cut] if cut > 0 else prefix
+
+
+def estimate_tokens(text):
+    """Return a cheap upper-end token estimate (no encoding) for budgeting and logs."""
+    return -(-len(text) // CHARS_PER_TOKEN) if text else 0
+
+
+def count_tokens_stream(source, block_chars=STREAM_BLOCK_CHARS):
+    """
+    Count the tokens of a large text without encoding it in one piece.
+
+    source is a file path or an iterable of strings. Text is encoded in
+    blocks cut at a newline, so tokens never straddle a block boundary
+    except inside lines longer than block_chars.
+    """
+    if isinstance(source, str):
+        with open(source, "r", encoding="utf-8") as f:
+            return count_tokens_stream(iter(lambda: f.read(block_chars), ""), block_chars)
+
+    encoder = get_encoder()
+    total, pending = 0, ""
+    for piece in source:
+        pending += piece
+        if len(pending) < block_chars:
+            continue
+        cut = pending.rfind("\n", 0, len(pending) - 1) + 1
+        if cut == 0:
+            cut = len(pending)
+        total += len(encoder.encode(pending[:cut]))
+        pending = pending[cut:]
+    if pending:
+        total += len(encoder.encode(pending))
+    return total
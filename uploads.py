@@ -0,0 +1,165 @@
+import hashlib
+import os
+import tempfile
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from code_index import INDEX_FILE
+from core import index_project
+from method_list import load_method_list, method_list_path
+import project_cache
+from merged_project import MergedReader, export_text, pack_path_for
+from project_fs import extract_once
+from scanAndMerge import scan_and_merge_cs_files
+
+# Limits for uploaded archives. MAX_UPLOAD_BYTES bounds the request body;
+# the entry and decompressed-size limits stop zip bombs before anything is
+# extracted.
+MAX_UPLOAD_BYTES = int(os.getenv("CODEVISION_MAX_UPLOAD_MB", "200")) * 1024 * 1024
+MAX_ARCHIVE_ENTRIES = int(os.getenv("CODEVISION_MAX_ARCHIVE_ENTRIES", "20000"))
+MAX_UNCOMPRESSED_BYTES = int(os.getenv("CODEVISION_MAX_UNCOMPRESSED_MB", "1024")) * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# What prepare_project() needs from the project cache to skip merging
+CACHED_ARTIFACTS = ("merged_output.cvm",)
+
+
+class UploadRejected(Exception):
+    """An upload that breaks a limit or is not a usable archive; status is the HTTP code."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class SpooledUpload:
+    """
+    A file part of an upload, written to directory and hashed while the
+    request body is still arriving (the form parser's stream factory, see
+    UploadRequest in app.py). The parser writes it and reads it back like
+    any file; save() then moves it into place without another copy.
+    """
+
+    def __init__(self, directory, max_bytes=MAX_UPLOAD_BYTES):
+        fd, self.path = tempfile.mkstemp(suffix=".part", dir=directory)
+        self._file = os.fdopen(fd, "w+b")
+        self._digest = hashlib.sha256()
+        self._size = 0
+        self._max_bytes = max_bytes
+
+    def write(self, data):
+        self._size += len(data)
+        if self._size > self._max_bytes:
+            raise UploadRejected(f"Upload exceeds {self._max_bytes // (1024 * 1024)} MB", 413)
+        self._digest.update(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        # read, readline, seek, ... of the file on disk
+        return getattr(self._file, name)
+
+    def save(self, dest_path):
+        """Move the complete upload to dest_path and return its sha256."""
+        self._file.close()
+        os.replace(self.path, dest_path)
+        return self._digest.hexdigest()
+
+    def close(self):
+        """Close the file, deleting it unless save() has moved it."""
+        self._file.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def save_upload(stream, dest_path, max_bytes=MAX_UPLOAD_BYTES, chunk_size=UPLOAD_CHUNK_BYTES):
+    """
+    Store an upload at dest_path and return its sha256.
+
+    A SpooledUpload is already on disk, hashed and size-checked, and is
+    only moved. Any other stream is copied in chunks and hashed on the way.
+    Either way the file only appears at dest_path once it is complete; an
+    upload over max_bytes is discarded and rejected with 413.
+
+    Returns:
+        str: sha256 of the upload
+    """
+    if isinstance(stream, SpooledUpload):
+        return stream.save(dest_path)
+    digest = hashlib.sha256()
+    size = 0
+    tmp_path = f"{dest_path}.{os.getpid()}.part"
+    try:
+        with open(tmp_path, "wb") as out:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadRejected(f"Upload exceeds {max_bytes // (1024 * 1024)} MB", 413)
+                digest.update(chunk)
+                out.write(chunk)
+        os.replace(tmp_path, dest_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return digest.hexdigest()
+
+
+def check_archive(zip_path, max_entries=MAX_ARCHIVE_ENTRIES, max_uncompressed=MAX_UNCOMPRESSED_BYTES):
+    """Reject archives that are corrupt, unsafe to extract or would expand past the limits."""
+    try:
+        with zipfile.ZipFile(zip_path, "r") as zip_ref:
+            infos = zip_ref.infolist()
+    except zipfile.BadZipFile:
+        raise UploadRejected("Uploaded file is not a valid .zip archive.")
+
+    if len(infos) > max_entries:
+        raise UploadRejected(f"Archive has {len(infos)} entries (limit {max_entries}).", 413)
+
+    total = 0
+    for info in infos:
+        name = info.filename.replace("\\", "/")
+        if name.startswith("/") or ".." in name.split("/"):
+            raise UploadRejected(f"Archive entry {info.filename} points outside the project.")
+        # Declared sizes; zipfile stops reading a member that inflates past its file_size
+        total += info.file_size
+        if total > max_uncompressed:
+            raise UploadRejected(f"Archive expands past {max_uncompressed // (1024 * 1024)} MB.", 413)
+
+
+def prepare_project(zip_path, merged_output, extract_dir, archive_hash=None, index_path=INDEX_FILE):
+    """
+    Post-upload steps in one go: merge the sources straight from the
+    archive while it is extracted once in the background, then build the
+    code index and method list of the extracted tree.
+
+    With archive_hash, the merged output and code index are kept in the
+    project cache and an identical archive is restored from there.
+
+    Returns:
+        dict: the number of merged files and dropdown entries, and whether
+              they came from the cache
+    """
+    pack_path = pack_path_for(merged_output)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        extraction = executor.submit(extract_once, zip_path, extract_dir, archive_hash)
+        cached = bool(archive_hash) and all(
+            project_cache.artifact_path(archive_hash, name) for name in CACHED_ARTIFACTS)
+        if cached:
+            project_cache.restore_artifact(archive_hash, "merged_output.cvm", pack_path)
+            export_text(pack_path, merged_output)
+        else:
+            scan_and_merge_cs_files(zip_path, merged_output)
+        extraction.result()
+
+    if archive_hash and not cached:
+        project_cache.store_artifact(archive_hash, "merged_output.cvm", pack_path)
+
+    index_project(extract_dir, index_path)
+    _, entries = load_method_list(method_list_path(index_path))
+
+    with MergedReader(pack_path) as reader:
+        files = len(reader)
+    return {"files": files, "entries": len(entries), "cached": cached}
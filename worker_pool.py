@@ -0,0 +1,32 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Size of the in-process pool that runs the request handlers' heavy work
+MAX_WORKERS = int(os.getenv("CODEVISION_WORKERS", "4"))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the shared thread pool, creating it on first use."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="codevision-worker")
+    return _executor
+
+
+def run(func, *args, timeout=None, **kwargs):
+    """Run func on the pool and wait for its result (re-raising its exception)."""
+    return get_executor().submit(func, *args, **kwargs).result(timeout=timeout)
+
+
+def shutdown(wait=True):
+    """Stop the pool; a later run() starts a fresh one."""
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=wait)
@@ -0,0 +1,103 @@
+import json
+import os
+import re
+import uuid
+
+BASE_DIR = "/workspaces/CodeVision1"
+WORKSPACES_DIR = os.getenv("CODEVISION_WORKSPACES_DIR", f"{BASE_DIR}/output/workspaces")
+WORKSPACE_FILE = "workspace.json"
+
+_PROJECT_ID = re.compile(r"^[0-9a-f]{32}$")
+
+
+class Workspace:
+    """Every path one project's pipeline stages read and write.
+
+    Each uploaded project gets its own directory under WORKSPACES_DIR with
+    the same input/ and output/ layout the tool has always used, so
+    concurrent projects never share merged output, extracted trees, enhanced
+    files, code index or graphs. DEFAULT_WORKSPACE is the original shared
+    layout under BASE_DIR, used by the command-line scripts.
+    """
+
+    def __init__(self, root, project_id=None, code_index_path=None, graphs_dir=None):
+        self.root = root
+        self.project_id = project_id
+        self.input_dir = os.path.join(root, "input")
+        self.output_dir = os.path.join(root, "output")
+        self.merged_output = os.path.join(self.output_dir, "merged_output.txt")
+        self.enhanced_project = os.path.join(self.output_dir, "enhanced_project.txt")
+        self.enhanced_files_dir = os.path.join(self.output_dir, "enhancedFiles")
+        self.class_files_dir = os.path.join(self.output_dir, "ClassFiles")
+        self.extracted_dir = os.path.join(self.output_dir, "ZIP", "Extracted")
+        self.zip_path = os.path.join(self.output_dir, "ZIP", "Extracted_files.zip")
+        self.code_index_path = code_index_path or os.path.join(self.output_dir, "code_index.json")
+        self.graphs_dir = graphs_dir or os.path.join(self.output_dir, "graphs")
+        # One folder per enhancement job holding its result zip
+        self.jobs_dir = os.path.join(self.output_dir, "jobs")
+
+    def create(self):
+        os.makedirs(self.input_dir, exist_ok=True)
+        os.makedirs(self.output_dir, exist_ok=True)
+        return self
+
+    def archive_path(self, archive_name):
+        return os.path.join(self.input_dir, os.path.basename(archive_name))
+
+    def set_archive(self, archive_name):
+        """Record which uploaded archive this workspace holds."""
+        with open(os.path.join(self.root, WORKSPACE_FILE), "w", encoding="utf-8") as f:
+            json.dump({"archive": os.path.basename(archive_name)}, f)
+
+    @property
+    def archive_name(self):
+        """The uploaded archive's file name, or None if there is none (or several) to choose from."""
+        try:
+            with open(os.path.join(self.root, WORKSPACE_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)["archive"]
+        except (FileNotFoundError, ValueError, KeyError):
+            pass
+        # No record: fall back to the only .zip in input/
+        try:
+            zip_files = [f for f in os.listdir(self.input_dir) if f.endswith(".zip")]
+        except FileNotFoundError:
+            return None
+        return zip_files[0] if len(zip_files) == 1 else None
+
+    def project_dir(self, archive_name=None):
+        """Return where the archive is extracted, or None if the archive is unknown."""
+        archive_name = archive_name or self.archive_name
+        if not archive_name:
+            return None
+        return os.path.join(self.extracted_dir, os.path.splitext(os.path.basename(archive_name))[0])
+
+
+DEFAULT_WORKSPACE = Workspace(
+    BASE_DIR,
+    code_index_path="code_index.json",
+    graphs_dir=os.path.join(os.path.dirname(os.path.abspath(__file__)), "static", "images"),
+)
+
+
+def new_workspace():
+    """Create an empty workspace for a new project."""
+    project_id = uuid.uuid4().hex
+    return Workspace(os.path.join(WORKSPACES_DIR, project_id), project_id).create()
+
+
+def get_workspace(project_id):
+    """
+    Return the workspace of project_id; None (or an empty id) means the
+    shared DEFAULT_WORKSPACE.
+
+    Raises:
+        KeyError: project_id is malformed or has no workspace
+    """
+    if not project_id:
+        return DEFAULT_WORKSPACE
+    if not _PROJECT_ID.match(project_id):
+        raise KeyError(project_id)
+    root = os.path.join(WORKSPACES_DIR, project_id)
+    if not os.path.isdir(root):
+        raise KeyError(project_id)
+    return Workspace(root, project_id)